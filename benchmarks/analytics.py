@@ -0,0 +1,90 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, recreate_database, seed
+from src.analytics import backfill, sales_report
+from src.catalog import catalog
+from src.database import connection_string
+from src.enums import AnalyticsGroup
+
+# Отчет без итогов: выручка, места и заполняемость считаются по заказам и местам на каждый запрос
+AD_HOC_SQL = {
+    AnalyticsGroup.MOVIE: "sessions.movie_id",
+    AnalyticsGroup.HALL: "sessions.hall_id",
+    AnalyticsGroup.DAY: "sessions.start_time::date",
+}
+AD_HOC_TEMPLATE = """
+WITH session_sales AS (
+    SELECT orders.session_id, count(*) AS orders, sum(order_seats.count) AS seats, sum(orders.total_price) AS revenue
+    FROM orders
+    LEFT JOIN (SELECT order_id, count(*) FROM m2m_orders_seats GROUP BY order_id) AS order_seats
+        ON order_seats.order_id = orders.id
+    GROUP BY orders.session_id
+)
+SELECT {key}, count(*), sum(hall_seats.count), sum(session_sales.orders), sum(session_sales.seats),
+       sum(session_sales.revenue), sum(session_sales.seats)::float / sum(hall_seats.count)
+FROM sessions
+JOIN (SELECT hall_id, count(*) FROM seats GROUP BY hall_id) AS hall_seats ON hall_seats.hall_id = sessions.hall_id
+LEFT JOIN session_sales ON session_sales.session_id = sessions.id
+GROUP BY {key}
+"""
+
+
+def timed(function, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "rows": len(rows),
+        "p50_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales report from the daily rollups against ad hoc aggregation")
+    parser.add_argument("--database", default="cinema_analytics", help="Scratch database, dropped and recreated")
+    add_dataset_arguments(parser, users=20_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    seed_params = dataset_params(parser, args)
+
+    database_url = make_url(connection_string).set(database=args.database)
+    recreate_database(database_url)
+
+    url = database_url.render_as_string(hide_password=False)
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    seed(engine, seed_params)
+
+    result = {}
+    with Session(engine) as db:
+        backfill_report = backfill(db)
+        catalog.reload(db)
+        for group, key in AD_HOC_SQL.items():
+            sql = text(AD_HOC_TEMPLATE.format(key=key))
+            result[group.value] = {
+                "ad_hoc": timed(lambda: db.execute(sql).all(), args.runs),
+                "rollup": timed(lambda: sales_report(group, None, None, db), args.runs),
+            }
+    engine.dispose()
+
+    print(json.dumps({"dataset": seed_params, "backfill": backfill_report, "reports": result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert
+
+from src.crud import add_order
+from src.database import SessionLocal
+from src.enums import AgeRating
+from src.models import HallsOrm, MoviesOrm, OrdersOrm, SeatsOrdersOrm, SeatsOrm, SessionsOrm, UsersOrm
+from src.schemas import OrderCreate
+
+
+def create_fixture(rows: int, seats_per_row: int) -> dict:
+    with SessionLocal() as db:
+        user = UsersOrm(email="booking-bench@example.com", password_hash="")
+        movie = MoviesOrm(
+            title="Booking benchmark",
+            director="",
+            screenwriter="",
+            actors=[],
+            description="",
+            trailer_url="",
+            poster_url="",
+            age_rating=AgeRating.AGE_0,
+            duration=120
+        )
+        hall = HallsOrm(name="Booking benchmark", total_seats=rows * seats_per_row)
+        db.add_all([user, movie, hall])
+        db.flush()
+
+        session = SessionsOrm(movie_id=movie.id, hall_id=hall.id, start_time=datetime.datetime.now())
+        db.add(session)
+        seats_ids = db.execute(
+            insert(SeatsOrm).returning(SeatsOrm.id),
+            [
+                {"hall_id": hall.id, "row_number": row, "seat_number": seat, "price": 300}
+                for row in range(1, rows + 1)
+                for seat in range(1, seats_per_row + 1)
+            ]
+        ).scalars().all()
+        db.commit()
+
+        return {
+            "user_id": user.id,
+            "movie_id": movie.id,
+            "hall_id": hall.id,
+            "session_id": session.id,
+            "seats_ids": list(seats_ids),
+        }
+
+
+def drop_fixture(fixture: dict):
+    with SessionLocal() as db:
+        db.execute(delete(SeatsOrdersOrm).where(SeatsOrdersOrm.session_id == fixture["session_id"]))
+        db.execute(delete(OrdersOrm).where(OrdersOrm.session_id == fixture["session_id"]))
+        db.execute(delete(SessionsOrm).where(SessionsOrm.id == fixture["session_id"]))
+        db.execute(delete(SeatsOrm).where(SeatsOrm.hall_id == fixture["hall_id"]))
+        db.execute(delete(HallsOrm).where(HallsOrm.id == fixture["hall_id"]))
+        db.execute(delete(MoviesOrm).where(MoviesOrm.id == fixture["movie_id"]))
+        db.execute(delete(UsersOrm).where(UsersOrm.id == fixture["user_id"]))
+        db.commit()
+
+
+def run_client(fixture: dict, seats_per_order: int, attempts: int, seed: int, stats: dict, lock: threading.Lock):
+    rng = random.Random(seed)
+    booked = conflicts = 0
+    with SessionLocal() as db:
+        for _ in range(attempts):
+            order = OrderCreate(
+                seats_ids=rng.sample(fixture["seats_ids"], seats_per_order),
+                user_id=fixture["user_id"],
+                session_id=fixture["session_id"],
+                total_price=300 * seats_per_order,
+                info="booking benchmark"
+            )
+            try:
+                add_order(order, db)
+                booked += 1
+            except HTTPException:
+                conflicts += 1
+
+    with lock:
+        stats["booked"] += booked
+        stats["conflicts"] += conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent seat booking benchmark")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=50, help="Booking attempts per client")
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--seats-per-row", type=int, default=25)
+    parser.add_argument("--seats-per-order", type=int, default=2)
+    args = parser.parse_args()
+
+    fixture = create_fixture(args.rows, args.seats_per_row)
+    stats = {"booked": 0, "conflicts": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(fixture, args.seats_per_order, args.attempts, seed, stats, lock)
+        )
+        for seed in range(args.clients)
+    ]
+
+    try:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        drop_fixture(fixture)
+
+    attempts = stats["booked"] + stats["conflicts"]
+    print(json.dumps({
+        "clients": args.clients,
+        "seats": args.rows * args.seats_per_row,
+        "attempts": attempts,
+        "booked": stats["booked"],
+        "conflicts": stats["conflicts"],
+        "elapsed_s": round(elapsed, 3),
+        "attempts_per_s": round(attempts / elapsed, 1),
+        "bookings_per_s": round(stats["booked"] / elapsed, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
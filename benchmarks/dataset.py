@@ -0,0 +1,140 @@
+import argparse
+import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL
+
+from src.auth.jwt_auth.utils import hash_password
+from src.bulk_import import import_data
+from src.enums import AgeRating
+
+GENRES = 20
+
+
+def synthetic_sources(params: dict) -> dict:
+    """
+    Источники для src.bulk_import: строки генерируются лениво и сразу уходят в COPY.
+    Пользователь g: email user{g}@example.com, пароль password{g}; первый пользователь - администратор.
+    """
+    now = datetime.datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    users, movies, halls, sessions = params["users"], params["movies"], params["halls"], params["sessions"]
+    seats_per_row = params["seats_per_row"]
+    age_ratings = list(AgeRating)
+
+    def order_seats(order_id: int) -> list[tuple[int, int]]:
+        # Заказы сеанса занимают места подряд с начала зала, по два на заказ
+        first = 2 * ((order_id - 1) // sessions)
+        return [divmod(position, seats_per_row) for position in (first, first + 1)]
+
+    return {
+        "users": (
+            {
+                "id": g,
+                "email": f"user{g}@example.com",
+                "password_hash": hash_password(f"password{g}"),
+                "is_admin": g == 1,
+                "created_at": now - datetime.timedelta(seconds=g),
+            }
+            for g in range(1, users + 1)
+        ),
+        "genres": ({"id": g, "name": f"genre {g}"} for g in range(1, GENRES + 1)),
+        "movies": (
+            {
+                "id": g,
+                "title": f"Movie {g}",
+                "director": f"Director {g}",
+                "screenwriter": f"Writer {g}",
+                "actors": [f"Actor {g}", f"Actor {g + 1}"],
+                "description": "Description",
+                "trailer_url": "https://example.com/t",
+                "poster_url": "https://example.com/p",
+                "age_rating": age_ratings[g % len(age_ratings)],
+                "duration": 90 + g % 60,
+            }
+            for g in range(1, movies + 1)
+        ),
+        "movie_genres": (
+            {"movie_id": g, "genre_id": 1 + (g + shift) % GENRES}
+            for shift in (0, 7)
+            for g in range(1, movies + 1)
+        ),
+        "halls": (
+            {"id": g, "name": f"Hall {g}", "rows": params["rows"], "seats_per_row": seats_per_row,
+             "prices": [300, 400, 500]}
+            for g in range(1, halls + 1)
+        ),
+        "sessions": (
+            {
+                "id": g + 1,
+                "movie_id": 1 + g % movies,
+                "hall_id": 1 + g % halls,
+                "start_time": today + datetime.timedelta(hours=2 * (g % (params["weeks"] * 7 * 12))),
+            }
+            for g in range(sessions)
+        ),
+        "orders": (
+            {
+                "id": g + 1,
+                "user_id": 1 + (g * 7919) % users,
+                "session_id": 1 + g % sessions,
+                "total_price": 600,
+                "info": "Benchmark order",
+                "created_at": now - datetime.timedelta(seconds=g),
+                "seats": [(row + 1, seat + 1) for row, seat in order_seats(g + 1)],
+            }
+            for g in range(params["orders"])
+        ),
+    }
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser, **defaults):
+    """Параметры синтетического кинотеатра; defaults переопределяют значения по умолчанию для конкретного бенчмарка."""
+    values = {
+        "users": 200_000,
+        "movies": 500,
+        "halls": 12,
+        "rows": 15,
+        "seats_per_row": 20,
+        "weeks": 8,
+        "sessions": 5_000,
+        "orders": 300_000,
+        **defaults,
+    }
+    parser.add_argument("--users", type=int, default=values["users"])
+    parser.add_argument("--movies", type=int, default=values["movies"])
+    parser.add_argument("--halls", type=int, default=values["halls"])
+    parser.add_argument("--rows", type=int, default=values["rows"], help="Rows per hall")
+    parser.add_argument("--seats-per-row", type=int, default=values["seats_per_row"])
+    parser.add_argument("--weeks", type=int, default=values["weeks"], help="Weeks of sessions, 12 sessions a day")
+    parser.add_argument("--sessions", type=int, default=values["sessions"])
+    parser.add_argument("--orders", type=int, default=values["orders"], help="Historical orders, two seats each")
+
+
+def dataset_params(parser: argparse.ArgumentParser, args: argparse.Namespace) -> dict:
+    if 2 * args.orders > args.sessions * args.rows * args.seats_per_row:
+        parser.error("Not enough seats: orders * 2 must not exceed sessions * rows * seats-per-row")
+
+    return {
+        "users": args.users,
+        "movies": args.movies,
+        "halls": args.halls,
+        "rows": args.rows,
+        "seats_per_row": args.seats_per_row,
+        "weeks": args.weeks,
+        "sessions": args.sessions,
+        "orders": args.orders,
+    }
+
+
+def recreate_database(url: URL):
+    """Удаляет и заново создает базу url.database, подключаясь к служебной базе postgres того же сервера."""
+    admin_engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin_engine.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{url.database}" WITH (FORCE)'))
+        connection.execute(text(f'CREATE DATABASE "{url.database}"'))
+    admin_engine.dispose()
+
+
+def seed(engine, params: dict) -> dict:
+    return import_data(engine, synthetic_sources(params))
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict, deque
+
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, recreate_database, seed
+from benchmarks.load import FREE_SEATS_SQL
+
+
+def build_log(args, rng: random.Random) -> list[tuple]:
+    """Журнал запросов: чтение расписания, карточек сеансов, мест и жанров вперемешку с бронированиями горячих сеансов."""
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    first_hot = args.sessions // 2 + 1
+    hot_sessions = list(range(first_hot, first_hot + args.hot_sessions))
+    days = [today + datetime.timedelta(days=day) for day in range(args.days)]
+
+    log = []
+    for _ in range(args.requests):
+        kind = rng.choices(
+            ["sessions", "session", "seats", "genres", "order"],
+            weights=[35, 15, 30, 15, args.write_percent]
+        )[0]
+        if kind == "sessions":
+            day = rng.choice(days)
+            log.append(("GET", "/api/sessions", (
+                ("start_date", day.isoformat()),
+                ("end_date", (day + datetime.timedelta(days=1)).isoformat()),
+            )))
+        elif kind == "session":
+            log.append(("GET", f"/api/sessions/{rng.choice(hot_sessions)}", ()))
+        elif kind == "seats":
+            log.append(("GET", f"/api/sessions/{rng.choice(hot_sessions)}/seats", ()))
+        elif kind == "genres":
+            log.append(("GET", "/api/genres", ()))
+        else:
+            log.append(("POST", "/api/orders", rng.choice(hot_sessions)))
+    return log
+
+
+async def replay(client: httpx.AsyncClient, log: list[tuple], conditional: bool, free_seats: dict, token: str) -> dict:
+    from src.query_stats import query_budget
+
+    cookie = {"Cookie": f"access_token={token}"}
+    etags = {}
+    statuses = Counter()
+    body_bytes = 0
+
+    started = time.perf_counter()
+    with query_budget(max_queries=10 ** 9) as stats:
+        for method, path, params in log:
+            if method == "POST":
+                seat_id = free_seats[params].popleft()
+                response = await client.post(path, headers=cookie, json={
+                    "seats_ids": [seat_id], "user_id": 2, "session_id": params,
+                    "total_price": 300, "info": "ETag replay benchmark",
+                })
+            else:
+                key = (path, params)
+                headers = dict(cookie)
+                if conditional and key in etags:
+                    headers["If-None-Match"] = etags[key]
+                response = await client.get(path, params=params, headers=headers)
+                if "etag" in response.headers:
+                    etags[key] = response.headers["etag"]
+            statuses[response.status_code] += 1
+            body_bytes += len(response.content)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(log),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "body_bytes": body_bytes,
+        "db_queries": stats.count,
+        "db_ms": round(stats.seconds * 1000, 1),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def run(args, log: list[tuple], free_seats: dict) -> dict:
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/login", json={"email": "user2@example.com", "password": "password2"})
+            response.raise_for_status()
+            token = response.json()["data"]["token"]
+            client.cookies.clear()
+
+            await replay(client, log[:args.requests // 10], False, free_seats, token)
+            plain = await replay(client, log, False, free_seats, token)
+            conditional = await replay(client, log, True, free_seats, token)
+
+    return {
+        "plain": plain,
+        "conditional": conditional,
+        "saved_bytes_percent": round(100 * (1 - conditional["body_bytes"] / plain["body_bytes"]), 1),
+        "saved_queries_percent": round(100 * (1 - conditional["db_queries"] / plain["db_queries"]), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a request log with and without If-None-Match")
+    parser.add_argument("--database", default="cinema_etag", help="Scratch database, dropped and recreated")
+    add_dataset_arguments(parser, users=2_000, orders=20_000, sessions=2_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--hot-sessions", type=int, default=50, help="Sessions the log reads and books")
+    parser.add_argument("--days", type=int, default=7, help="Distinct schedule days the log requests")
+    parser.add_argument("--write-percent", type=float, default=2, help="Share of bookings in the log")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    dataset = dataset_params(parser, args)
+
+    os.environ["DB_NAME"] = args.database
+    # Все запросы идут от одного-двух пользователей: ограничение частоты исказило бы замеры
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    from src.database import connection_string, migrate
+
+    url = make_url(connection_string)
+    recreate_database(url)
+    migrate()
+    engine = create_engine(url)
+    seed(engine, dataset)
+
+    log = build_log(args, random.Random(args.seed))
+    free_seats = defaultdict(deque)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(FREE_SEATS_SQL),
+            {"first_session": args.sessions // 2, "limit": args.hot_sessions * args.rows * args.seats_per_row}
+        ).all()
+    engine.dispose()
+    for session_id, seat_id in rows:
+        free_seats[session_id].append(seat_id)
+
+    result = asyncio.run(run(args, log, free_seats))
+    print(json.dumps({"dataset": dataset, "requests": args.requests, "write_percent": args.write_percent, **result},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import datetime
+import json
+import statistics
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, recreate_database, seed
+from src.auth.jwt_auth.utils import hash_password
+from src.database import connection_string
+
+QUERIES = {
+    "login_by_email": (
+        "SELECT * FROM users WHERE email = :email",
+        lambda params: {"email": f"user{params['middle_user']}@example.com"},
+    ),
+    "login_by_password_hash": (
+        "SELECT password_hash FROM users WHERE password_hash = :password_hash LIMIT 1",
+        lambda params: {"password_hash": hash_password(f"password{params['middle_user']}")},
+    ),
+    "sessions_for_week": (
+        "SELECT * FROM sessions WHERE start_time BETWEEN :start AND :start + interval '7 days' "
+        "ORDER BY start_time, id",
+        lambda params: {"start": params["week_start"]},
+    ),
+    "sessions_for_movies": (
+        "SELECT * FROM sessions WHERE start_time BETWEEN :start AND :start + interval '7 days' "
+        "AND movie_id IN (1, 2, 3) ORDER BY start_time, id",
+        lambda params: {"start": params["week_start"]},
+    ),
+    "booked_seats_for_session": (
+        "SELECT seat_id FROM m2m_orders_seats WHERE session_id = :session_id",
+        lambda params: {"session_id": params["middle_session"]},
+    ),
+    "seats_for_orders": (
+        "SELECT m2m_orders_seats.order_id, seats.* FROM m2m_orders_seats "
+        "JOIN seats ON seats.id = m2m_orders_seats.seat_id WHERE m2m_orders_seats.order_id IN (1, 2, 3, 4, 5)",
+        lambda params: {},
+    ),
+    "user_orders_page": (
+        "SELECT * FROM orders WHERE user_id = :user_id ORDER BY created_at, id LIMIT 51",
+        lambda params: {"user_id": params["middle_user"]},
+    ),
+    "session_orders": (
+        "SELECT * FROM orders WHERE session_id = :session_id",
+        lambda params: {"session_id": params["middle_session"]},
+    ),
+    "movies_of_genre": (
+        "SELECT movie_id FROM m2m_movies_genres WHERE genre_id = 3",
+        lambda params: {},
+    ),
+    "genres_of_movie": (
+        "SELECT genre_id FROM m2m_movies_genres WHERE movie_id = 3",
+        lambda params: {},
+    ),
+    "hall_layout": (
+        "SELECT * FROM seats WHERE hall_id = 2 ORDER BY seat_number, row_number",
+        lambda params: {},
+    ),
+}
+
+def measure(connection, runs: int, params: dict) -> dict:
+    result = {}
+    for name, (sql, query_params) in QUERIES.items():
+        bound = query_params(params)
+        plan = connection.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), bound).scalar()[0]
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            connection.execute(text(sql), bound).all()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        result[name] = {
+            "plan": plan_nodes(plan["Plan"]),
+            "execution_ms": round(plan["Execution Time"], 3),
+            "p50_ms": round(statistics.median(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
+    return result
+
+
+def plan_nodes(node: dict) -> str:
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    elif "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    children = node.get("Plans", [])
+    if not children:
+        return label
+    return f"{label} ({', '.join(plan_nodes(child) for child in children)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and latency before and after the hot path indexes")
+    parser.add_argument("--database", default="cinema_bench", help="Scratch database, dropped and recreated")
+    add_dataset_arguments(parser)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    seed_params = dataset_params(parser, args)
+
+    database_url = make_url(connection_string).set(database=args.database)
+    recreate_database(database_url)
+
+    url = database_url.render_as_string(hide_password=False)
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "0002")
+
+    engine = create_engine(url)
+    started = time.perf_counter()
+    seed(engine, seed_params)
+    seed_seconds = time.perf_counter() - started
+
+    params = {
+        "middle_user": args.users // 2,
+        "middle_session": args.sessions // 2,
+        "week_start": datetime.datetime.now() + datetime.timedelta(days=7),
+    }
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        before = measure(connection, args.runs, params)
+
+    command.upgrade(config, "0003")
+
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        after = measure(connection, args.runs, params)
+    engine.dispose()
+
+    print(json.dumps({
+        "dataset": seed_params,
+        "seed_seconds": round(seed_seconds, 1),
+        "queries": {
+            name: {"before": before[name], "after": after[name]}
+            for name in QUERIES
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, recreate_database, seed
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = [
+    "sessions", "sessions_by_genre", "session_seats", "sessions_availability", "create_order", "login", "admin_users",
+    "admin_orders",
+]
+
+# Свободные места для create_order берутся из сеансов с конца расписания
+FREE_SEATS_SQL = """
+SELECT sessions.id, seats.id
+FROM sessions
+JOIN seats ON seats.hall_id = sessions.hall_id
+WHERE sessions.id > :first_session
+  AND NOT EXISTS (
+      SELECT 1 FROM m2m_orders_seats
+      WHERE m2m_orders_seats.session_id = sessions.id AND m2m_orders_seats.seat_id = seats.id
+  )
+ORDER BY sessions.id, seats.id
+LIMIT :limit
+"""
+
+
+class Scenario:
+    """Генератор запросов к одному эндпоинту: request(rng) возвращает (метод, путь, параметры httpx)."""
+
+    def __init__(self, dataset: dict, tokens: dict, free_seats: list[tuple[int, int]]):
+        self.dataset = dataset
+        self.tokens = tokens
+        self.free_seats = free_seats
+        self.today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def auth(self, role: str) -> dict:
+        return {"Cookie": f"access_token={self.tokens[role]}"}
+
+    def sessions(self, rng: random.Random):
+        day = self.today + datetime.timedelta(days=rng.randrange(self.dataset["weeks"] * 7))
+        return "GET", "/api/sessions", {
+            "params": {"start_date": day.isoformat(), "end_date": (day + datetime.timedelta(days=1)).isoformat()},
+            "headers": self.auth("user"),
+        }
+
+    def sessions_by_genre(self, rng: random.Random):
+        return "GET", "/api/sessions", {
+            "params": {"genres": f"genre {rng.randint(1, 20)}"},
+            "headers": self.auth("user"),
+        }
+
+    def session_seats(self, rng: random.Random):
+        return "GET", f"/api/sessions/{rng.randint(1, self.dataset['sessions'])}/seats", {
+            "headers": self.auth("user"),
+        }
+
+    def sessions_availability(self, rng: random.Random):
+        # Сводка для дневной страницы расписания: 12 сеансов подряд
+        first = rng.randint(1, self.dataset["sessions"] - 11)
+        return "GET", "/api/sessions/availability", {
+            "params": {"ids": ",".join(str(session_id) for session_id in range(first, first + 12))},
+            "headers": self.auth("user"),
+        }
+
+    def create_order(self, rng: random.Random):
+        first, second = self.free_seats.pop(), self.free_seats.pop()
+        seats_ids = [first[1], second[1]] if first[0] == second[0] else [first[1]]
+        return "POST", "/api/orders", {
+            "json": {
+                "seats_ids": seats_ids,
+                "user_id": 2,
+                "session_id": first[0],
+                "total_price": 300 * len(seats_ids),
+                "info": "Load benchmark",
+            },
+            "headers": self.auth("user"),
+        }
+
+    def login(self, rng: random.Random):
+        user = rng.randint(1, self.dataset["users"])
+        return "POST", "/api/auth/login", {
+            "json": {"email": f"user{user}@example.com", "password": f"password{user}"},
+        }
+
+    def admin_users(self, rng: random.Random):
+        return "GET", "/api/users", {"params": {"limit": 50}, "headers": self.auth("admin")}
+
+    def admin_orders(self, rng: random.Random):
+        return "GET", "/api/orders", {"params": {"limit": 50}, "headers": self.auth("admin")}
+
+
+async def run_endpoint(client: httpx.AsyncClient, scenario: Scenario, name: str, requests: int, concurrency: int,
+                       seed_value: int) -> dict:
+    make_request = getattr(scenario, name)
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(requests))
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed_value * 1000 + worker_id)
+        for _ in remaining:
+            method, path, kwargs = make_request(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as error:
+                statuses[type(error).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentiles[49], 2),
+        "p95_ms": round(percentiles[94], 2),
+        "p99_ms": round(percentiles[98], 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def login(client: httpx.AsyncClient, user: int) -> str:
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": f"user{user}@example.com", "password": f"password{user}"}
+    )
+    response.raise_for_status()
+    return response.json()["data"]["token"]
+
+
+async def drive(client: httpx.AsyncClient, args, dataset: dict, free_seats: list) -> dict:
+    tokens = {"admin": await login(client, 1), "user": await login(client, 2)}
+    client.cookies.clear()
+    scenario = Scenario(dataset, tokens, free_seats)
+
+    results = {}
+    for index, name in enumerate(args.endpoints):
+        if args.warmup:
+            await run_endpoint(client, scenario, name, args.warmup, args.concurrency, args.seed + index + 1000)
+        results[name] = await run_endpoint(client, scenario, name, args.requests, args.concurrency,
+                                           args.seed + index)
+    return results
+
+
+async def run_in_process(args, dataset: dict, free_seats: list) -> dict:
+    # Импорт после выставления DB_NAME: движки создаются при импорте src.database
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, args, dataset, free_seats)
+
+
+async def run_uvicorn(args, dataset: dict, free_seats: list) -> dict:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=ROOT,
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.2)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            return await drive(client, args, dataset, free_seats)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint throughput and latency against a synthetic cinema")
+    parser.add_argument("--database", default="cinema_load", help="Scratch database, dropped and recreated")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the database seeded by a previous run")
+    add_dataset_arguments(parser, users=20_000, orders=100_000)
+    parser.add_argument("--server", choices=["in-process", "uvicorn"], default="in-process")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    dataset = dataset_params(parser, args)
+
+    os.environ["DB_NAME"] = args.database
+    # Все запросы идут от одного-двух пользователей: ограничение частоты исказило бы замеры
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    from src.database import connection_string, migrate
+
+    url = make_url(connection_string)
+    seed_seconds = None
+    if not args.skip_seed:
+        recreate_database(url)
+        migrate()
+        engine = create_engine(url)
+        started = time.perf_counter()
+        seed(engine, dataset)
+        seed_seconds = round(time.perf_counter() - started, 1)
+        engine.dispose()
+
+    orders_needed = (args.requests + args.warmup) * 2 if "create_order" in args.endpoints else 0
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        free_seats = connection.execute(
+            text(FREE_SEATS_SQL),
+            {"first_session": args.sessions // 2, "limit": orders_needed}
+        ).all()
+    engine.dispose()
+    if len(free_seats) < orders_needed:
+        parser.error("Not enough free seats for create_order, increase --sessions or reduce --requests")
+    free_seats.reverse()
+
+    runner = run_in_process if args.server == "in-process" else run_uvicorn
+    started = time.perf_counter()
+    endpoints = asyncio.run(runner(args, dataset, [tuple(row) for row in free_seats]))
+
+    report = json.dumps({
+        "server": args.server,
+        "workers": args.workers if args.server == "uvicorn" else None,
+        "db_mode": os.getenv("DB_MODE", "sync"),
+        "concurrency": args.concurrency,
+        "dataset": dataset,
+        "seed_seconds": seed_seconds,
+        "elapsed_s": round(time.perf_counter() - started, 1),
+        "endpoints": endpoints,
+    }, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
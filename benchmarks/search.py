@@ -0,0 +1,127 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, recreate_database, seed
+from src.catalog import load_snapshot, deep_sizeof
+from src.database import connection_string
+from src.search import SearchIndex, words
+
+# Сканирование ilike, которое повторяет поиск индекса без ранжирования: каждое слово запроса
+# должно встретиться в названии, режиссере, актерах или жанрах
+ILIKE_WORD_SQL = (
+    "(movies.title ILIKE :{name} OR movies.director ILIKE :{name} "
+    "OR array_to_string(movies.actors, ' ') ILIKE :{name} "
+    "OR EXISTS (SELECT 1 FROM m2m_movies_genres JOIN genres ON genres.id = m2m_movies_genres.genre_id "
+    "WHERE m2m_movies_genres.movie_id = movies.id AND genres.name ILIKE :{name}))"
+)
+# Прежний фильтр по жанрам: все условия на одной строке соединения, поэтому два жанра не находят ничего
+OLD_GENRES_SQL = (
+    "SELECT DISTINCT movies.id, movies.title FROM movies "
+    "JOIN m2m_movies_genres ON m2m_movies_genres.movie_id = movies.id "
+    "JOIN genres ON genres.id = m2m_movies_genres.genre_id "
+    "WHERE {conditions} ORDER BY movies.title LIMIT :limit"
+)
+
+
+def ilike_search(connection, query: str, limit: int) -> list:
+    terms = words(query)
+    conditions = " AND ".join(ILIKE_WORD_SQL.format(name=f"term{position}") for position in range(len(terms)))
+    sql = f"SELECT movies.id, movies.title FROM movies WHERE {conditions} ORDER BY movies.title LIMIT :limit"
+    params = {f"term{position}": f"%{term}%" for position, term in enumerate(terms)}
+    return connection.execute(text(sql), {**params, "limit": limit}).all()
+
+
+def old_genres_search(connection, genres: list[str], limit: int) -> list:
+    conditions = " AND ".join(f"genres.name ILIKE :genre{position}" for position in range(len(genres)))
+    params = {f"genre{position}": f"%{genre}%" for position, genre in enumerate(genres)}
+    return connection.execute(text(OLD_GENRES_SQL.format(conditions=conditions)), {**params, "limit": limit}).all()
+
+
+def timed(function, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "results": len(result),
+        "p50_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process movie search index against ilike scans")
+    parser.add_argument("--database", default="cinema_search", help="Scratch database, dropped and recreated")
+    add_dataset_arguments(parser, users=100, movies=100_000, halls=2, sessions=100, orders=0)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    seed_params = dataset_params(parser, args)
+
+    database_url = make_url(connection_string).set(database=args.database)
+    recreate_database(database_url)
+
+    url = database_url.render_as_string(hide_password=False)
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    seed(engine, seed_params)
+
+    with Session(engine) as db:
+        started = time.perf_counter()
+        snapshot = load_snapshot(db, 1)
+        snapshot_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    SearchIndex(list(snapshot.movies.values()))
+    index_seconds = time.perf_counter() - started
+
+    middle = args.movies // 2
+    queries = {
+        "title": f"Movie {middle}",
+        "title_word_prefix": f"movie {middle // 10}",
+        "actor": f"Actor {middle}",
+        "director_and_genre": f"director {middle} genre",
+        "rare_prefix": f"{middle // 100}",
+        "no_match": "nonexistent",
+    }
+    genres = ["genre 3", "genre 10"]
+
+    result = {}
+    with engine.connect() as connection:
+        for name, query in queries.items():
+            result[name] = {
+                "query": query,
+                "ilike": timed(lambda: ilike_search(connection, query, args.limit), args.runs),
+                "index": timed(lambda: snapshot.search_movies(query, [], args.limit), args.runs),
+            }
+        result["two_genres"] = {
+            "query": genres,
+            "ilike": timed(lambda: old_genres_search(connection, genres, args.limit), args.runs),
+            "index": timed(lambda: snapshot.search_movies("", genres, args.limit), args.runs),
+        }
+    engine.dispose()
+
+    print(json.dumps({
+        "dataset": seed_params,
+        "catalog_load_seconds": round(snapshot_seconds, 2),
+        "index_build_seconds": round(index_seconds, 2),
+        "index_memory_bytes": deep_sizeof(snapshot.search_index),
+        "queries": result,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
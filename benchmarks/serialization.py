@@ -0,0 +1,159 @@
+import argparse
+import datetime
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.catalog import CatalogSnapshot
+from src.crud import sessions_payload
+from src.enums import AgeRating
+from src.occupancy import SeatOccupancyCache, SessionOccupancy
+from src.responses import ORJSONResponse
+from src.schemas import Genre, Hall, MovieWithGenres, Seat, SeatWithInfo, SessionDetailed
+
+
+def build_snapshot(seats_count: int, movies_count: int, halls_count: int) -> CatalogSnapshot:
+    genres = [Genre(id=g, name=f"genre {g}") for g in range(1, 21)]
+    movies = [
+        MovieWithGenres(
+            id=g,
+            title=f"Movie {g}",
+            director=f"Director {g}",
+            screenwriter=f"Writer {g}",
+            genres=[f"genre {1 + g % 20}", f"genre {1 + (g + 7) % 20}"],
+            actors=[f"Actor {g}", f"Actor {g + 1}"],
+            description="Description " * 20,
+            trailer_url="https://example.com/t",
+            poster_url="https://example.com/p",
+            age_rating=list(AgeRating)[g % 5],
+            duration=90 + g % 60
+        )
+        for g in range(1, movies_count + 1)
+    ]
+    halls = [Hall(id=h, name=f"Hall {h}", total_seats=seats_count) for h in range(1, halls_count + 1)]
+    seats = [
+        Seat(id=i + 1, hall_id=1, row_number=1 + i // 25, seat_number=1 + i % 25, price=300 + 100 * (i // 200))
+        for i in range(seats_count)
+    ]
+    return CatalogSnapshot(movies, genres, halls, seats, version=1)
+
+
+def old_seats(snapshot: CatalogSnapshot, booked: set[int]) -> bytes:
+    """Путь до перехода на ORJSONResponse: SeatWithInfo из crud, словарь в роутере, jsonable_encoder, json.dumps."""
+    seats = [
+        SeatWithInfo(**seat.model_dump(), is_available=seat.id not in booked)
+        for seat in snapshot.layouts[1].seats
+    ]
+    content = {
+        "data": [
+            {
+                "id": seat.id,
+                "hallId": seat.hall_id,
+                "rowNumber": seat.row_number,
+                "seatNumber": seat.seat_number,
+                "price": seat.price,
+                "isAvailable": seat.is_available
+            }
+            for seat in seats
+        ]
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_seats(cache: SeatOccupancyCache) -> bytes:
+    return ORJSONResponse({"data": cache.get_seats(1, None)}).body
+
+
+def old_sessions(snapshot: CatalogSnapshot, rows: list[tuple]) -> bytes:
+    sessions = [
+        SessionDetailed(
+            id=id,
+            movie=snapshot.movies[movie_id],
+            hall=snapshot.halls[hall_id],
+            start_time=start_time
+        )
+        for id, movie_id, hall_id, start_time, _ in rows
+    ]
+    content = {
+        "data": [
+            {
+                "id": session.id,
+                "movie": {
+                    "id": session.movie.id,
+                    "title": session.movie.title,
+                    "director": session.movie.director,
+                    "screenwriter": session.movie.screenwriter,
+                    "actors": session.movie.actors,
+                    "description": session.movie.description,
+                    "trailerUrl": session.movie.trailer_url,
+                    "posterUrl": session.movie.poster_url,
+                    "ageRating": session.movie.age_rating,
+                    "duration": session.movie.duration
+                },
+                "hall": session.hall,
+                "startTime": session.start_time,
+                "remainingSeats": remaining_seats
+            }
+            for session, (*_, remaining_seats) in zip(sessions, rows)
+        ]
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_sessions(snapshot: CatalogSnapshot, rows: list[tuple]) -> bytes:
+    return ORJSONResponse({"data": sessions_payload(rows, snapshot)}).body
+
+
+def measure(fn, runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "min_ms": round(timings[0], 3),
+        "bytes": len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization: pydantic + jsonable_encoder vs orjson payloads")
+    parser.add_argument("--seats", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    snapshot = build_snapshot(args.seats, movies_count=100, halls_count=12)
+    booked = set(rng.sample(range(1, args.seats + 1), args.seats // 3))
+
+    cache = SeatOccupancyCache(max_bytes=1024 * 1024)
+    cache._store(1, SessionOccupancy(snapshot.layouts[1], None, booked))
+
+    start = datetime.datetime(2026, 10, 18, 10, 0)
+    rows = [
+        (i, 1 + i % 100, 1 + i % 12, start + datetime.timedelta(minutes=30 * i), 100)
+        for i in range(1, args.sessions + 1)
+    ]
+
+    cases = {
+        "seats": (lambda: old_seats(snapshot, booked), lambda: new_seats(cache)),
+        "sessions": (lambda: old_sessions(snapshot, rows), lambda: new_sessions(snapshot, rows)),
+    }
+    result = {}
+    for name, (old, new) in cases.items():
+        if json.loads(old()) != json.loads(new()):
+            raise AssertionError(f"{name}: responses differ")
+        before, after = measure(old, args.runs), measure(new, args.runs)
+        result[name] = {"before": before, "after": after, "speedup": round(before["p50_ms"] / after["p50_ms"], 1)}
+
+    print(json.dumps({"seats": args.seats, "sessions": args.sessions, "results": result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
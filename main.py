@@ -1,12 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
+from src.analytics import MERGE_INTERVAL, merge_periodically
+from src.catalog import catalog
+from src.database import open_db, replica_host, run_db
+from src.idempotency import PURGE_INTERVAL, purge_periodically
+from src.query_stats import DEBUG, QueryStatsMiddleware
+from src.replica import PrimaryStickinessMiddleware
 from src.routers.api_router import router as api_router
+from src.schedule import REFRESH_INTERVAL, refresh_pending, refresh_periodically
+from src.seat_holds import SWEEP_INTERVAL, sweep_periodically
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with open_db() as db:
+        await run_db(db, catalog.reload)
+        await run_db(db, refresh_pending)
+
+    refresher = asyncio.create_task(refresh_periodically(REFRESH_INTERVAL)) if REFRESH_INTERVAL else None
+    sweeper = asyncio.create_task(sweep_periodically(SWEEP_INTERVAL)) if SWEEP_INTERVAL else None
+    purger = asyncio.create_task(purge_periodically(PURGE_INTERVAL)) if PURGE_INTERVAL else None
+    merger = asyncio.create_task(merge_periodically(MERGE_INTERVAL)) if MERGE_INTERVAL else None
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    if sweeper is not None:
+        sweeper.cancel()
+    if purger is not None:
+        purger.cancel()
+    if merger is not None:
+        merger.cancel()
+
 
 app = FastAPI(
     title="Cinema",
     description="API для работы с базой данных кинотеатра",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router)
@@ -19,5 +53,11 @@ app.add_middleware(
     allow_credentials=True,
 )
 
+if DEBUG:
+    app.add_middleware(QueryStatsMiddleware)
+
+if replica_host:
+    app.add_middleware(PrimaryStickinessMiddleware)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
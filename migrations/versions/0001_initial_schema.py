@@ -0,0 +1,104 @@
+"""initial schema
+
+Схема в том виде, в каком ее создавал Base.metadata.create_all до появления миграций.
+Существующую базу, созданную через create_tables(), достаточно пометить этой ревизией: alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "movies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("director", sa.String(), nullable=False),
+        sa.Column("screenwriter", sa.String(), nullable=False),
+        sa.Column("actors", sa.ARRAY(sa.String()), nullable=False),
+        sa.Column("description", sa.String(), nullable=False),
+        sa.Column("trailer_url", sa.String(), nullable=False),
+        sa.Column("poster_url", sa.String(), nullable=False),
+        sa.Column(
+            "age_rating",
+            sa.Enum("AGE_0", "AGE_6", "AGE_12", "AGE_16", "AGE_18", name="agerating"),
+            nullable=False
+        ),
+        sa.Column("duration", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "genres",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "m2m_movies_genres",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id"), nullable=False),
+        sa.Column("genre_id", sa.Integer(), sa.ForeignKey("genres.id"), nullable=False),
+    )
+    op.create_table(
+        "halls",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("total_seats", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "seats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("hall_id", sa.Integer(), sa.ForeignKey("halls.id"), nullable=False),
+        sa.Column("row_number", sa.Integer(), nullable=False),
+        sa.Column("seat_number", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id"), nullable=False),
+        sa.Column("hall_id", sa.Integer(), sa.ForeignKey("halls.id"), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("sessions.id"), nullable=False),
+        sa.Column("total_price", sa.Integer(), nullable=False),
+        sa.Column("info", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "m2m_orders_seats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("seat_id", sa.Integer(), sa.ForeignKey("seats.id"), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("m2m_orders_seats")
+    op.drop_table("orders")
+    op.drop_table("users")
+    op.drop_table("sessions")
+    op.drop_table("seats")
+    op.drop_table("halls")
+    op.drop_table("m2m_movies_genres")
+    op.drop_table("genres")
+    op.drop_table("movies")
+    sa.Enum(name="agerating").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,82 @@
+"""session scoped seat bookings
+
+Место может быть продано только один раз на сеанс: в m2m_orders_seats добавляется session_id
+с уникальным ключом (session_id, seat_id).
+
+Старый код мог продать одно место на сеанс дважды. Если такие продажи есть, миграция останавливается
+со списком мест и заказов, не меняя схему. Решить конфликт можно вручную или запуском
+    alembic -x duplicate_seats=keep-first upgrade head
+который оставляет место за самым ранним заказом и удаляет его из остальных (суммы заказов не пересчитываются).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+import logging
+
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+DUPLICATES_SQL = """
+SELECT session_id, seat_id, array_agg(order_id ORDER BY order_id) AS orders_ids
+FROM m2m_orders_seats
+GROUP BY session_id, seat_id
+HAVING count(*) > 1
+ORDER BY session_id, seat_id
+"""
+
+# Оставляет каждое место сеанса за заказом с наименьшим id
+KEEP_FIRST_SQL = """
+DELETE FROM m2m_orders_seats
+USING m2m_orders_seats AS first
+WHERE first.session_id = m2m_orders_seats.session_id
+  AND first.seat_id = m2m_orders_seats.seat_id
+  AND first.order_id < m2m_orders_seats.order_id
+"""
+
+
+def resolve_duplicates():
+    duplicates = op.get_bind().execute(sa.text(DUPLICATES_SQL)).all()
+    if not duplicates:
+        return
+
+    report = "\n".join(
+        f"  session {session_id}, seat {seat_id}: orders {', '.join(map(str, orders_ids))}"
+        for session_id, seat_id, orders_ids in duplicates
+    )
+    if context.get_x_argument(as_dictionary=True).get("duplicate_seats") != "keep-first":
+        raise RuntimeError(
+            f"{len(duplicates)} seats are sold more than once per session, "
+            f"resolve them or rerun with -x duplicate_seats=keep-first:\n{report}"
+        )
+    logger.warning("Keeping the earliest order for %d seats sold more than once:\n%s", len(duplicates), report)
+    op.execute(KEEP_FIRST_SQL)
+
+
+def upgrade():
+    op.add_column("m2m_orders_seats", sa.Column("session_id", sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE m2m_orders_seats SET session_id = orders.session_id "
+        "FROM orders WHERE orders.id = m2m_orders_seats.order_id"
+    )
+    op.alter_column("m2m_orders_seats", "session_id", nullable=False)
+    resolve_duplicates()
+    op.create_foreign_key(
+        "m2m_orders_seats_session_id_fkey", "m2m_orders_seats", "sessions", ["session_id"], ["id"]
+    )
+    op.create_unique_constraint(
+        "m2m_orders_seats_session_id_seat_id_key", "m2m_orders_seats", ["session_id", "seat_id"]
+    )
+
+
+def downgrade():
+    op.drop_constraint("m2m_orders_seats_session_id_seat_id_key", "m2m_orders_seats")
+    op.drop_constraint("m2m_orders_seats_session_id_fkey", "m2m_orders_seats")
+    op.drop_column("m2m_orders_seats", "session_id")
@@ -0,0 +1,43 @@
+"""hot path indexes
+
+Индексы под горячие запросы: вход по email/password_hash, выборка сеансов по времени и фильмам,
+заказы пользователя и сеанса, места заказа, связи фильмов и жанров в обе стороны, места зала.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_password_hash", "users", ["password_hash"])
+    op.create_index("ix_sessions_start_time", "sessions", ["start_time"])
+    op.create_index("ix_sessions_movie_id_start_time", "sessions", ["movie_id", "start_time"])
+    op.create_index("ix_orders_session_id", "orders", ["session_id"])
+    op.create_index("ix_orders_user_id_created_at", "orders", ["user_id", "created_at", "id"])
+    op.create_index("ix_m2m_orders_seats_order_id", "m2m_orders_seats", ["order_id"])
+    op.create_unique_constraint(
+        "m2m_movies_genres_movie_id_genre_id_key", "m2m_movies_genres", ["movie_id", "genre_id"]
+    )
+    op.create_index("ix_m2m_movies_genres_genre_id_movie_id", "m2m_movies_genres", ["genre_id", "movie_id"])
+    op.create_index("ix_seats_hall_id", "seats", ["hall_id"])
+
+
+def downgrade():
+    op.drop_index("ix_seats_hall_id", "seats")
+    op.drop_index("ix_m2m_movies_genres_genre_id_movie_id", "m2m_movies_genres")
+    op.drop_constraint("m2m_movies_genres_movie_id_genre_id_key", "m2m_movies_genres")
+    op.drop_index("ix_m2m_orders_seats_order_id", "m2m_orders_seats")
+    op.drop_index("ix_orders_user_id_created_at", "orders")
+    op.drop_index("ix_orders_session_id", "orders")
+    op.drop_index("ix_sessions_movie_id_start_time", "sessions")
+    op.drop_index("ix_sessions_start_time", "sessions")
+    op.drop_index("ix_users_password_hash", "users")
+    op.drop_index("ix_users_email", "users")
@@ -0,0 +1,56 @@
+"""schedule read model
+
+Денормализованное расписание для списка сеансов: строка на сеанс с полями фильма, массивом жанров,
+залом и числом свободных мест. Заполняется приложением (src/schedule.py) при старте.
+Индекс по start_time покрывает колонки списка сеансов, чтобы выборка за период шла только по индексу.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "schedule",
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("movie_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("director", sa.String(), nullable=False),
+        sa.Column("screenwriter", sa.String(), nullable=False),
+        sa.Column("genres", sa.ARRAY(sa.String()), nullable=False),
+        sa.Column("actors", sa.ARRAY(sa.String()), nullable=False),
+        sa.Column("description", sa.String(), nullable=False),
+        sa.Column("trailer_url", sa.String(), nullable=False),
+        sa.Column("poster_url", sa.String(), nullable=False),
+        sa.Column(
+            "age_rating",
+            postgresql.ENUM("AGE_0", "AGE_6", "AGE_12", "AGE_16", "AGE_18", name="agerating", create_type=False),
+            nullable=False
+        ),
+        sa.Column("duration", sa.Integer(), nullable=False),
+        sa.Column("hall_id", sa.Integer(), nullable=False),
+        sa.Column("hall_name", sa.String(), nullable=False),
+        sa.Column("hall_total_seats", sa.Integer(), nullable=False),
+        sa.Column("remaining_seats", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_schedule_start_time", "schedule", ["start_time", "session_id"],
+        postgresql_include=["movie_id", "hall_id", "remaining_seats"]
+    )
+    op.create_index("ix_schedule_movie_id_start_time", "schedule", ["movie_id", "start_time"])
+
+
+def downgrade():
+    op.drop_index("ix_schedule_movie_id_start_time", "schedule")
+    op.drop_index("ix_schedule_start_time", "schedule")
+    op.drop_table("schedule")
@@ -0,0 +1,43 @@
+"""sales daily rollup
+
+Продажи по дню сеанса, фильму и залу: заказы, проданные места и выручка.
+Приложение обновляет строки при создании и удалении заказа (src/analytics.py), здесь они заполняются по истории.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("movie_id", sa.Integer(), primary_key=True),
+        sa.Column("hall_id", sa.Integer(), primary_key=True),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("seats_sold", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.BigInteger(), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO sales_daily (day, movie_id, hall_id, orders, seats_sold, revenue)
+        SELECT sessions.start_time::date, sessions.movie_id, sessions.hall_id,
+               count(*), COALESCE(sum(order_seats.count), 0), sum(orders.total_price)
+        FROM orders
+        JOIN sessions ON sessions.id = orders.session_id
+        LEFT JOIN (
+            SELECT order_id, count(*) FROM m2m_orders_seats GROUP BY order_id
+        ) AS order_seats ON order_seats.order_id = orders.id
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade():
+    op.drop_table("sales_daily")
@@ -0,0 +1,37 @@
+"""seat holds
+
+Временные удержания мест на время оформления заказа - общие для всех воркеров при SEAT_HOLDS_STORE=db
+(src/seat_holds.py). Одно место сеанса может удерживаться только одним удержанием.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "seat_holds",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("seat_id", sa.Integer(), sa.ForeignKey("seats.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("hold_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("session_id", "seat_id"),
+    )
+    op.create_index("ix_seat_holds_hold_id", "seat_holds", ["hold_id"])
+    op.create_index("ix_seat_holds_expires_at", "seat_holds", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_seat_holds_expires_at", table_name="seat_holds")
+    op.drop_index("ix_seat_holds_hold_id", table_name="seat_holds")
+    op.drop_table("seat_holds")
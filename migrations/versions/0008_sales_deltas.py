@@ -0,0 +1,44 @@
+"""sales deltas
+
+Вклады заказов и отмен в итоги продаж. Заказ только добавляет строку сюда, не трогая общую строку sales_daily
+своего дня, фильма и зала; фоновая задача переносит накопленные вклады в sales_daily (src/analytics.py).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sales_deltas",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("movie_id", sa.Integer(), nullable=False),
+        sa.Column("hall_id", sa.Integer(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("seats_sold", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade():
+    # Неперенесенные вклады не теряются
+    op.execute("""
+        INSERT INTO sales_daily (day, movie_id, hall_id, orders, seats_sold, revenue)
+        SELECT day, movie_id, hall_id, sum(orders), sum(seats_sold), sum(revenue)
+        FROM sales_deltas
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, movie_id, hall_id) DO UPDATE SET
+            orders = sales_daily.orders + EXCLUDED.orders,
+            seats_sold = sales_daily.seats_sold + EXCLUDED.seats_sold,
+            revenue = sales_daily.revenue + EXCLUDED.revenue
+    """)
+    op.drop_table("sales_deltas")
@@ -0,0 +1,93 @@
+"""schedule incremental refresh
+
+Расписание больше не копирует поля фильма и зала: список сеансов берет их из каталога в памяти.
+Изменение сеанса в БД помечает его строку расписания устаревшей (stale), и фоновое обновление пересчитывает
+только такие строки и сеансы без строки (src/schedule.py). schedule_state.generation растет с каждым
+обновлением, изменившим строки: по нему остальные воркеры узнают, что расписание поменялось.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+COPIED_COLUMNS = (
+    "title", "director", "screenwriter", "genres", "actors", "description", "trailer_url", "poster_url",
+    "age_rating", "duration", "hall_name", "hall_total_seats",
+)
+
+
+def upgrade():
+    for column in COPIED_COLUMNS:
+        op.drop_column("schedule", column)
+    op.add_column("schedule", sa.Column("stale", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.create_table(
+        "schedule_state",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("generation", sa.BigInteger(), nullable=False),
+    )
+    op.execute("INSERT INTO schedule_state (id, generation) VALUES (1, 0)")
+
+    op.execute("""
+        CREATE FUNCTION mark_schedule_stale() RETURNS trigger AS $$
+        BEGIN
+            UPDATE schedule SET stale = true WHERE session_id = NEW.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER sessions_mark_schedule_stale
+        AFTER UPDATE OF start_time, movie_id, hall_id ON sessions
+        FOR EACH ROW
+        WHEN ((OLD.start_time, OLD.movie_id, OLD.hall_id) IS DISTINCT FROM (NEW.start_time, NEW.movie_id, NEW.hall_id))
+        EXECUTE FUNCTION mark_schedule_stale()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER sessions_mark_schedule_stale ON sessions")
+    op.execute("DROP FUNCTION mark_schedule_stale()")
+    op.drop_table("schedule_state")
+    op.drop_column("schedule", "stale")
+
+    op.add_column("schedule", sa.Column("title", sa.String()))
+    op.add_column("schedule", sa.Column("director", sa.String()))
+    op.add_column("schedule", sa.Column("screenwriter", sa.String()))
+    op.add_column("schedule", sa.Column("genres", sa.ARRAY(sa.String())))
+    op.add_column("schedule", sa.Column("actors", sa.ARRAY(sa.String())))
+    op.add_column("schedule", sa.Column("description", sa.String()))
+    op.add_column("schedule", sa.Column("trailer_url", sa.String()))
+    op.add_column("schedule", sa.Column("poster_url", sa.String()))
+    op.add_column("schedule", sa.Column(
+        "age_rating",
+        postgresql.ENUM("AGE_0", "AGE_6", "AGE_12", "AGE_16", "AGE_18", name="agerating", create_type=False)
+    ))
+    op.add_column("schedule", sa.Column("duration", sa.Integer()))
+    op.add_column("schedule", sa.Column("hall_name", sa.String()))
+    op.add_column("schedule", sa.Column("hall_total_seats", sa.Integer()))
+    op.execute("""
+        UPDATE schedule SET
+            title = movies.title, director = movies.director, screenwriter = movies.screenwriter,
+            genres = COALESCE(movie_genres.names, '{}'), actors = movies.actors, description = movies.description,
+            trailer_url = movies.trailer_url, poster_url = movies.poster_url, age_rating = movies.age_rating,
+            duration = movies.duration, hall_name = halls.name, hall_total_seats = halls.total_seats
+        FROM movies
+        JOIN halls ON true
+        LEFT JOIN (
+            SELECT m2m_movies_genres.movie_id, array_agg(genres.name ORDER BY m2m_movies_genres.id) AS names
+            FROM m2m_movies_genres JOIN genres ON genres.id = m2m_movies_genres.genre_id
+            GROUP BY m2m_movies_genres.movie_id
+        ) AS movie_genres ON movie_genres.movie_id = movies.id
+        WHERE movies.id = schedule.movie_id AND halls.id = schedule.hall_id
+    """)
+    for column in COPIED_COLUMNS:
+        op.alter_column("schedule", column, nullable=False)
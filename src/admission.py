@@ -0,0 +1,176 @@
+"""
+Ограничение частоты запросов и сброс нагрузки на эндпоинтах бронирования и расписания.
+
+У каждого пользователя (без авторизации - у IP-адреса) на каждый класс эндпоинтов свой token bucket:
+rate запросов в секунду в среднем и до burst подряд, сверх этого - 429. Кроме того, одновременно выполняется
+не больше ADMISSION_MAX_CONCURRENCY запросов (по умолчанию - размер пула соединений с overflow): лишние
+получают 503 сразу, а не ждут соединения из пула до таймаута. В обоих ответах есть Retry-After.
+"""
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from fastapi import Depends, HTTPException, Request, status
+
+from src.auth.service import get_current_auth_user_info
+from src.database import pool_settings
+from src.schemas import UserInfo
+
+SEATS = "seats"
+ORDERS = "orders"
+LISTING = "listing"
+
+# Таблица корзин чистится от заполненных (простаивающих) корзин, когда вырастает вдвое с прошлой чистки
+MIN_PRUNE_SIZE = 1024
+
+
+def env_limit(route_class: str, rate: float, burst: float) -> tuple[float, float]:
+    prefix = f"ADMISSION_{route_class.upper()}"
+    return float(os.getenv(f"{prefix}_RATE", rate)), float(os.getenv(f"{prefix}_BURST", burst))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class AdmissionControl:
+    """
+    Token bucket на (класс эндпоинтов, пользователь) и общий предел одновременных запросов.
+    Класс с rate 0 не ограничивается по частоте, max_concurrency 0 снимает предел одновременных запросов.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]], max_concurrency: int, enabled: bool = True):
+        self.limits = limits
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.admitted = Counter()
+        self.rate_limited = Counter()
+        self.shed = Counter()
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._prune_at = MIN_PRUNE_SIZE
+        self._lock = threading.Lock()
+
+    def limit(self, route_class: str, concurrent: bool = True):
+        """
+        Зависимость FastAPI для эндпоинта класса route_class. concurrent=False - только ограничение частоты,
+        для долгих запросов вроде потоков SSE, которые не держат соединение с БД.
+        """
+        async def admit(request: Request, user: UserInfo = Depends(get_current_auth_user_info)):
+            if not self.enabled:
+                yield
+                return
+
+            if isinstance(user, UserInfo):
+                key = f"user:{user.id}"
+            else:
+                key = f"ip:{request.client.host if request.client else ''}"
+            self.take(route_class, key)
+            if not concurrent:
+                self.count(route_class)
+                yield
+                return
+
+            self.acquire(route_class)
+            try:
+                yield
+            finally:
+                self.release()
+
+        return admit
+
+    def take(self, route_class: str, key: str):
+        """Берет токен из корзины; если корзина пуста - 429 с временем до появления токена."""
+        rate, burst = self.limits[route_class]
+        if not rate:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((route_class, key))
+            if bucket is None:
+                bucket = self._buckets[(route_class, key)] = TokenBucket(burst, now)
+                if len(self._buckets) > self._prune_at:
+                    self._prune(now)
+            else:
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+                bucket.updated_at = now
+
+            if bucket.tokens < 1:
+                self.rate_limited[route_class] += 1
+                retry_after = math.ceil((1 - bucket.tokens) / rate)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(retry_after)}
+                )
+            bucket.tokens -= 1
+
+    def acquire(self, route_class: str):
+        with self._lock:
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                self.shed[route_class] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is overloaded, retry later",
+                    headers={"Retry-After": "1"}
+                )
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.admitted[route_class] += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def count(self, route_class: str):
+        with self._lock:
+            self.admitted[route_class] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "inFlight": self.in_flight,
+                "maxInFlight": self.max_in_flight,
+                "maxConcurrency": self.max_concurrency,
+                "buckets": len(self._buckets),
+                "routeClasses": [
+                    {
+                        "routeClass": route_class,
+                        "rate": rate,
+                        "burst": burst,
+                        "admitted": self.admitted[route_class],
+                        "rateLimited": self.rate_limited[route_class],
+                        "shed": self.shed[route_class],
+                    }
+                    for route_class, (rate, burst) in self.limits.items()
+                ],
+            }
+
+    def _prune(self, now: float):
+        self._buckets = {
+            (route_class, key): bucket for (route_class, key), bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated_at) * self.limits[route_class][0] < self.limits[route_class][1]
+        }
+        self._prune_at = max(MIN_PRUNE_SIZE, 2 * len(self._buckets))
+
+
+admission = AdmissionControl(
+    limits={
+        SEATS: env_limit(SEATS, rate=10, burst=30),
+        ORDERS: env_limit(ORDERS, rate=2, burst=10),
+        LISTING: env_limit(LISTING, rate=10, burst=30),
+    },
+    max_concurrency=int(os.getenv(
+        "ADMISSION_MAX_CONCURRENCY", pool_settings["pool_size"] + max(pool_settings["max_overflow"], 0)
+    )),
+    enabled=os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
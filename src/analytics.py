@@ -0,0 +1,190 @@
+"""
+Аналитика продаж по дню сеанса, фильму и залу.
+
+Заказ и отмена в своей транзакции только добавляют строку-вклад в sales_deltas: общая строка sales_daily дня,
+фильма и зала не блокируется, и заказы на популярный сеанс не ждут друг друга. Фоновая задача раз
+в SALES_MERGE_INTERVAL секунд переносит вклады в sales_daily, отчеты складывают итоги с еще не перенесенными
+вкладами и не сканируют заказы. Пересчет по всей истории - после загрузки заказов в обход API:
+
+    python -m src.analytics
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+from sqlalchemy import select, func, text, cast, Date, union_all
+from sqlalchemy.orm import Session
+
+from src.catalog import catalog
+from src.database import open_db, run_db
+from src.enums import AnalyticsGroup
+from src.models import SalesDailyOrm, SalesDeltasOrm, ScheduleOrm
+
+logger = logging.getLogger(__name__)
+
+MERGE_INTERVAL = float(os.getenv("SALES_MERGE_INTERVAL", 10))
+
+RECORD_SQL = text("""
+INSERT INTO sales_deltas (day, movie_id, hall_id, orders, seats_sold, revenue)
+SELECT start_time::date, movie_id, hall_id, :orders, :seats, :revenue FROM sessions WHERE id = :session_id
+""")
+
+# Забирает закоммиченные вклады и прибавляет их к итогам одним запросом. Вклады, закоммиченные во время переноса,
+# не видны DELETE и останутся до следующего; параллельный перенос в другом воркере дождется блокировок строк
+# и пропустит уже удаленные - вклад не учитывается дважды
+MERGE_SQL = text("""
+WITH merged AS (
+    DELETE FROM sales_deltas RETURNING day, movie_id, hall_id, orders, seats_sold, revenue
+)
+INSERT INTO sales_daily (day, movie_id, hall_id, orders, seats_sold, revenue)
+SELECT day, movie_id, hall_id, sum(orders), sum(seats_sold), sum(revenue)
+FROM merged
+GROUP BY 1, 2, 3
+ON CONFLICT (day, movie_id, hall_id) DO UPDATE SET
+    orders = sales_daily.orders + EXCLUDED.orders,
+    seats_sold = sales_daily.seats_sold + EXCLUDED.seats_sold,
+    revenue = sales_daily.revenue + EXCLUDED.revenue
+""")
+
+SALES_COLUMNS = ("day", "movie_id", "hall_id", "orders", "seats_sold", "revenue")
+
+BACKFILL_SQL = text("""
+INSERT INTO sales_daily (day, movie_id, hall_id, orders, seats_sold, revenue)
+SELECT sessions.start_time::date, sessions.movie_id, sessions.hall_id,
+       count(*), COALESCE(sum(order_seats.count), 0), sum(orders.total_price)
+FROM orders
+JOIN sessions ON sessions.id = orders.session_id
+LEFT JOIN (
+    SELECT order_id, count(*) FROM m2m_orders_seats GROUP BY order_id
+) AS order_seats ON order_seats.order_id = orders.id
+GROUP BY 1, 2, 3
+""")
+
+
+def record_order(session_id: int, seats: int, revenue: int, db: Session, cancelled: bool = False, orders: int = 1):
+    """
+    Добавляет вклад заказа (или orders заказов сеанса с общими seats и revenue) в итоги дня его сеанса,
+    cancelled - вычитает; в текущей транзакции, без коммита.
+    """
+    sign = -1 if cancelled else 1
+    db.execute(RECORD_SQL, {
+        "session_id": session_id, "orders": sign * orders, "seats": sign * seats, "revenue": sign * revenue
+    })
+
+
+def merge_deltas(db: Session) -> int:
+    """Переносит накопленные вклады заказов в sales_daily; возвращает число измененных строк итогов."""
+    merged = db.execute(MERGE_SQL).rowcount
+    db.commit()
+    return merged
+
+
+def backfill(db: Session) -> dict:
+    """
+    Пересчитывает итоги по всем заказам. Блокировка таблиц дожидается транзакций заказов, уже записавших вклады,
+    а новые заказы ждут конца пересчета и добавляются поверх него - ни один заказ не теряется и не учитывается дважды.
+    """
+    started = time.perf_counter()
+    db.execute(text("LOCK TABLE sales_daily, sales_deltas IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM sales_deltas"))
+    db.execute(text("DELETE FROM sales_daily"))
+    rows = db.execute(BACKFILL_SQL).rowcount
+    db.commit()
+    return {"rows": rows, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def sales_report(
+        group: AnalyticsGroup,
+        start_date: datetime.date | None,
+        end_date: datetime.date | None,
+        db: Session
+) -> list[dict]:
+    """
+    Выручка, заказы, проданные места и заполняемость за период по фильмам, залам или дням.
+    Вместимость - сеансы из расписания, умноженные на число мест в раскладке зала.
+    """
+    snapshot = catalog.snapshot(db)
+
+    # Итоги вместе с еще не перенесенными вкладами; один запрос видит перенос либо целиком, либо никак
+    rollup = union_all(
+        select(*(getattr(SalesDailyOrm, column) for column in SALES_COLUMNS)),
+        select(*(getattr(SalesDeltasOrm, column) for column in SALES_COLUMNS)),
+    ).subquery()
+
+    day = cast(ScheduleOrm.start_time, Date)
+    sales_key, sessions_key = {
+        AnalyticsGroup.MOVIE: (rollup.c.movie_id, ScheduleOrm.movie_id),
+        AnalyticsGroup.HALL: (rollup.c.hall_id, ScheduleOrm.hall_id),
+        AnalyticsGroup.DAY: (rollup.c.day, day),
+    }[group]
+
+    # Итоги группируются в БД: строк в ответе столько, сколько групп, а не дней, фильмов и залов
+    sales = (
+        select(sales_key, func.sum(rollup.c.orders), func.sum(rollup.c.seats_sold), func.sum(rollup.c.revenue))
+        .group_by(sales_key)
+    )
+    sessions = select(sessions_key, ScheduleOrm.hall_id, func.count()).group_by(sessions_key, ScheduleOrm.hall_id)
+    if start_date is not None:
+        sales = sales.where(rollup.c.day >= start_date)
+        sessions = sessions.where(ScheduleOrm.start_time >= datetime.datetime.combine(start_date, datetime.time()))
+    if end_date is not None:
+        sales = sales.where(rollup.c.day <= end_date)
+        sessions = sessions.where(
+            ScheduleOrm.start_time < datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time())
+        )
+
+    totals = defaultdict(lambda: {"sessions": 0, "capacity": 0, "orders": 0, "seatsSold": 0, "revenue": 0})
+    for value, orders, seats_sold, revenue in db.execute(sales):
+        totals[value].update(orders=int(orders), seatsSold=int(seats_sold), revenue=int(revenue))
+    for value, hall_id, count in db.execute(sessions):
+        layout = snapshot.layouts.get(hall_id)
+        total = totals[value]
+        total["sessions"] += count
+        total["capacity"] += count * (len(layout.seats) if layout is not None else 0)
+
+    report = []
+    for value, total in totals.items():
+        fill_rate = round(total["seatsSold"] / total["capacity"], 4) if total["capacity"] else None
+        if group is AnalyticsGroup.MOVIE:
+            movie = snapshot.movies.get(value)
+            head = {"movieId": value, "title": movie.title if movie is not None else None}
+        elif group is AnalyticsGroup.HALL:
+            hall = snapshot.halls.get(value)
+            head = {"hallId": value, "name": hall.name if hall is not None else None}
+        else:
+            head = {"day": value}
+        report.append({**head, **total, "fillRate": fill_rate})
+
+    if group is AnalyticsGroup.DAY:
+        return sorted(report, key=lambda item: item["day"])
+    id_key = "movieId" if group is AnalyticsGroup.MOVIE else "hallId"
+    return sorted(report, key=lambda item: (-item["revenue"], item[id_key]))
+
+
+async def merge_periodically(interval: float):
+    """Фоновая задача: раз в interval секунд переносит вклады заказов в итоги продаж."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with open_db() as db:
+                await run_db(db, merge_deltas)
+        except Exception:
+            logger.exception("Sales deltas merge failed")
+
+
+def main():
+    argparse.ArgumentParser(description="Recompute the daily sales rollups from all orders").parse_args()
+
+    from src.database import SessionLocal
+
+    with SessionLocal() as db:
+        print(json.dumps(backfill(db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from starlette import status
 
 from src.auth.service import AuthService, get_auth_service
-from src.database import get_db
+from src.database import get_db, run_db
 from src.schemas import UserForm
 
 router = APIRouter(
@@ -12,13 +12,13 @@ router = APIRouter(
 )
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
         user: UserForm,
         response: Response,
         auth_service: AuthService = Depends(get_auth_service),
         db: Session = Depends(get_db)
 ):
-    data = auth_service.register(user, db)
+    data = await run_db(db, auth_service.register, user)
     response.set_cookie("access_token", data, 3600)
     return {
         "data" : {
@@ -28,13 +28,13 @@ def register_user(
 
 
 @router.post("/login", status_code=status.HTTP_200_OK)
-def login_user(
+async def login_user(
         user: UserForm,
         response: Response,
         auth_service: AuthService = Depends(get_auth_service),
         db: Session = Depends(get_db)
 ):
-    data = auth_service.login(user, db)
+    data = await run_db(db, auth_service.login, user)
     response.set_cookie("access_token", data)
     return {
         "data" : {
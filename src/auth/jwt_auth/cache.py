@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from src.schemas import UserInfo
+
+
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кэш уже проверенных токенов.
+    Запись хранится не дольше exp токена, поэтому истекший токен всегда проходит полную проверку и отклоняется.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.verify_time = 0.0
+        self.verifications = 0
+        self._tokens: OrderedDict[str, tuple[UserInfo, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> UserInfo | None:
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user, exp = entry
+            if exp <= time.time():
+                del self._tokens[token]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._tokens.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: UserInfo, exp: float):
+        with self._lock:
+            self._tokens[token] = (user, exp)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+                self.evictions += 1
+
+    def record_verification(self, seconds: float):
+        with self._lock:
+            self.verify_time += seconds
+            self.verifications += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            average = self.verify_time / self.verifications if self.verifications else 0.0
+            return {
+                "size": len(self._tokens),
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "avgVerifyMicroseconds": round(average * 1_000_000, 1),
+                "savedVerifySeconds": round(average * self.hits, 4),
+            }
+
+
+token_cache = VerifiedTokenCache(max_size=int(os.getenv("TOKEN_CACHE_SIZE", 10000)))
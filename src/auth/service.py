@@ -1,3 +1,5 @@
+import time
+
 from sqlalchemy.orm import Session
 from starlette import status
 
@@ -5,6 +7,7 @@ from src.auth.errors import AuthErrors
 from fastapi import Request, Depends, HTTPException
 from src.auth.jwt_auth.base.auth import JWTAuth
 from src.auth.jwt_auth.base.config import JWTConfig
+from src.auth.jwt_auth.cache import token_cache
 from src.auth.jwt_auth.utils import hash_password, try_to_decode_token
 from src.auth.utils import user_exist, add_user, email_exist, password_exist
 from src.crud import get_user_by_email
@@ -52,35 +55,41 @@ class AuthService:
         )
         return token
 
-def get_auth_service():
-    return AuthService(jwt_auth=JWTAuth(config=JWTConfig()))
+auth_service = AuthService(jwt_auth=JWTAuth(config=JWTConfig()))
+
+async def get_auth_service():
+    return auth_service
 
-def get_current_auth_user_info(
+async def get_current_auth_user_info(
         request: Request,
         auth_service: AuthService = Depends(get_auth_service),
 ) -> UserInfo | HTTPException:
-    cookie_header = request.headers.get("Cookie")
-    if not cookie_header:
+    if not request.headers.get("Cookie"):
         return AuthErrors.cookie_not_found()
 
-    token = None
-    for chunk in cookie_header.split(";"):
-        if "access_token" in chunk:
-            token = chunk.split("=")[1].strip()
-            break
-
+    token = request.cookies.get("access_token")
     if not token:
         return AuthErrors.token_not_found()
 
     if token.startswith("Bearer "):
         token = token[len("Bearer "):]
 
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    started = time.perf_counter()
     payload = try_to_decode_token(auth_service.jwt_auth, token)
+    token_cache.record_verification(time.perf_counter() - started)
 
-    return UserInfo(
+    user = UserInfo(
         id=payload.get("id"),
         is_admin=payload.get("isAdmin"),
     )
+    if payload.get("exp") is not None:
+        token_cache.put(token, user, payload["exp"])
+
+    return user
 
 def is_admin(user: User):
     if not user.is_admin:
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from src.versions import versions
+
+# Кэш чистится от истекших сводок, когда вырастает вдвое с прошлой чистки
+MIN_PRUNE_SIZE = 1024
+
+
+class AvailabilityCache:
+    """
+    Сводки свободных мест по сеансам на короткий ttl.
+    Сводка действует, пока не изменились версии каталога, расписания и заказов ее сеанса, поэтому бронирование
+    в этом процессе сразу делает ее устаревшей; ttl ограничивает отставание от изменений в других процессах.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[int, tuple[dict, float, tuple]] = {}
+        self._prune_at = MIN_PRUNE_SIZE
+        self._lock = threading.Lock()
+
+    def token(self) -> tuple:
+        """Снимок версий до чтения из БД: put_many не кэширует сводки, если заказы успели измениться."""
+        return versions.get("catalog"), versions.get("sessions"), versions.get("orders")
+
+    def get_many(self, sessions_ids: list[int]) -> tuple[dict[int, dict], list[int]]:
+        """Найденные сводки по id сеанса и id сеансов, которых в кэше нет."""
+        if not self.ttl:
+            return {}, list(sessions_ids)
+
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for session_id in sessions_ids:
+                entry = self._entries.get(session_id)
+                if entry is not None and entry[1] > now and entry[2] == self._version(session_id):
+                    found[session_id] = entry[0]
+                else:
+                    missing.append(session_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, payloads: list[dict], token: tuple):
+        if not self.ttl or token != self.token():
+            return
+
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for payload in payloads:
+                session_id = payload["sessionId"]
+                self._entries[session_id] = (payload, expires_at, self._version(session_id))
+            if len(self._entries) > self._prune_at:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+                self._prune_at = max(MIN_PRUNE_SIZE, 2 * len(self._entries))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _version(session_id: int) -> tuple:
+        return versions.get("catalog"), versions.get("sessions"), versions.get("orders", session_id)
+
+
+availability_cache = AvailabilityCache(ttl=float(os.getenv("AVAILABILITY_CACHE_TTL", 2)))
@@ -0,0 +1,430 @@
+"""
+Массовая загрузка данных кинотеатра через COPY.
+
+Источник - каталог с CSV-файлами (с заголовком), каждый файл необязателен:
+    users.csv         id,email,password_hash,is_admin,created_at
+    genres.csv        id,name
+    movies.csv        id,title,director,screenwriter,actors,description,trailer_url,poster_url,age_rating,duration
+                      (actors - имена через "|", age_rating - AGE_12 или 12+)
+    movie_genres.csv  movie_id,genre_id
+    halls.csv         id,name,rows,seats_per_row,prices
+                      (места генерируются сеткой rows x seats_per_row; prices - цены зон через "|",
+                      ряды делятся между зонами поровну от экрана к концу зала)
+    sessions.csv      id,movie_id,hall_id,start_time
+    orders.csv        id,user_id,session_id,total_price,info,created_at,seats
+                      (seats - места как "ряд:место" через пробел)
+
+Каждая таблица грузится в своей транзакции пачками COPY. Вторичные индексы, уникальные и внешние ключи
+загружаемых таблиц удаляются перед загрузкой и создаются заново после нее, каждое отдельно; если данные нарушают
+ограничение, загрузка завершается ошибкой со списком DDL невосстановленных ограничений. Заказы ссылаются на залы и
+сеансы из той же загрузки. После успешной загрузки пересобираются расписание для списка сеансов (таблица schedule)
+и итоги продаж (sales_daily).
+Каталог в памяти работающего приложения после загрузки нужно перезагрузить: POST /api/admin/catalog/reload.
+
+    python -m src.bulk_import data/ [--keep-indexes] [--batch-size 50000]
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.enums import AgeRating
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50_000
+
+TABLES = ["users", "genres", "movies", "movie_genres", "halls", "sessions", "orders"]
+
+COLUMNS = {
+    "users": ["id", "email", "password_hash", "is_admin", "created_at"],
+    "genres": ["id", "name"],
+    "movies": ["id", "title", "director", "screenwriter", "actors", "description", "trailer_url", "poster_url",
+               "age_rating", "duration"],
+    "m2m_movies_genres": ["movie_id", "genre_id"],
+    "halls": ["id", "name", "total_seats"],
+    "seats": ["id", "hall_id", "row_number", "seat_number", "price"],
+    "sessions": ["id", "movie_id", "hall_id", "start_time"],
+    "orders": ["id", "user_id", "session_id", "total_price", "info", "created_at"],
+    "m2m_orders_seats": ["order_id", "session_id", "seat_id"],
+}
+
+# Таблицы, в которые id пишутся явно: после загрузки их последовательности сдвигаются за максимальный id
+EXPLICIT_ID_TABLES = ["users", "genres", "movies", "halls", "seats", "sessions", "orders"]
+
+# Индексы, не обслуживающие первичный ключ или ограничение
+DEFERRED_INDEXES_SQL = """
+SELECT indrelid::regclass::text, indexrelid::regclass::text, pg_get_indexdef(indexrelid)
+FROM pg_index
+WHERE indrelid = ANY(CAST(:tables AS regclass[]))
+  AND NOT EXISTS (
+      SELECT 1 FROM pg_constraint
+      WHERE pg_constraint.conindid = pg_index.indexrelid AND pg_constraint.contype IN ('p', 'u', 'x')
+  )
+"""
+
+# Внешние ключи идут первыми: удаляются раньше уникальных ограничений, пересоздаются после них
+DEFERRED_CONSTRAINTS_SQL = """
+SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid), contype
+FROM pg_constraint
+WHERE conrelid = ANY(CAST(:tables AS regclass[])) AND contype IN ('f', 'u')
+ORDER BY contype, conname
+"""
+
+
+class RebuildError(RuntimeError):
+    """Часть индексов и ограничений не пересоздалась после загрузки - данные нарушают их."""
+
+    def __init__(self, failed: list[tuple[str, str]]):
+        self.failed = failed
+        super().__init__(
+            "Indexes and constraints missing after import, fix the data and run:\n"
+            + "\n".join(f"{ddl};" for _, ddl in failed)
+        )
+
+
+class HallGrid:
+    """Сетка мест зала: id мест идут подряд по рядам, начиная с first_seat_id."""
+
+    __slots__ = ("hall_id", "rows", "seats_per_row", "prices", "first_seat_id")
+
+    def __init__(self, hall_id: int, rows: int, seats_per_row: int, prices: list[int]):
+        self.hall_id = hall_id
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        self.prices = prices
+        self.first_seat_id = 0
+
+    @property
+    def total_seats(self) -> int:
+        return self.rows * self.seats_per_row
+
+    def price(self, row: int) -> int:
+        return self.prices[(row - 1) * len(self.prices) // self.rows]
+
+    def seat_id(self, row: int, seat: int) -> int:
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_per_row):
+            raise ValueError(f"Seat {row}:{seat} is outside hall {self.hall_id}")
+        return self.first_seat_id + (row - 1) * self.seats_per_row + seat - 1
+
+
+class Importer:
+    def __init__(self, connection, batch_size: int = BATCH_SIZE):
+        self.connection = connection
+        self.connection.set_client_encoding("UTF8")
+        self.batch_size = batch_size
+        self.grids: dict[int, HallGrid] = {}
+        self.session_halls: dict[int, int] = {}
+        self.report = {}
+
+    def copy(self, table: str, rows) -> int:
+        """Грузит строки в таблицу пачками COPY в одной транзакции."""
+        columns = COLUMNS[table]
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        started = time.perf_counter()
+        count = 0
+        with self.connection.cursor() as cursor:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+                if count % self.batch_size == 0:
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        self.connection.commit()
+        self._record(table, count, time.perf_counter() - started)
+        return count
+
+    def copy_file(self, table: str, file) -> int:
+        """Грузит готовый CSV-файл одной командой COPY."""
+        started = time.perf_counter()
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)", file)
+            count = cursor.rowcount
+        self.connection.commit()
+        self._record(table, count, time.perf_counter() - started)
+        return count
+
+    def users(self, rows):
+        self.copy("users", (
+            (row["id"], row["email"], row["password_hash"], parse_bool(row.get("is_admin", False)),
+             row.get("created_at") or datetime.datetime.now())
+            for row in rows
+        ))
+
+    def genres(self, rows):
+        self.copy("genres", ((row["id"], row["name"]) for row in rows))
+
+    def movies(self, rows):
+        self.copy("movies", (
+            (row["id"], row["title"], row["director"], row["screenwriter"], array_literal(parse_list(row["actors"])),
+             row["description"], row["trailer_url"], row["poster_url"], parse_age_rating(row["age_rating"]),
+             row["duration"])
+            for row in rows
+        ))
+
+    def movie_genres(self, rows):
+        self.copy("m2m_movies_genres", ((row["movie_id"], row["genre_id"]) for row in rows))
+
+    def halls(self, rows):
+        grids = []
+
+        def hall_rows():
+            for row in rows:
+                grid = HallGrid(
+                    int(row["id"]),
+                    int(row["rows"]),
+                    int(row["seats_per_row"]),
+                    [int(price) for price in parse_list(row["prices"])]
+                )
+                grids.append(grid)
+                yield grid.hall_id, row["name"], grid.total_seats
+
+        self.copy("halls", hall_rows())
+
+        next_seat_id = self.scalar("SELECT COALESCE(MAX(id), 0) + 1 FROM seats")
+        for grid in grids:
+            grid.first_seat_id = next_seat_id
+            next_seat_id += grid.total_seats
+            self.grids[grid.hall_id] = grid
+
+        self.copy("seats", (
+            (grid.seat_id(row, seat), grid.hall_id, row, seat, grid.price(row))
+            for grid in grids
+            for row in range(1, grid.rows + 1)
+            for seat in range(1, grid.seats_per_row + 1)
+        ))
+
+    def sessions(self, rows):
+        def session_rows():
+            for row in rows:
+                self.session_halls[int(row["id"])] = int(row["hall_id"])
+                yield row["id"], row["movie_id"], row["hall_id"], row["start_time"]
+
+        self.copy("sessions", session_rows())
+
+    def orders(self, rows):
+        # Связи заказов с местами копятся во временном файле и грузятся отдельной транзакцией после заказов
+        with tempfile.TemporaryFile() as links:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+
+            def order_rows():
+                for count, row in enumerate(rows, 1):
+                    order_id, session_id = int(row["id"]), int(row["session_id"])
+                    grid = self._session_grid(session_id)
+                    writer.writerows(
+                        (order_id, session_id, grid.seat_id(row_number, seat_number))
+                        for row_number, seat_number in parse_seats(row["seats"])
+                    )
+                    if count % self.batch_size == 0:
+                        links.write(buffer.getvalue().encode())
+                        buffer.seek(0)
+                        buffer.truncate()
+                    yield (order_id, row["user_id"], session_id, row["total_price"], row["info"],
+                           row.get("created_at") or datetime.datetime.now())
+
+            self.copy("orders", order_rows())
+
+            links.write(buffer.getvalue().encode())
+            links.seek(0)
+            self.copy_file("m2m_orders_seats", links)
+
+    def reset_sequences(self):
+        with self.connection.cursor() as cursor:
+            for table in EXPLICIT_ID_TABLES:
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+                )
+        self.connection.commit()
+
+    def scalar(self, sql: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def _session_grid(self, session_id: int) -> HallGrid:
+        hall_id = self.session_halls.get(session_id)
+        if hall_id is None or hall_id not in self.grids:
+            raise ValueError(f"Order references session {session_id} whose hall is not part of this import")
+        return self.grids[hall_id]
+
+    def _record(self, table: str, rows: int, seconds: float):
+        self.report[table] = {
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_s": round(rows / seconds) if seconds else rows,
+        }
+
+
+def import_data(engine, sources: dict, defer_indexes: bool = True, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Загружает источники (имя из TABLES -> итерируемое словарей-строк) в порядке зависимостей.
+    Возвращает отчет: строки и строк в секунду по таблицам, время построения индексов и ограничений.
+    """
+    started = time.perf_counter()
+    tables = [name for name in TABLES if name in sources]
+    loaded = {"movie_genres": ["m2m_movies_genres"], "halls": ["halls", "seats"], "orders": ["orders", "m2m_orders_seats"]}
+    target_tables = [table for name in tables for table in loaded.get(name, [name])]
+
+    deferred = drop_deferred(engine, target_tables) if defer_indexes else []
+
+    raw = engine.raw_connection()
+    try:
+        importer = Importer(raw.driver_connection, batch_size)
+        for name in tables:
+            getattr(importer, name)(sources[name])
+        importer.reset_sequences()
+    except BaseException:
+        # Уже закоммиченные таблицы остаются в БД. Индексы и ограничения возвращаются и при ошибке загрузки,
+        # но расписание и итоги продаж не пересчитываются, а наружу уходит исходная ошибка
+        raw.close()
+        rebuild_deferred(engine, deferred, target_tables)
+        raise
+    raw.close()
+
+    rebuild_started = time.perf_counter()
+    failed = rebuild_deferred(engine, deferred, target_tables)
+    if failed:
+        raise RebuildError(failed)
+    rebuild_seconds = time.perf_counter() - rebuild_started
+
+    # Загруженные сеансы и заказы сразу попадают в расписание для списка сеансов и в итоги продаж
+    from src.analytics import backfill
+    from src.schedule import refresh_schedule
+    with Session(engine) as db:
+        refresh_schedule(db)
+        db.execute(text("ANALYZE schedule"))
+        db.commit()
+        backfill(db)
+
+    return {
+        "tables": importer.report,
+        "deferred": [name for name, _ in deferred],
+        "rebuild_seconds": round(rebuild_seconds, 3),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def drop_deferred(engine, tables: list[str]) -> list[tuple[str, str]]:
+    """
+    Удаляет вторичные индексы, уникальные и внешние ключи таблиц: COPY в таблицу без них не проверяет
+    каждую строку отдельно, а пересоздание проверяет все строки разом.
+    Возвращает пары (имя, DDL для пересоздания) в порядке пересоздания.
+    """
+    with engine.begin() as connection:
+        indexes = connection.execute(text(DEFERRED_INDEXES_SQL), {"tables": tables}).all()
+        constraints = connection.execute(text(DEFERRED_CONSTRAINTS_SQL), {"tables": tables}).all()
+
+        for table, name, _, _ in constraints:
+            connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+        for _, name, _ in indexes:
+            connection.execute(text(f"DROP INDEX {name}"))
+
+    return [(name, definition) for _, name, definition in indexes] + [
+        (name, f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+        for table, name, definition, _ in reversed(constraints)
+    ]
+
+
+def rebuild_deferred(engine, deferred: list[tuple[str, str]], tables: list[str]) -> list[tuple[str, str]]:
+    """
+    Пересоздает удаленные индексы и ограничения, каждое в своей транзакции: ошибка одного (например,
+    дубль продажи места в загруженных заказах) не откатывает остальные. Каждая ошибка пишется в лог
+    вместе с DDL, по которому ограничение можно вернуть вручную после исправления данных.
+    Возвращает пары (имя, DDL), которые пересоздать не удалось.
+    """
+    failed = []
+    for name, ddl in deferred:
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(ddl))
+        except Exception as e:
+            logger.error("Failed to rebuild %s, it is NOT in the database until recreated: %s\n%s", name, ddl, e)
+            failed.append((name, ddl))
+
+    with engine.begin() as connection:
+        for table in tables:
+            connection.execute(text(f"ANALYZE {table}"))
+    return failed
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "t", "yes")
+
+
+def parse_list(value) -> list[str]:
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def parse_seats(value) -> list[tuple[int, int]]:
+    if isinstance(value, (list, tuple)):
+        return value
+    return [tuple(int(part) for part in seat.split(":")) for seat in value.split()]
+
+
+def parse_age_rating(value) -> str:
+    if isinstance(value, AgeRating):
+        return value.name
+    if value in AgeRating.__members__:
+        return value
+    return AgeRating(value).name
+
+
+def array_literal(items: list[str]) -> str:
+    escaped = (item.replace("\\", "\\\\").replace('"', '\\"') for item in items)
+    return "{" + ",".join(f'"{item}"' for item in escaped) + "}"
+
+
+def read_sources(directory: Path) -> dict:
+    sources = {}
+    for name in TABLES:
+        path = directory / f"{name}.csv"
+        if path.exists():
+            sources[name] = read_csv(path)
+    return sources
+
+
+def read_csv(path: Path):
+    with path.open(newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import of cinema data with COPY")
+    parser.add_argument("directory", type=Path, help="Directory with users.csv, genres.csv, movies.csv, ...")
+    parser.add_argument("--keep-indexes", action="store_true", help="Load into indexed tables instead of rebuilding")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per COPY batch")
+    args = parser.parse_args()
+
+    sources = read_sources(args.directory)
+    if not sources:
+        parser.error(f"No CSV files in {args.directory}")
+
+    from src.database import engine
+
+    report = import_data(engine, sources, defer_indexes=not args.keep_indexes, batch_size=args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import bisect
+import copy
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.enums import AgeRating
+from src.models import MoviesOrm, GenresOrm, MovieGenresOrm, HallsOrm, SeatsOrm
+from src.responses import to_camel
+from src.schemas import Movie, MovieWithGenres, Genre, Hall, Seat
+from src.search import SearchIndex
+from src.versions import versions
+
+# Промах по id перезагружает каталог не чаще этого интервала, чтобы запросы несуществующих id не вызывали шквал загрузок
+MISS_RELOAD_INTERVAL = 1.0
+
+
+def layout_order(seat: Seat) -> tuple[int, int]:
+    return seat.seat_number, seat.row_number
+
+
+class HallLayout:
+    """
+    Неизменяемая раскладка зала: места в порядке выдачи, их позиции в битсете, готовые camelCase-словари для ответа
+    и минимальная цена места (None для зала без мест).
+    """
+
+    __slots__ = ("seats", "positions", "payloads", "min_price")
+
+    def __init__(self, seats: list[Seat]):
+        self.seats = tuple(seats)
+        self.positions = {seat.id: position for position, seat in enumerate(self.seats)}
+        self.payloads = tuple(to_camel(seat) for seat in self.seats)
+        self.min_price = min((seat.price for seat in self.seats), default=None)
+
+
+class CatalogSnapshot:
+    """Полностью загруженные справочники с индексами. После построения не изменяется, перезагрузка подменяет снимок целиком."""
+
+    def __init__(
+            self,
+            movies: list[MovieWithGenres],
+            genres: list[Genre],
+            halls: list[Hall],
+            seats: list[Seat],
+            version: int
+    ):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.movies = {movie.id: movie for movie in movies}
+        self.genres = genres
+        self.halls = {hall.id: hall for hall in halls}
+
+        hall_seats = defaultdict(list)
+        for seat in sorted(seats, key=layout_order):
+            hall_seats[seat.hall_id].append(seat)
+        self.layouts = {hall_id: HallLayout(hall_seats.get(hall_id, [])) for hall_id in self.halls}
+
+        self.movies_by_genre = defaultdict(set)
+        self.movies_by_age_rating = defaultdict(set)
+        for movie in movies:
+            for genre in movie.genres:
+                self.movies_by_genre[genre.lower()].add(movie.id)
+            self.movies_by_age_rating[movie.age_rating].add(movie.id)
+
+        # Части ответов, собранные один раз на снимок: фильм в списке сеансов отдается без жанров,
+        # зал и жанр - в исходном виде модели
+        self.movie_payloads = {movie.id: to_camel(movie, exclude=("genres",)) for movie in movies}
+        self.hall_payloads = {hall.id: hall.model_dump() for hall in halls}
+        self.genre_payloads = [genre.model_dump() for genre in genres]
+
+        self.titles = sorted((movie.title.lower(), movie.id) for movie in movies)
+        self._title_keys = [title for title, _ in self.titles]
+        self.search_index = SearchIndex(movies)
+
+    def with_hall(self, hall: Hall, seats: list[Seat]) -> "CatalogSnapshot":
+        """
+        Копия снимка с добавленным залом. Остальные справочники и индексы общие с исходным снимком, версия та же:
+        раскладки других залов не меняются, поэтому битсеты занятости и ETag остаются действительными.
+        """
+        snapshot = copy.copy(self)
+        snapshot.halls = {**self.halls, hall.id: hall}
+        snapshot.layouts = {**self.layouts, hall.id: HallLayout(sorted(seats, key=layout_order))}
+        snapshot.hall_payloads = {**self.hall_payloads, hall.id: hall.model_dump()}
+        return snapshot
+
+    def movies_by_title_prefix(self, prefix: str) -> set[int]:
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._title_keys, prefix)
+        result = set()
+        for title, movie_id in self.titles[start:]:
+            if not title.startswith(prefix):
+                break
+            result.add(movie_id)
+        return result
+
+    def movies_by_genre_name(self, genre: str) -> set[int]:
+        genre = genre.lower()
+        result = set()
+        for name, movies_ids in self.movies_by_genre.items():
+            if genre in name:
+                result |= movies_ids
+        return result
+
+    def find_movies(self, title: str, genres: list[str], age_rating: AgeRating | None) -> set[int] | None:
+        """Id фильмов, подходящих под все заданные условия, или None, если условий нет."""
+        conditions = []
+        if title:
+            conditions.append(self.movies_by_title_prefix(title))
+        for genre in genres:
+            conditions.append(self.movies_by_genre_name(genre))
+        if age_rating is not None:
+            conditions.append(self.movies_by_age_rating.get(age_rating, set()))
+
+        if not conditions:
+            return None
+        return set.intersection(*sorted(conditions, key=len))
+
+    def search_movies(self, query: str, genres: list[str], limit: int) -> list[tuple[MovieWithGenres, float]]:
+        """Фильмы по релевантности запросу; каждый из genres должен быть среди жанров фильма (без учета регистра)."""
+        candidates = None
+        if genres:
+            candidates = set.intersection(*(self.movies_by_genre.get(genre.lower(), set()) for genre in genres))
+        return [
+            (self.movies[movie_id], score)
+            for movie_id, score in self.search_index.search(query, candidates, limit)
+        ]
+
+
+class Catalog:
+    """
+    Фильмы, жанры, залы и раскладки мест в памяти процесса.
+    Загружается при старте приложения, обновляется явно через reload/invalidate,
+    а при заданном ttl - еще и при первом обращении после его истечения.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self.version = 0
+        self.loads = 0
+        self._snapshot: CatalogSnapshot | None = None
+        # Залы из add_hall с версией каталога на момент добавления: перезагрузка, начатая не позже,
+        # могла прочитать БД до коммита зала
+        self._added_halls: list[tuple[int, Hall, list[Seat]]] = []
+        self._lock = threading.Lock()
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or (self.ttl and time.monotonic() - snapshot.loaded_at > self.ttl):
+            snapshot = self.reload(db)
+        return snapshot
+
+    def reload(self, db: Session) -> CatalogSnapshot:
+        with self._lock:
+            self.version += 1
+            version = self.version
+
+        snapshot = load_snapshot(db, version)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version < snapshot.version:
+                self._added_halls = [added for added in self._added_halls if added[0] >= snapshot.version]
+                for _, hall, seats in self._added_halls:
+                    if hall.id not in snapshot.halls:
+                        snapshot = snapshot.with_hall(hall, seats)
+                self._snapshot = snapshot
+                versions.bump("catalog")
+            self.loads += 1
+            return self._snapshot
+
+    @property
+    def loaded_version(self) -> int | None:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else None
+
+    def add_hall(self, hall: Hall, seats: list[Seat]):
+        """
+        Добавляет закоммиченный зал в текущий снимок без перезагрузки каталога. Идущая параллельно перезагрузка
+        добавит его в свой снимок при подмене, даже если прочитала БД до коммита зала.
+        """
+        with self._lock:
+            self._added_halls.append((self.version, hall, seats))
+            if self._snapshot is not None:
+                self._snapshot = self._snapshot.with_hall(hall, seats)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._added_halls = []
+
+    def get_movie(self, id: int, db: Session) -> MovieWithGenres:
+        movie = self._lookup(lambda snapshot: snapshot.movies.get(id), db)
+        if movie is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+        return movie
+
+    def get_hall(self, id: int, db: Session) -> Hall:
+        hall = self._lookup(lambda snapshot: snapshot.halls.get(id), db)
+        if hall is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hall not found")
+        return hall
+
+    def get_layout(self, hall_id: int, db: Session) -> HallLayout | None:
+        return self._lookup(lambda snapshot: snapshot.layouts.get(hall_id), db)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False, "version": self.version, "loads": self.loads}
+
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "loads": self.loads,
+            "ageSeconds": round(time.monotonic() - snapshot.loaded_at, 1),
+            "movies": len(snapshot.movies),
+            "genres": len(snapshot.genres),
+            "halls": len(snapshot.halls),
+            "seats": sum(len(layout.seats) for layout in snapshot.layouts.values()),
+            "memoryBytes": deep_sizeof(snapshot),
+        }
+
+    def _lookup(self, getter, db: Session):
+        snapshot = self.snapshot(db)
+        value = getter(snapshot)
+        if value is None and time.monotonic() - snapshot.loaded_at > MISS_RELOAD_INTERVAL:
+            value = getter(self.reload(db))
+        return value
+
+
+def load_snapshot(db: Session, version: int) -> CatalogSnapshot:
+    genres = [Genre.model_validate(row, from_attributes=True) for row in db.execute(select(GenresOrm)).scalars().all()]
+    genre_names = {genre.id: genre.name for genre in genres}
+
+    movie_genres = defaultdict(list)
+    for movie_id, genre_id in db.execute(select(MovieGenresOrm.movie_id, MovieGenresOrm.genre_id)).all():
+        movie_genres[movie_id].append(genre_names[genre_id])
+
+    movies = [
+        MovieWithGenres(
+            **Movie.model_validate(movie, from_attributes=True).model_dump(),
+            genres=movie_genres.get(movie.id, [])
+        )
+        for movie in db.execute(select(MoviesOrm)).scalars().all()
+    ]
+    halls = [Hall.model_validate(row, from_attributes=True) for row in db.execute(select(HallsOrm)).scalars().all()]
+    seats = [Seat.model_validate(row, from_attributes=True) for row in db.execute(select(SeatsOrm)).scalars().all()]
+
+    return CatalogSnapshot(movies, genres, halls, seats, version)
+
+
+def deep_sizeof(obj, seen: set | None = None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+catalog = Catalog(ttl=float(os.getenv("CATALOG_TTL", 0)))
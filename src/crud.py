@@ -1,12 +1,35 @@
+import datetime
+from collections import defaultdict
+
 from fastapi import HTTPException, status
-from sqlalchemy import select, delete, update, func, and_, exists
+from sqlalchemy import select, delete, update, func, tuple_, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from src.analytics import record_order
+from src.availability import availability_cache
+from src.catalog import catalog, CatalogSnapshot, HallLayout
 from src.enums import AgeRating
 from src.models import MoviesOrm, GenresOrm, OrdersOrm, SeatsOrm, UsersOrm, MovieGenresOrm, SeatsOrdersOrm, SessionsOrm, \
-    HallsOrm
-from src.schemas import Movie, Genre, Order, OrderCreate, Hall, Session as SessionSchema, SessionDetailed, Seat, User, \
-    UserWithOrders, MovieWithGenres, SeatWithInfo, SessionFilters, OrderDetailed
+    HallsOrm, ScheduleOrm
+from src.occupancy import seat_occupancy
+from src.pagination import decode_cursor, make_page
+from src.schedule import change_remaining_seats
+from src.schemas import Movie, Genre, Order, OrderCreate, Hall, Session as SessionSchema, Seat, User, \
+    UserWithOrders, MovieWithGenres, SessionFilters, OrderDetailed, Page, PageParams, MovieSearchParams, \
+    AvailabilityParams, HallLayoutCreate
+from src.seat_holds import seat_holds
+
+EXPORT_BATCH_SIZE = 1000
+
+# Места зала сеткой рядов на стороне БД одним INSERT; цена - по номеру ряда из массива цен рядов
+HALL_SEATS_SQL = text("""
+INSERT INTO seats (hall_id, row_number, seat_number, price)
+SELECT :hall_id, row_number, seat_number, (CAST(:row_prices AS integer[]))[row_number]
+FROM generate_series(1, :rows) AS row_number, generate_series(1, :seats_per_row) AS seat_number
+ORDER BY row_number, seat_number
+RETURNING id, hall_id, row_number, seat_number, price
+""")
 
 
 def fetch_records(model, db: Session, filters=None):
@@ -46,14 +69,33 @@ def get_genres_to_movie(movie_id: int, db: Session) -> list[Genre]:
 
 
 def get_all_orders(
+        page: PageParams,
         db: Session
-) -> list[Order]:
-    query = select(OrdersOrm)
-    result = [Order.model_validate(row, from_attributes=True) for row in db.execute(query).all()]
-
-    return result
+) -> Page[OrderDetailed]:
+    query = select(OrdersOrm).order_by(OrdersOrm.id).limit(page.limit + 1)
+    if page.cursor:
+        last_id, = decode_cursor(page.cursor, int)
+        query = query.where(OrdersOrm.id > last_id)
+
+    orders = [Order.model_validate(row, from_attributes=True) for row in db.execute(query).scalars().all()]
+
+    return make_page(with_seats(orders, db), page.limit, lambda order: (order.id,))
+
+def add_order(order: OrderCreate, db: Session, before_commit=None, holder_id: int | None = None) -> Order:
+    """
+    Создает заказ и бронирует места одной транзакцией. before_commit(заказ, db) вызывается в ней перед коммитом -
+    для записей, которые должны зафиксироваться вместе с заказом.
+    holder_id - авторизованный пользователь, сделавший запрос: только его удержания дают право на места.
+    user_id из тела заказа для этого не годится - его задает клиент. Без holder_id любое удержание мест чужое.
+    """
+    seats_ids = list(dict.fromkeys(order.seats_ids))
+    # Места из действующего удержания уже проверены при его выдаче, иначе - не удерживаются ли они другими
+    hold = None
+    if order.hold_id is not None:
+        hold = seat_holds.claim(order.hold_id, holder_id, order.session_id, seats_ids, db)
+    elif seats_ids:
+        seat_holds.check_free(order.session_id, seats_ids, holder_id, db)
 
-def add_order(order: OrderCreate, db: Session) -> Order:
     new_order = OrdersOrm(
         user_id=order.user_id,
         session_id=order.session_id,
@@ -61,57 +103,78 @@ def add_order(order: OrderCreate, db: Session) -> Order:
         info=order.info
     )
     db.add(new_order)
+    db.flush()
+
+    if seats_ids:
+        query = (
+            insert(SeatsOrdersOrm)
+            .values([
+                {"order_id": new_order.id, "session_id": order.session_id, "seat_id": seat_id}
+                for seat_id in seats_ids
+            ])
+            .on_conflict_do_nothing(index_elements=["session_id", "seat_id"])
+            .returning(SeatsOrdersOrm.seat_id)
+        )
+        booked_seats_ids = set(db.execute(query).scalars().all())
+
+        if len(booked_seats_ids) != len(seats_ids):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "msg": "Seats are already booked",
+                    "seatsIds": [seat_id for seat_id in seats_ids if seat_id not in booked_seats_ids]
+                }
+            )
+    record_order(order.session_id, len(seats_ids), order.total_price, db)
+
+    result = Order.model_validate(new_order, from_attributes=True)
+    if before_commit is not None:
+        before_commit(result, db)
+    if seats_ids:
+        change_remaining_seats(order.session_id, -len(seats_ids), db)
     db.commit()
-    db.refresh(new_order)
+    seat_occupancy.mark_booked(order.session_id, seats_ids)
+    if hold is not None:
+        seat_holds.convert(hold, seats_ids)
 
-    for seat_id in order.seats_ids:
-        seat_order = SeatsOrdersOrm(seat_id=seat_id, order_id=new_order.id)
-        db.add(seat_order)
-        db.commit()
-        db.refresh(seat_order)
+    return result
+
+
+def create_hall(layout: HallLayoutCreate, db: Session) -> Hall:
+    """
+    Создает зал и все его места в одной транзакции: total_seats всегда равно числу вставленных мест.
+    Зал с раскладкой добавляется в снимок каталога без его перезагрузки и сразу доступен для сеансов и схемы мест.
+    """
+    hall = HallsOrm(name=layout.name, total_seats=layout.rows * layout.seats_per_row)
+    db.add(hall)
+    db.flush()
+
+    seats = db.execute(HALL_SEATS_SQL, {
+        "hall_id": hall.id,
+        "rows": layout.rows,
+        "seats_per_row": layout.seats_per_row,
+        "row_prices": layout.row_prices(),
+    }).all()
+    result = Hall.model_validate(hall, from_attributes=True)
+    db.commit()
+    catalog.add_hall(result, [Seat.model_validate(seat, from_attributes=True) for seat in seats])
 
-    return Order.model_validate(new_order, from_attributes=True)
+    return result
 
 
 def get_movie_by_id(
         id: int,
         db: Session
 ) -> MovieWithGenres:
-    query = (
-        select(
-            MoviesOrm.id,
-            MoviesOrm.title,
-            MoviesOrm.director,
-            MoviesOrm.screenwriter,
-            func.array_agg(GenresOrm.name).label("genres"),
-            MoviesOrm.actors,
-            MoviesOrm.description,
-            MoviesOrm.trailer_url,
-            MoviesOrm.poster_url,
-            MoviesOrm.age_rating,
-            MoviesOrm.duration,
-        )
-        .select_from(MoviesOrm)
-        .join(MovieGenresOrm, MoviesOrm.id == MovieGenresOrm.movie_id)
-        .join(GenresOrm, MovieGenresOrm.genre_id == GenresOrm.id)
-        .where(MoviesOrm.id == id)
-        .group_by(MoviesOrm.id)
-    )
-    movie = db.execute(query).first()
-    result = MovieWithGenres.model_validate(movie, from_attributes=True)
-
-    return result
+    return catalog.get_movie(id, db)
 
 
 def get_hall_by_id(
         id: int,
         db: Session
 ) -> Hall:
-    query = select(HallsOrm).where(HallsOrm.id == id)
-    hall = db.execute(query).scalars().first()
-    result = Hall.model_validate(hall, from_attributes=True)
-
-    return result
+    return catalog.get_hall(id, db)
 
 
 def get_session_by_id(
@@ -130,16 +193,20 @@ def get_session_by_id(
 
 
 def get_all_users(
+        page: PageParams,
         db: Session
-) -> list[User]:
-    query = select(UsersOrm)
-    users = db.execute(query).scalars().all()
-    result = [
+) -> Page[User]:
+    query = select(UsersOrm).order_by(UsersOrm.id).limit(page.limit + 1)
+    if page.cursor:
+        last_id, = decode_cursor(page.cursor, int)
+        query = query.where(UsersOrm.id > last_id)
+
+    users = [
         User.model_validate(user, from_attributes=True)
-        for user in users
+        for user in db.execute(query).scalars().all()
     ]
 
-    return result
+    return make_page(users, page.limit, lambda user: (user.id,))
 
 def get_user_by_email(
         email: str,
@@ -155,43 +222,48 @@ def get_user_by_email(
 
 def get_user_orders(
         user_id: int,
+        page: PageParams,
         db: Session
-) -> list[OrderDetailed]:
-    if not db.execute(select(UsersOrm).where(UsersOrm.id == user_id)).first():
+) -> Page[OrderDetailed]:
+    if not db.execute(select(UsersOrm.id).where(UsersOrm.id == user_id)).first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    query = select(OrdersOrm).where(OrdersOrm.user_id == user_id).order_by(OrdersOrm.created_at)
+    query = (
+        select(OrdersOrm)
+        .where(OrdersOrm.user_id == user_id)
+        .order_by(OrdersOrm.created_at, OrdersOrm.id)
+        .limit(page.limit + 1)
+    )
+    if page.cursor:
+        created_at, last_id = decode_cursor(page.cursor, datetime.datetime, int)
+        query = query.where(tuple_(OrdersOrm.created_at, OrdersOrm.id) > (created_at, last_id))
+
     orders = [
         Order.model_validate(row, from_attributes=True)
         for row in db.execute(query).scalars().all()
     ]
 
-    result = [
-        OrderDetailed(
-            **order.model_dump(),
-            seats=get_seats_for_order(order.id, db)
-        ) for order in orders
-    ]
-
-    return result
+    return make_page(with_seats(orders, db), page.limit, lambda order: (order.created_at, order.id))
 
 
 def get_all_users_orders(
+        page: PageParams,
         db: Session
-) -> list[UserWithOrders]:
-    users = [
-        User.model_validate(row, from_attributes=True)
-        for row in db.execute(select(UsersOrm)).scalars().all()
-    ]
-    result = [
-        UserWithOrders(
-            user=user,
-            orders=get_user_orders(user.id, db)
-        )
-        for user in users
-    ]
+) -> Page[UserWithOrders]:
+    users = get_all_users(page, db)
+    query = (
+        select(OrdersOrm)
+        .where(OrdersOrm.user_id.in_([user.id for user in users.items]))
+        .order_by(OrdersOrm.created_at, OrdersOrm.id)
+    )
+    orders = defaultdict(list)
+    for order in with_seats([Order.model_validate(row, from_attributes=True) for row in db.execute(query).scalars().all()], db):
+        orders[order.user_id].append(order)
 
-    return result
+    return Page(
+        items=[UserWithOrders(user=user, orders=orders[user.id]) for user in users.items],
+        next_cursor=users.next_cursor
+    )
 
 def get_sessions(
         db: Session
@@ -206,103 +278,230 @@ def get_sessions(
 
 def get_all_genres(
         db: Session
-):
-    result = [
-        Genre.model_validate(row, from_attributes=True)
-        for row in db.execute(select(GenresOrm)).scalars().all()
-    ]
+) -> list[dict]:
+    return catalog.snapshot(db).genre_payloads
+
+def get_filtered_sessions(filters: SessionFilters, db: Session) -> list[dict]:
+    """
+    Сеансы под фильтры - сразу словари для ответа. Сеансы и свободные места читаются из расписания (ScheduleOrm)
+    диапазоном по покрывающему индексу start_time, фильм и зал берутся готовыми из снимка каталога.
+    """
+    snapshot = catalog.snapshot(db)
+
+    age_rating = next((value for value in AgeRating if value.value == filters.age_rating), None)
+    genres = filters.genres[0].split(",") if filters.genres else []
+    movies_ids = snapshot.find_movies(filters.title, genres, age_rating)
+    if movies_ids is not None and not movies_ids:
+        return []
 
-    return result
-
-def get_filtered_sessions(filters: SessionFilters, db: Session) -> list[SessionDetailed]:
     query = (
-        select(SessionsOrm)
-        .distinct(MoviesOrm.id)
-        .join(MoviesOrm)
-        .join(MovieGenresOrm, MovieGenresOrm.movie_id == MoviesOrm.id)
-        .join(GenresOrm, GenresOrm.id == MovieGenresOrm.genre_id)
+        select(
+            ScheduleOrm.session_id, ScheduleOrm.movie_id, ScheduleOrm.hall_id, ScheduleOrm.start_time,
+            ScheduleOrm.remaining_seats
+        )
+        .where(
+            filters.start_date <= ScheduleOrm.start_time,
+            ScheduleOrm.start_time <= filters.end_date
+        )
+        .order_by(ScheduleOrm.start_time, ScheduleOrm.session_id)
     )
+    if movies_ids is not None:
+        query = query.where(ScheduleOrm.movie_id.in_(movies_ids))
+
+    sessions = db.execute(query).all()
+    if any(row.movie_id not in snapshot.movies or row.hall_id not in snapshot.halls for row in sessions):
+        snapshot = catalog.reload(db)
 
-    filter_conditions = []
-    if filters.title:
-        filter_conditions.append(MoviesOrm.title.ilike(f"{filters.title}%"))
-    if filters.genres:
-        genres = filters.genres[0].split(",")
-        genre_filters = [GenresOrm.name.ilike(f"%{genre}%") for genre in genres]
-        filter_conditions.append(and_(*genre_filters))
-    if filters.age_rating:
-        age_rating = [value for value in AgeRating if value.value == filters.age_rating]
-        if age_rating:
-            filter_conditions.append(MoviesOrm.age_rating == age_rating[0])
-    filter_conditions.extend([
-        filters.start_date <= SessionsOrm.start_time,
-        SessionsOrm.start_time <= filters.end_date
-    ])
-
-    if filter_conditions:
-        query = query.filter(and_(*filter_conditions))
-
-    sessions = db.execute(query).scalars().all()
+    return sessions_payload(sessions, snapshot)
+
+
+def sessions_payload(sessions, snapshot: CatalogSnapshot) -> list[dict]:
+    """Строки (id, movie_id, hall_id, start_time, remaining_seats) в словари ответа списка сеансов."""
+    movies, halls = snapshot.movie_payloads, snapshot.hall_payloads
     return [
-        SessionDetailed(
-            id=session.id,
-            movie=get_movie_by_id(session.movie_id, db),
-            hall=get_hall_by_id(session.hall_id, db),
-            start_time=session.start_time
-        ) for session in sessions
+        {
+            "id": id,
+            "movie": movies[movie_id],
+            "hall": halls[hall_id],
+            "startTime": start_time,
+            "remainingSeats": remaining_seats
+        }
+        for id, movie_id, hall_id, start_time, remaining_seats in sessions
+        if movie_id in movies and hall_id in halls
+    ]
+
+
+def get_sessions_availability(params: AvailabilityParams, db: Session) -> list[dict]:
+    """
+    Сводки свободных мест по сеансам из id или периода - одним запросом к расписанию, где число свободных мест
+    уже посчитано; всего мест и минимальная цена берутся из раскладки зала. Несуществующие id пропускаются.
+    """
+    snapshot = catalog.snapshot(db)
+    token = availability_cache.token()
+
+    query = select(ScheduleOrm.session_id, ScheduleOrm.hall_id, ScheduleOrm.remaining_seats)
+    if params.ids:
+        sessions_ids = list(dict.fromkeys(params.ids))
+        found, missing = availability_cache.get_many(sessions_ids)
+        query = query.where(ScheduleOrm.session_id.in_(missing))
+    else:
+        sessions_ids, found, missing = None, {}, True
+        query = query.where(
+            params.start_date <= ScheduleOrm.start_time,
+            ScheduleOrm.start_time <= params.end_date
+        ).order_by(ScheduleOrm.start_time, ScheduleOrm.session_id)
+
+    rows = db.execute(query).all() if missing else []
+    if any(hall_id not in snapshot.layouts for _, hall_id, _ in rows):
+        snapshot = catalog.reload(db)
+
+    payloads = [
+        availability_payload(session_id, snapshot.layouts[hall_id], remaining_seats)
+        for session_id, hall_id, remaining_seats in rows
+        if hall_id in snapshot.layouts
     ]
+    availability_cache.put_many(payloads, token)
 
+    if sessions_ids is None:
+        return payloads
+    found.update((payload["sessionId"], payload) for payload in payloads)
+    return [found[session_id] for session_id in sessions_ids if session_id in found]
 
-def get_seats_for_order(order_id: int, db: Session) -> list[Seat]:
+
+def availability_payload(session_id: int, layout: HallLayout, remaining_seats: int) -> dict:
+    total_seats = len(layout.seats)
+    return {
+        "sessionId": session_id,
+        "totalSeats": total_seats,
+        "bookedSeats": total_seats - remaining_seats,
+        "remainingSeats": remaining_seats,
+        "minPrice": layout.min_price
+    }
+
+
+def search_movies(params: MovieSearchParams, db: Session) -> list[dict]:
+    """Фильмы по релевантности запросу из индекса снимка каталога, с жанрами и оценкой релевантности."""
+    snapshot = catalog.snapshot(db)
+    genres = [genre.strip() for value in params.genres for genre in value.split(",") if genre.strip()]
+
+    return [
+        {
+            **snapshot.movie_payloads[movie.id],
+            "genres": movie.genres,
+            "score": score
+        }
+        for movie, score in snapshot.search_movies(params.q, genres, params.limit)
+    ]
+
+
+def get_seats_for_orders(orders_ids: list[int], db: Session) -> dict[int, list[Seat]]:
     query = (
-        select(SeatsOrm)
-        .join(SeatsOrdersOrm, SeatsOrdersOrm.seat_id == SeatsOrm.id)
-        .filter(SeatsOrdersOrm.order_id == order_id)
+        select(SeatsOrdersOrm.order_id, SeatsOrm)
+        .join(SeatsOrm, SeatsOrdersOrm.seat_id == SeatsOrm.id)
+        .filter(SeatsOrdersOrm.order_id.in_(orders_ids))
+        .order_by(SeatsOrm.row_number, SeatsOrm.seat_number)
     )
-    seats = db.execute(query).scalars().all()
-    return [Seat.model_validate(seat, from_attributes=True) for seat in seats]
+    seats = defaultdict(list)
+    for order_id, seat in db.execute(query).all():
+        seats[order_id].append(Seat.model_validate(seat, from_attributes=True))
+    return seats
 
-def get_seats_for_session(
-        session_id: int,
-        db: Session
-):
-    seat_order_subquery = (
-        exists()
-        .where(
-            and_(
-                SeatsOrdersOrm.seat_id == SeatsOrm.id,
-                SeatsOrdersOrm.order_id == OrdersOrm.id,
-                OrdersOrm.session_id == session_id
-            )
-        )
-    )
+def with_seats(orders: list[Order], db: Session) -> list[OrderDetailed]:
+    seats = get_seats_for_orders([order.id for order in orders], db) if orders else {}
+    return [
+        OrderDetailed(
+            **order.model_dump(),
+            seats=seats.get(order.id, [])
+        ) for order in orders
+    ]
 
+def iter_users_export(db: Session):
     query = (
         select(
-            SeatsOrm,
-            seat_order_subquery.label("is_available")
+            UsersOrm.id,
+            UsersOrm.email,
+            UsersOrm.is_admin.label("isAdmin"),
+            UsersOrm.created_at.label("createdAt")
         )
-        .join(SessionsOrm, SessionsOrm.hall_id == SeatsOrm.hall_id)
-        .filter(SessionsOrm.id == session_id)
-        .order_by(SeatsOrm.seat_number, SeatsOrm.row_number)
+        .order_by(UsersOrm.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
     )
+    for row in db.execute(query).mappings():
+        yield dict(row)
 
-    result = db.execute(query).all()
-    seats = []
-    for seat, is_available in result:
-        seats.append(
-            SeatWithInfo(
-                id=seat.id,
-                hall_id=seat.hall_id,
-                row_number=seat.row_number,
-                seat_number=seat.seat_number,
-                price=seat.price,
-                is_available=not is_available
-            )
+def iter_orders_export(db: Session):
+    query = (
+        select(
+            OrdersOrm.id,
+            OrdersOrm.user_id.label("userId"),
+            OrdersOrm.session_id.label("sessionId"),
+            OrdersOrm.total_price.label("totalPrice"),
+            OrdersOrm.info,
+            OrdersOrm.created_at.label("createdAt"),
+            func.array_remove(func.array_agg(SeatsOrdersOrm.seat_id), None).label("seatsIds")
         )
+        .outerjoin(SeatsOrdersOrm, SeatsOrdersOrm.order_id == OrdersOrm.id)
+        .group_by(OrdersOrm.id)
+        .order_by(OrdersOrm.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in db.execute(query).mappings():
+        yield dict(row)
 
-    return seats
+def get_seats_for_session(
+        session_id: int,
+        db: Session
+) -> list[dict]:
+    return seat_occupancy.get_seats(session_id, db, seat_holds.held_seats(session_id, db))
 
 def delete_user_order(order_id: int, db: Session):
-    delete_record(SeatsOrdersOrm, [SeatsOrdersOrm.order_id == order_id], db)
-    delete_record(OrdersOrm, [OrdersOrm.id == order_id], db)
+    """Удаляет заказ и бронь его мест одной транзакцией, вместе с поправками расписания и итогов продаж."""
+    seats = db.execute(
+        delete(SeatsOrdersOrm)
+        .where(SeatsOrdersOrm.order_id == order_id)
+        .returning(SeatsOrdersOrm.session_id, SeatsOrdersOrm.seat_id)
+    ).all()
+    order = db.execute(
+        delete(OrdersOrm)
+        .where(OrdersOrm.id == order_id)
+        .returning(OrdersOrm.session_id, OrdersOrm.total_price)
+    ).first()
+    if order:
+        record_order(order.session_id, len(seats), order.total_price, db, cancelled=True)
+    if seats:
+        change_remaining_seats(seats[0].session_id, len(seats), db)
+    db.commit()
+    if seats:
+        seat_occupancy.mark_freed(seats[0].session_id, [seat.seat_id for seat in seats])
+
+
+def cancel_session_orders(session_id: int, db: Session) -> dict:
+    """
+    Отменяет все заказы сеанса (например, при отмене показа) двумя удалениями по session_id в одной транзакции,
+    без обхода заказов по одному.
+    """
+    get_session_by_id(session_id, db)
+
+    freed_seats_ids = db.execute(
+        delete(SeatsOrdersOrm)
+        .where(SeatsOrdersOrm.session_id == session_id)
+        .returning(SeatsOrdersOrm.seat_id)
+    ).scalars().all()
+    revenue = db.execute(
+        delete(OrdersOrm)
+        .where(OrdersOrm.session_id == session_id)
+        .returning(OrdersOrm.total_price)
+    ).scalars().all()
+    if revenue:
+        record_order(session_id, len(freed_seats_ids), sum(revenue), db, cancelled=True, orders=len(revenue))
+    if freed_seats_ids:
+        change_remaining_seats(session_id, len(freed_seats_ids), db)
+    db.commit()
+    if freed_seats_ids:
+        seat_occupancy.mark_freed(session_id, freed_seats_ids)
+
+    return {
+        "sessionId": session_id,
+        "cancelledOrders": len(revenue),
+        "freedSeats": len(freed_seats_ids),
+    }
@@ -1,28 +1,141 @@
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+
+from src.pool_metrics import instrumented_pool, register_engine
+from src.replica import reads_from_primary, routing_stats
+
+username = os.getenv("DB_USERNAME", "postgres")
+password = os.getenv("DB_PASSWORD", "12345")
+host = os.getenv("DB_HOST", "127.0.0.1")
+port = os.getenv("DB_PORT", "5438")
+database_name = os.getenv("DB_NAME", "postgres")
 
-from src.models import Base
+# Настройки пула соединений, общие для синхронного и асинхронного движков
+pool_settings = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", -1)),
+}
 
-username = "postgres"
-password = "12345"
-host = "127.0.0.1"
-port = "5438"
-database_name = "postgres"
+# Необязательная реплика только для чтения, с теми же учетными данными; без DB_REPLICA_HOST все идет в основную БД
+replica_host = os.getenv("DB_REPLICA_HOST")
+replica_port = os.getenv("DB_REPLICA_PORT", port)
+replica_database_name = os.getenv("DB_REPLICA_NAME", database_name)
+
+# "sync" - запросы через psycopg2 в пуле потоков, "async" - через asyncpg на event loop
+db_mode = os.getenv("DB_MODE", "sync")
 
 connection_string = f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database_name}"
+async_connection_string = f"postgresql+asyncpg://{username}:{password}@{host}:{port}/{database_name}"
 
-engine = create_engine(connection_string)
+engine = create_engine(connection_string, poolclass=instrumented_pool(QueuePool), **pool_settings)
+register_engine("sync", engine)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = None
+if db_mode == "async":
+    async_engine = create_async_engine(
+        async_connection_string,
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool),
+        **pool_settings
+    )
+    register_engine("async", async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False)
+
+ReadSessionLocal = None
+AsyncReadSessionLocal = None
+if replica_host:
+    if db_mode == "async":
+        async_read_engine = create_async_engine(
+            f"postgresql+asyncpg://{username}:{password}@{replica_host}:{replica_port}/{replica_database_name}",
+            poolclass=instrumented_pool(AsyncAdaptedQueuePool),
+            **pool_settings
+        )
+        register_engine("async-replica", async_read_engine.sync_engine)
+        AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False)
+    else:
+        read_engine = create_engine(
+            f"postgresql+psycopg2://{username}:{password}@{replica_host}:{replica_port}/{replica_database_name}",
+            poolclass=instrumented_pool(QueuePool),
+            **pool_settings
+        )
+        register_engine("sync-replica", read_engine)
+        ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
 
-def create_tables():
-    Base.metadata.create_all(engine)
 
+def migrate(revision: str = "head"):
+    config = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    command.upgrade(config, revision)
+
+
+@asynccontextmanager
+async def open_db():
+    if db_mode == "async":
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
 
-def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await run_in_threadpool(db.close)
+
+
+async def get_db():
+    async with open_db() as db:
+        yield db
+
+
+@asynccontextmanager
+async def open_read_db():
+    """
+    Сессия для чтения: с реплики, если она настроена и клиент недавно ничего не записывал,
+    иначе - с основной БД. Писать через нее нельзя.
+    """
+    if not replica_host or reads_from_primary():
+        if replica_host:
+            routing_stats.record_read(replica=False)
+        async with open_db() as db:
+            yield db
+        return
+
+    routing_stats.record_read(replica=True)
+    if db_mode == "async":
+        async with AsyncReadSessionLocal() as db:
+            yield db
+        return
+
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def get_read_db():
+    async with open_read_db() as db:
+        yield db
+
+
+async def run_db(db: Session | AsyncSession, fn, *args):
+    """
+    Вызывает функцию из crud (последний аргумент которой - сессия) в текущем режиме работы с БД:
+    в пуле потоков для синхронной сессии или на event loop через asyncpg для асинхронной.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: fn(*args, session))
+    return await run_in_threadpool(fn, *args, db)
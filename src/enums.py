@@ -5,4 +5,9 @@ class AgeRating(enum.Enum):
     AGE_6 = "6+"
     AGE_12 = "12+"
     AGE_16 = "16+"
-    AGE_18 = "18+"
\ No newline at end of file
+    AGE_18 = "18+"
+
+class AnalyticsGroup(enum.Enum):
+    MOVIE = "movie"
+    HALL = "hall"
+    DAY = "day"
@@ -0,0 +1,281 @@
+"""
+Ключи идемпотентности (заголовок Idempotency-Key) для создания заказов.
+
+Первый запрос с ключом выполняется и его ответ сохраняется в таблице idempotency_keys в той же транзакции,
+что и заказ, и в LRU-кэше процесса; повторы с тем же ключом получают сохраненный ответ, не доходя до таблиц
+бронирования. Пока первый запрос выполняется, повторы ждут его: в этом процессе - его завершения, в других
+воркерах - записи ответа в БД. Ключ принадлежит пользователю и действует IDEMPOTENCY_KEY_TTL секунд.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import Session
+
+from src.database import open_db, run_db
+from src.models import IdempotencyKeysOrm
+from src.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+# Запрос, не записавший ответ за это время (воркер упал), перестает блокировать ключ. Заказ такого запроса
+# уже не закоммитится: ответ пишется только в строку своего захвата ключа, а после перехвата ее нет
+LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+# Сколько повтор ждет ответа первого запроса из другого воркера, прежде чем ответить 409
+WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+POLL_INTERVAL = 0.1
+PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 60 * 60))
+
+# Занимает ключ; просроченную или брошенную запись перезаписывает. RETURNING пуст, если ключ уже занят
+CLAIM_SQL = text("""
+INSERT INTO idempotency_keys (user_id, key, request_hash, status_code, response, created_at)
+VALUES (:user_id, :key, :request_hash, NULL, NULL, :now)
+ON CONFLICT (user_id, key) DO UPDATE SET
+    request_hash = EXCLUDED.request_hash, status_code = NULL, response = NULL, created_at = EXCLUDED.created_at
+WHERE idempotency_keys.created_at < :expired_before
+   OR (idempotency_keys.status_code IS NULL AND idempotency_keys.created_at < :abandoned_before)
+RETURNING user_id
+""")
+
+
+class StoredResponse:
+    __slots__ = ("request_hash", "status_code", "content", "expires_at")
+
+    def __init__(self, request_hash: str, status_code: int | None, content, expires_at: float = 0):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.content = content
+        self.expires_at = expires_at
+
+
+def fingerprint(body: bytes) -> str:
+    """Хэш тела запроса: повтор с тем же ключом должен повторять и сам запрос."""
+    return hashlib.sha256(body).hexdigest()
+
+
+def mismatch() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key was already used with a different request"
+    )
+
+
+def claim_key(
+        user_id: int, key: str, request_hash: str, claimed_at: datetime.datetime, db: Session
+) -> StoredResponse | None:
+    """
+    Занимает ключ за текущим запросом (None) или возвращает запись, уже сделанную другим запросом.
+    claimed_at отличает этот захват ключа от последующих перехватов брошенного ключа.
+    """
+    claimed = db.execute(CLAIM_SQL, {
+        "user_id": user_id,
+        "key": key,
+        "request_hash": request_hash,
+        "now": claimed_at,
+        "expired_before": claimed_at - datetime.timedelta(seconds=KEY_TTL),
+        "abandoned_before": claimed_at - datetime.timedelta(seconds=LOCK_TIMEOUT),
+    }).first()
+    db.commit()
+    if claimed is not None:
+        return None
+
+    row = db.execute(
+        select(IdempotencyKeysOrm.request_hash, IdempotencyKeysOrm.status_code, IdempotencyKeysOrm.response)
+        .where(IdempotencyKeysOrm.user_id == user_id, IdempotencyKeysOrm.key == key)
+    ).first()
+    if row is None:
+        # Запись удалили между вставкой и чтением - ключ можно занимать заново
+        return StoredResponse(request_hash, None, None)
+    return StoredResponse(row.request_hash, row.status_code, row.response)
+
+
+def save_response(
+        user_id: int, key: str, claimed_at: datetime.datetime, status_code: int, content, db: Session
+):
+    """
+    Записывает ответ в транзакцию запроса без коммита: ответ фиксируется вместе с заказом или не фиксируется вовсе.
+    Строка ключа остается заблокированной до коммита, поэтому перехватить ключ в это время нельзя, а если ключ
+    уже перехвачен как брошенный, транзакция заказа откатывается.
+    """
+    saved = db.execute(
+        update(IdempotencyKeysOrm)
+        .where(
+            IdempotencyKeysOrm.user_id == user_id,
+            IdempotencyKeysOrm.key == key,
+            IdempotencyKeysOrm.created_at == claimed_at,
+            IdempotencyKeysOrm.status_code.is_(None)
+        )
+        .values(status_code=status_code, response=content)
+    ).rowcount
+    if not saved:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency-Key claim expired before the request finished, retry the request"
+        )
+
+
+def release_key(user_id: int, key: str, claimed_at: datetime.datetime, db: Session):
+    """Освобождает ключ запроса, завершившегося ошибкой: повтор выполнится заново."""
+    db.execute(
+        delete(IdempotencyKeysOrm)
+        .where(
+            IdempotencyKeysOrm.user_id == user_id,
+            IdempotencyKeysOrm.key == key,
+            IdempotencyKeysOrm.created_at == claimed_at,
+            IdempotencyKeysOrm.status_code.is_(None)
+        )
+    )
+    db.commit()
+
+
+def purge_keys(db: Session) -> int:
+    deleted = db.execute(
+        delete(IdempotencyKeysOrm)
+        .where(IdempotencyKeysOrm.created_at < datetime.datetime.now() - datetime.timedelta(seconds=KEY_TTL))
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+class IdempotencyCache:
+    """
+    Сохраненные ответы по (id пользователя, ключ) в LRU на max_entries записей и выполняющиеся запросы процесса.
+    Ответы с ошибкой не сохраняются: ключ освобождается, и повтор выполняет запрос заново.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.replays = 0
+        self.waits = 0
+        self._entries: OrderedDict[tuple[int, str], StoredResponse] = OrderedDict()
+        self._in_flight: dict[tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    async def execute(self, user_id: int, key: str, request_hash: str, handler, db: Session) -> ORJSONResponse:
+        """
+        Выполняет handler не больше одного раза на ключ. handler - корутина, возвращающая данные ответа; она
+        получает функцию save_response(content, db), которую должна вызвать в транзакции своего результата
+        до коммита. Повтор с тем же ключом, но другим телом запроса - ошибка клиента (422).
+        """
+        cache_key = (user_id, key)
+        while True:
+            stored = self._get(cache_key)
+            if stored is not None:
+                return self._replay(stored, request_hash)
+            in_flight = self._in_flight.get(cache_key)
+            if in_flight is None:
+                break
+            self.waits += 1
+            await asyncio.shield(in_flight)
+
+        # Между проверкой и регистрацией нет await, поэтому второй такой же запрос процесса встанет в ожидание
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = future
+        try:
+            return await self._execute(cache_key, request_hash, handler, db)
+        finally:
+            del self._in_flight[cache_key]
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "inFlight": len(self._in_flight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "replays": self.replays,
+                "waits": self.waits,
+            }
+
+    async def _execute(self, cache_key: tuple[int, str], request_hash: str, handler, db: Session) -> ORJSONResponse:
+        user_id, key = cache_key
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            claimed_at = datetime.datetime.now()
+            stored = await run_db(db, claim_key, user_id, key, request_hash, claimed_at)
+            if stored is None:
+                break
+            if stored.request_hash != request_hash:
+                raise mismatch()
+            if stored.status_code is not None:
+                self._put(cache_key, stored)
+                return self._replay(stored, request_hash)
+            # Ключ занят запросом в другом воркере
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+            self.waits += 1
+            await asyncio.sleep(POLL_INTERVAL)
+
+        def save(content, db: Session):
+            save_response(user_id, key, claimed_at, status.HTTP_200_OK, jsonable_encoder(content), db)
+
+        try:
+            content = jsonable_encoder(await handler(save))
+        except Exception:
+            # Если ответ уже закоммичен вместе с заказом, ключ не освобождается
+            await run_db(db, release_key, user_id, key, claimed_at)
+            raise
+
+        stored = StoredResponse(request_hash, status.HTTP_200_OK, content)
+        self._put(cache_key, stored)
+        return ORJSONResponse(content, status_code=stored.status_code)
+
+    def _replay(self, stored: StoredResponse, request_hash: str) -> ORJSONResponse:
+        if stored.request_hash != request_hash:
+            raise mismatch()
+        self.replays += 1
+        return ORJSONResponse(stored.content, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"})
+
+    def _get(self, cache_key: tuple[int, str]) -> StoredResponse | None:
+        with self._lock:
+            stored = self._entries.get(cache_key)
+            if stored is None or stored.expires_at <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return stored
+
+    def _put(self, cache_key: tuple[int, str], stored: StoredResponse):
+        stored.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[cache_key] = stored
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+async def purge_periodically(interval: float):
+    """Фоновая задача: раз в interval секунд удаляет просроченные ключи идемпотентности."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with open_db() as db:
+                await run_db(db, purge_keys)
+        except Exception:
+            logger.exception("Idempotency keys purge failed")
+
+
+idempotency_cache = IdempotencyCache(
+    max_entries=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000)),
+    ttl=KEY_TTL,
+)
@@ -1,6 +1,7 @@
 import datetime
 
-from sqlalchemy import ForeignKey, ARRAY, String
+from sqlalchemy import ForeignKey, ARRAY, String, UniqueConstraint, Index, BigInteger
+from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 
 from src.enums import AgeRating
@@ -30,6 +31,10 @@ class GenresOrm(Base):
 
 class MovieGenresOrm(Base):
     __tablename__ = "m2m_movies_genres"
+    __table_args__ = (
+        UniqueConstraint("movie_id", "genre_id"),
+        Index("ix_m2m_movies_genres_genre_id_movie_id", "genre_id", "movie_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     movie_id: Mapped[int] = mapped_column(ForeignKey("movies.id"))
     genre_id: Mapped[int] = mapped_column(ForeignKey("genres.id"))
@@ -42,6 +47,9 @@ class HallsOrm(Base):
 
 class SeatsOrm(Base):
     __tablename__ = "seats"
+    __table_args__ = (
+        Index("ix_seats_hall_id", "hall_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     hall_id: Mapped[int] = mapped_column(ForeignKey("halls.id"))
     row_number: Mapped[int]
@@ -50,13 +58,61 @@ class SeatsOrm(Base):
 
 class SessionsOrm(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_start_time", "start_time"),
+        Index("ix_sessions_movie_id_start_time", "movie_id", "start_time"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     movie_id: Mapped[int] = mapped_column(ForeignKey("movies.id"))
     hall_id: Mapped[int] = mapped_column(ForeignKey("halls.id"))
     start_time: Mapped[datetime.datetime]
 
+class ScheduleOrm(Base):
+    __tablename__ = "schedule"
+    __table_args__ = (
+        Index(
+            "ix_schedule_start_time", "start_time", "session_id",
+            postgresql_include=["movie_id", "hall_id", "remaining_seats"]
+        ),
+        Index("ix_schedule_movie_id_start_time", "movie_id", "start_time"),
+    )
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    start_time: Mapped[datetime.datetime]
+    movie_id: Mapped[int]
+    hall_id: Mapped[int]
+    remaining_seats: Mapped[int]
+    stale: Mapped[bool] = mapped_column(default=False)
+
+class ScheduleStateOrm(Base):
+    __tablename__ = "schedule_state"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    generation: Mapped[int] = mapped_column(BigInteger)
+
+class SalesDailyOrm(Base):
+    __tablename__ = "sales_daily"
+    day: Mapped[datetime.date] = mapped_column(primary_key=True)
+    movie_id: Mapped[int] = mapped_column(primary_key=True)
+    hall_id: Mapped[int] = mapped_column(primary_key=True)
+    orders: Mapped[int]
+    seats_sold: Mapped[int]
+    revenue: Mapped[int] = mapped_column(BigInteger)
+
+class SalesDeltasOrm(Base):
+    __tablename__ = "sales_deltas"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day: Mapped[datetime.date]
+    movie_id: Mapped[int]
+    hall_id: Mapped[int]
+    orders: Mapped[int]
+    seats_sold: Mapped[int]
+    revenue: Mapped[int] = mapped_column(BigInteger)
+
 class OrdersOrm(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_session_id", "session_id"),
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"))
@@ -66,14 +122,49 @@ class OrdersOrm(Base):
 
 class UsersOrm(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_password_hash", "password_hash"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     is_admin: Mapped[bool] = mapped_column(default=False)
     email: Mapped[str]
     password_hash: Mapped[str]
     created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now())
 
+class SeatHoldsOrm(Base):
+    __tablename__ = "seat_holds"
+    __table_args__ = (
+        UniqueConstraint("session_id", "seat_id"),
+        Index("ix_seat_holds_hold_id", "hold_id"),
+        Index("ix_seat_holds_expires_at", "expires_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id", ondelete="CASCADE"))
+    seat_id: Mapped[int] = mapped_column(ForeignKey("seats.id", ondelete="CASCADE"))
+    hold_id: Mapped[str]
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    expires_at: Mapped[datetime.datetime]
+
+class IdempotencyKeysOrm(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key: Mapped[str] = mapped_column(primary_key=True)
+    request_hash: Mapped[str]
+    status_code: Mapped[int | None]
+    response: Mapped[dict | None] = mapped_column(JSON)
+    created_at: Mapped[datetime.datetime]
+
 class SeatsOrdersOrm(Base):
     __tablename__ = "m2m_orders_seats"
+    __table_args__ = (
+        UniqueConstraint("session_id", "seat_id"),
+        Index("ix_m2m_orders_seats_order_id", "order_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"))
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"))
     seat_id: Mapped[int] = mapped_column(ForeignKey("seats.id"))
@@ -0,0 +1,248 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.catalog import catalog, HallLayout
+from src.models import SeatsOrdersOrm, SessionsOrm
+from src.versions import versions
+
+
+class SessionOccupancy:
+    """Битсет занятых мест сеанса: бит с номером позиции места в раскладке зала."""
+
+    __slots__ = ("layout", "catalog_version", "bits", "loaded_at")
+
+    def __init__(self, layout: HallLayout, catalog_version: int, booked_seats_ids):
+        self.layout = layout
+        self.catalog_version = catalog_version
+        self.bits = bytearray((len(layout.seats) + 7) // 8)
+        self.loaded_at = time.monotonic()
+        self.mark(booked_seats_ids, True)
+
+    def mark(self, seats_ids, booked: bool):
+        for seat_id in seats_ids:
+            position = self.layout.positions.get(seat_id)
+            if position is None:
+                continue
+            if booked:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            else:
+                self.bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def is_booked(self, position: int) -> bool:
+        return bool(self.bits[position >> 3] & (1 << (position & 7)))
+
+    def booked_seats_ids(self) -> set[int]:
+        return {seat.id for position, seat in enumerate(self.layout.seats) if self.is_booked(position)}
+
+    @property
+    def size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.bits)
+
+
+class SeatOccupancyCache:
+    """
+    Занятость мест по сеансам в памяти процесса.
+    Сеанс загружается из БД при первом обращении и дальше обновляется через mark_booked/mark_freed
+    после коммита заказа. Холодные сеансы вытесняются по LRU при превышении max_bytes.
+    Изменения из других процессов сюда не попадают, поэтому при нескольких воркерах задается ttl.
+    """
+
+    LOAD_ATTEMPTS = 3
+
+    def __init__(self, max_bytes: int, ttl: float = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sessions: OrderedDict[int, SessionOccupancy] = OrderedDict()
+        self._mutations = 0
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def get_seats(self, session_id: int, db: Session, held: set[int] = frozenset()) -> list[dict]:
+        """
+        Места зала сеанса с признаком isAvailable - сразу camelCase-словари для ответа, без промежуточных моделей.
+        Места из held (временно удерживаемые при оформлении заказа) тоже недоступны.
+        """
+        occupancy = self.get(session_id, db)
+        if occupancy is None:
+            return []
+
+        bits = occupancy.bits
+        if not held:
+            return [
+                {**payload, "isAvailable": not (bits[position >> 3] & (1 << (position & 7)))}
+                for position, payload in enumerate(occupancy.layout.payloads)
+            ]
+        return [
+            {**payload, "isAvailable": not (bits[position >> 3] & (1 << (position & 7))) and payload["id"] not in held}
+            for position, payload in enumerate(occupancy.layout.payloads)
+        ]
+
+    def get(self, session_id: int, db: Session) -> SessionOccupancy | None:
+        with self._lock:
+            occupancy = self._sessions.get(session_id)
+            if occupancy is not None and not self._expired(occupancy):
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return occupancy
+            self.misses += 1
+
+        for _ in range(self.LOAD_ATTEMPTS):
+            with self._lock:
+                mutations = self._mutations
+            occupancy = self._load(session_id, db)
+            if occupancy is None:
+                return None
+            with self._lock:
+                # Заказ, закоммиченный во время загрузки, мог не попасть в прочитанный снимок
+                if mutations == self._mutations:
+                    self._store(session_id, occupancy)
+                    return occupancy
+
+        return occupancy
+
+    def mark_booked(self, session_id: int, seats_ids: list[int]):
+        self._update(session_id, seats_ids, True)
+
+    def mark_freed(self, session_id: int, seats_ids: list[int]):
+        self._update(session_id, seats_ids, False)
+
+    def add_listener(self, listener):
+        """listener(session_id, seats_ids, booked) вызывается после каждого изменения занятости мест."""
+        self._listeners.append(listener)
+
+    def notify(self, session_id: int, seats_ids: list[int], booked: bool):
+        """Сообщает слушателям об изменении доступности мест, не меняя битсет: так видны удержания мест."""
+        for listener in self._listeners:
+            listener(session_id, seats_ids, booked)
+
+    def check(self, session_id: int, db: Session) -> dict:
+        """Сверяет кэш сеанса с БД и при расхождении заменяет его данными из БД."""
+        for _ in range(self.LOAD_ATTEMPTS):
+            with self._lock:
+                mutations = self._mutations
+            actual = self._load(session_id, db)
+            with self._lock:
+                if mutations != self._mutations:
+                    continue
+
+                cached = self._sessions.get(session_id)
+                if actual is None:
+                    self._discard(session_id)
+                    return {"sessionId": session_id, "cached": cached is not None, "consistent": cached is None}
+                if cached is None:
+                    return {"sessionId": session_id, "cached": False, "consistent": True}
+
+                cached_ids = cached.booked_seats_ids()
+                actual_ids = actual.booked_seats_ids()
+                consistent = cached_ids == actual_ids
+                if not consistent:
+                    self._store(session_id, actual)
+
+                return {
+                    "sessionId": session_id,
+                    "cached": True,
+                    "consistent": consistent,
+                    "missingSeatsIds": sorted(actual_ids - cached_ids),
+                    "extraSeatsIds": sorted(cached_ids - actual_ids),
+                }
+
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Session is being modified, retry the check")
+
+    def invalidate(self, session_id: int | None = None):
+        with self._lock:
+            self._mutations += 1
+            if session_id is None:
+                self._sessions.clear()
+                self.size = 0
+            else:
+                self._discard(session_id)
+
+    def version(self, session_id: int | None = None) -> tuple:
+        """
+        Версия занятости мест сеанса (без session_id - всех сеансов) для ETag. При заданном ttl в нее входит
+        номер ttl-интервала: изменения из других процессов видны только после перезагрузки, и ETag меняется не реже нее.
+        """
+        key = ("orders", session_id) if session_id is not None else ("orders",)
+        parts = (versions.get("catalog"), versions.get(*key))
+        if self.ttl:
+            parts += (int(time.time() // self.ttl),)
+        return parts
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "sizeBytes": self.size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _update(self, session_id: int, seats_ids: list[int], booked: bool):
+        with self._lock:
+            self._mutations += 1
+            occupancy = self._sessions.get(session_id)
+            if occupancy is not None:
+                occupancy.mark(seats_ids, booked)
+
+        self.notify(session_id, seats_ids, booked)
+
+    def _expired(self, occupancy: SessionOccupancy) -> bool:
+        # Перезагрузка каталога могла изменить раскладку зала, а с ней и позиции мест в битсете
+        if occupancy.catalog_version != catalog.loaded_version:
+            return True
+        return bool(self.ttl) and time.monotonic() - occupancy.loaded_at > self.ttl
+
+    def _load(self, session_id: int, db: Session) -> SessionOccupancy | None:
+        hall_id = db.execute(select(SessionsOrm.hall_id).where(SessionsOrm.id == session_id)).scalar_one_or_none()
+        if hall_id is None:
+            return None
+
+        layout = catalog.get_layout(hall_id, db)
+        if layout is None:
+            return None
+
+        booked_seats_ids = db.execute(
+            select(SeatsOrdersOrm.seat_id).where(SeatsOrdersOrm.session_id == session_id)
+        ).scalars().all()
+
+        return SessionOccupancy(layout, catalog.loaded_version, booked_seats_ids)
+
+    def _store(self, session_id: int, occupancy: SessionOccupancy):
+        self._discard(session_id)
+        self._sessions[session_id] = occupancy
+        self.size += occupancy.size
+        while self.size > self.max_bytes and len(self._sessions) > 1:
+            _, evicted = self._sessions.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+    def _discard(self, session_id: int):
+        occupancy = self._sessions.pop(session_id, None)
+        if occupancy is not None:
+            self.size -= occupancy.size
+
+
+seat_occupancy = SeatOccupancyCache(
+    max_bytes=int(os.getenv("OCCUPANCY_CACHE_BYTES", 4 * 1024 * 1024)),
+    ttl=float(os.getenv("OCCUPANCY_CACHE_TTL", 0)),
+)
+
+def bump_orders_versions(session_id: int, seats_ids: list[int], booked: bool):
+    versions.bump("orders", session_id)
+    versions.bump("orders")
+
+
+seat_occupancy.add_listener(bump_orders_versions)
@@ -0,0 +1,45 @@
+import base64
+import datetime
+import json
+
+from fastapi import HTTPException, status
+
+from src.schemas import Page
+
+
+def encode_cursor(*values) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """
+    Значения курсора, проверенные по типам ключа сортировки (int или datetime, дата приходит строкой ISO).
+    Испорченный или подделанный курсор - ошибка клиента (400), а не запроса к БД.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Unexpected cursor length")
+        return [parse_cursor_value(value, value_type) for value, value_type in zip(values, types)]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def parse_cursor_value(value, value_type: type):
+    if value_type is datetime.datetime and isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    if value_type is int and isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"Cursor value {value!r} is not {value_type.__name__}")
+
+
+def make_page(items: list, limit: int, key) -> Page:
+    """items выбираются с запасом в одну запись: ее наличие означает, что есть следующая страница."""
+    if len(items) <= limit:
+        return Page(items=items, next_cursor=None)
+
+    items = items[:limit]
+    return Page(items=items, next_cursor=encode_cursor(*key(items[-1])))
@@ -0,0 +1,86 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Счетчики ожидания соединения из пула: гистограмма времени ожидания и число таймаутов."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.wait_histogram[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checkedOut": pool.checkedout(),
+                "checkedIn": pool.checkedin(),
+                "overflowInUse": max(pool.overflow(), 0),
+                "maxOverflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+                "checkouts": self.checkouts,
+                "checkoutTimeouts": self.timeouts,
+                "avgWaitMs": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "maxWaitMs": round(self.max_wait_seconds * 1000, 3),
+                "waitHistogramMs": [
+                    {"le": bucket, "count": count}
+                    for bucket, count in zip((*WAIT_BUCKETS_MS, None), self.wait_histogram)
+                ],
+            }
+
+
+def instrumented_pool(pool_class):
+    """
+    Подкласс пула, замеряющий ожидание свободного соединения.
+    Метрики хранятся на классе, поэтому переживают пересоздание пула при engine.dispose().
+    """
+
+    class InstrumentedPool(pool_class):
+        metrics = PoolMetrics()
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                self.metrics.record_timeout()
+                raise
+            self.metrics.record_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+engines = {}
+
+
+def register_engine(name: str, engine):
+    engines[name] = engine
+
+
+def pools_stats() -> dict:
+    return {
+        name: engine.pool.metrics.stats(engine.pool)
+        for name, engine in engines.items()
+    }
@@ -0,0 +1,169 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Заголовки X-DB-* и отчет об N+1 включаются только в отладочном режиме
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+IN_LIST = re.compile(r"IN \((?:__\[POSTCOMPILE_\w+\]|%\(\w+\)s(?:, %\(\w+\)s)*|\$\d+(?:::\w+)?(?:, \$\d+(?:::\w+)?)*)\)")
+SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Текст запроса без различий в длине списков IN и пробелах: одинаковые формы означают повтор одного запроса."""
+    return IN_LIST.sub("IN (...)", SPACES.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Запросы к БД, выполненные в рамках одного HTTP-запроса или блока query_budget."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        """Формы запросов, выполненные больше threshold раз - кандидаты в N+1."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar("current_stats", default=None)
+# Открытые блоки query_budget текущего контекста: запросы других потоков и фоновых задач в них не попадают
+current_budgets: ContextVar[tuple[QueryStats, ...]] = ContextVar("current_budgets", default=())
+
+
+class NPlusOneReport:
+    """Эндпоинты, на которых один и тот же запрос повторялся больше порога, с самой частой формой запроса."""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.worst: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, route: str, repeated: list[tuple[str, int]]):
+        shape, count = repeated[0]
+        logger.warning("Possible N+1 on %s: %d runs of %s", route, count, shape)
+        with self._lock:
+            self.requests[route] += 1
+            if count > self.worst.get(route, ("", 0))[1]:
+                self.worst[route] = (shape, count)
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "route": route,
+                    "requests": requests,
+                    "statement": self.worst[route][0],
+                    "maxRepeats": self.worst[route][1],
+                }
+                for route, requests in self.requests.most_common()
+            ]
+
+
+n_plus_one_report = NPlusOneReport()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"]
+
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    for budget in current_budgets.get():
+        budget.record(statement, seconds)
+
+
+class QueryStatsMiddleware:
+    """
+    Считает запросы к БД и время в БД на каждый HTTP-запрос и отдает их в заголовках X-DB-Queries и X-DB-Time (мс).
+    Если одна форма запроса повторилась больше N_PLUS_ONE_THRESHOLD раз, добавляет X-DB-Repeated
+    и записывает эндпоинт в n_plus_one_report.
+    """
+
+    def __init__(self, app, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time", f"{stats.seconds * 1000:.2f}".encode()))
+                repeated = stats.repeated(self.threshold)
+                if repeated:
+                    headers.append((b"x-db-repeated", str(repeated[0][1]).encode()))
+                    route = scope.get("route")
+                    path = route.path if route is not None else scope["path"]
+                    n_plus_one_report.add(f"{scope['method']} {path}", repeated)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_stats.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: int | None = None):
+    """
+    Для тестов: считает запросы внутри блока и падает, если их больше max_queries
+    или одна форма запроса повторилась больше max_repeats раз. Считаются запросы текущего контекста
+    и запущенного из него кода (run_in_threadpool и TestClient копируют контекст), но не других потоков
+    и фоновых задач процесса.
+
+        with query_budget(3):
+            client.get("/api/sessions")
+    """
+    stats = QueryStats()
+    token = current_budgets.set(current_budgets.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        current_budgets.reset(token)
+
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries, budget {max_queries}:\n"
+            + "\n".join(f"{count} x {shape}" for shape, count in stats.shapes.most_common())
+        )
+    if max_repeats is not None and stats.repeated(max_repeats):
+        shape, count = stats.repeated(max_repeats)[0]
+        raise QueryBudgetExceeded(f"{count} runs of one statement, limit {max_repeats}: {shape}")
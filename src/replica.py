@@ -0,0 +1,108 @@
+"""
+Маршрутизация чтения между основной БД и репликой.
+
+Эндпоинты только для чтения берут сессию из get_read_db и читают с реплики, если она настроена (DB_REPLICA_HOST).
+Реплика отстает от основной БД, поэтому клиент, чей запрос что-то закоммитил, получает cookie на
+DB_REPLICA_STICKINESS секунд, и все это время его чтения идут в основную БД - он видит свои изменения.
+Cookie, а не память процесса: следующий запрос клиента может попасть в другой воркер.
+
+С реплики читаются только ответы без ETag (списки пользователей и заказов). Эндпоинты с ETag и загрузка каталога
+остаются на основной БД: их версии меняются при коммите в основную БД, и ответ с отстающей реплики закрепился бы
+у клиента под новым ETag (304 до следующего изменения), а каталог - во всем процессе.
+"""
+import math
+import os
+import threading
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+STICKINESS = float(os.getenv("DB_REPLICA_STICKINESS", 5))
+STICKY_COOKIE = "db_primary"
+
+
+class RequestRouting:
+    """Состояние одного HTTP-запроса: нужно ли читать из основной БД и была ли запись."""
+
+    __slots__ = ("primary", "wrote")
+
+    def __init__(self, primary: bool):
+        self.primary = primary
+        self.wrote = False
+
+
+current_routing: ContextVar[RequestRouting | None] = ContextVar("current_routing", default=None)
+
+
+class RoutingStats:
+    def __init__(self):
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.sticky_responses = 0
+        self._lock = threading.Lock()
+
+    def record_read(self, replica: bool):
+        with self._lock:
+            if replica:
+                self.replica_reads += 1
+            else:
+                self.primary_reads += 1
+
+    def record_sticky(self):
+        with self._lock:
+            self.sticky_responses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stickinessSeconds": STICKINESS,
+                "replicaReads": self.replica_reads,
+                "primaryReads": self.primary_reads,
+                "stickyResponses": self.sticky_responses,
+            }
+
+
+routing_stats = RoutingStats()
+
+
+def reads_from_primary() -> bool:
+    routing = current_routing.get()
+    return routing is not None and routing.primary
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    routing = current_routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+class PrimaryStickinessMiddleware:
+    """Отмечает запросы клиентов, недавно записывавших в БД, и ставит cookie в ответы на запросы с записью."""
+
+    def __init__(self, app, stickiness: float = STICKINESS):
+        self.app = app
+        self.cookie = (
+            f"{STICKY_COOKIE}=1; Max-Age={math.ceil(stickiness)}; Path=/; HttpOnly; SameSite=Lax"
+        ).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        routing = RequestRouting(primary=STICKY_COOKIE in Request(scope).cookies)
+        token = current_routing.set(routing)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                routing_stats.record_sticky()
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", self.cookie)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            current_routing.reset(token)
@@ -0,0 +1,57 @@
+from functools import lru_cache
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from src.versions import versions
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    Ответ, который сериализуется в байты одним проходом orjson.
+    Эндпоинт возвращает его напрямую, поэтому FastAPI не прогоняет данные через jsonable_encoder.
+    datetime и Enum orjson кодирует сам так же, как jsonable_encoder, pydantic-модели - через model_dump.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=encode_model, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_model(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError
+
+
+@lru_cache(maxsize=None)
+def camel(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(part.capitalize() for part in rest)
+
+
+def to_camel(model: BaseModel, exclude: tuple[str, ...] = ()) -> dict:
+    """Поля модели в словаре с camelCase-ключами, без вложенных преобразований."""
+    return {camel(name): value for name, value in model.__dict__.items() if name not in exclude}
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join((versions.epoch, *map(str, parts))) + '"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """304 без тела, если ETag из If-None-Match совпадает с текущим; иначе None и запрос обрабатывается как обычно."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=conditional_headers(etag))
+    return None
+
+
+def conditional_headers(etag: str) -> dict:
+    # no-cache: клиент хранит ответ, но перед использованием сверяет его ETag с сервером
+    return {"ETag": etag, "Cache-Control": "no-cache"}
@@ -0,0 +1,363 @@
+import datetime
+import json
+
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from src.admission import admission
+from src.analytics import sales_report
+from src.auth.service import get_current_auth_user_info, is_admin
+from src.auth.jwt_auth.cache import token_cache
+from src.availability import availability_cache
+from src.catalog import catalog
+from src.crud import iter_users_export, iter_orders_export, cancel_session_orders, create_hall
+from src.database import get_db, run_db, SessionLocal, replica_host
+from src.idempotency import idempotency_cache
+from src.occupancy import seat_occupancy
+from src.pool_metrics import pools_stats
+from src.query_stats import DEBUG, N_PLUS_ONE_THRESHOLD, n_plus_one_report
+from src.replica import routing_stats
+from src.schedule import refresh_schedule
+from src.schemas import UserInfo, SalesReportParams, HallLayoutCreate
+from src.seat_holds import seat_holds
+from src.seat_stream import seat_stream
+from src.versions import versions
+
+router = APIRouter(
+    tags=["admin"],
+    prefix="/admin"
+)
+
+
+def ndjson_export(iter_rows):
+    # Выгрузка идет через серверный курсор синхронного движка: в памяти держится только текущая пачка строк
+    with SessionLocal() as db:
+        for row in iter_rows(db):
+            yield json.dumps(row, default=lambda value: value.isoformat() if isinstance(value, datetime.datetime) else str(value)) + "\n"
+
+
+@router.get(
+    "/occupancy",
+    description="Получает статистику кэша занятости мест",
+    summary="Статистика кэша занятости мест"
+)
+async def get_occupancy_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": seat_occupancy.stats()
+    }
+
+
+@router.post(
+    "/occupancy/{session_id}/check",
+    description="Сверяет кэш занятости мест сеанса с базой данных и исправляет расхождения",
+    summary="Проверить кэш занятости мест"
+)
+async def check_occupancy(
+        session_id: int,
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": await run_db(db, seat_occupancy.check, session_id)
+    }
+
+
+@router.get(
+    "/seats-stream",
+    description="Получает статистику подписчиков на изменения мест",
+    summary="Статистика потоков мест"
+)
+async def get_seat_stream_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": seat_stream.stats()
+    }
+
+
+@router.post(
+    "/halls",
+    description="Создает зал по схеме: число рядов, мест в ряду и ценовые зоны по рядам от экрана. "
+                "Места генерируются одним запросом вместе с залом, зал добавляется в каталог в памяти "
+                "без его перезагрузки",
+    summary="Создать зал со схемой мест",
+    status_code=status.HTTP_201_CREATED
+)
+async def create_hall_from_layout(
+        layout: HallLayoutCreate,
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    hall = await run_db(db, create_hall, layout)
+
+    return {
+        "data": {
+            "id": hall.id,
+            "name": hall.name,
+            "totalSeats": hall.total_seats
+        }
+    }
+
+
+@router.delete(
+    "/sessions/{session_id}/orders",
+    description="Отменяет все заказы сеанса (например, при отмене показа) одной транзакцией "
+                "и возвращает число отмененных заказов и освобожденных мест",
+    summary="Отменить все заказы сеанса"
+)
+async def cancel_orders_of_session(
+        session_id: int,
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": await run_db(db, cancel_session_orders, session_id)
+    }
+
+
+@router.get(
+    "/seat-holds",
+    description="Получает статистику удержаний мест: действующие удержания, выданные, отклоненные, "
+                "превращенные в заказы и просроченные",
+    summary="Статистика удержаний мест"
+)
+async def get_seat_holds_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": seat_holds.stats()
+    }
+
+
+@router.get(
+    "/sales",
+    description="Получает выручку, число заказов, проданные места и заполняемость залов за период "
+                "по фильмам, залам или дням сеансов. Отвечает по готовым дневным итогам, без сканирования заказов",
+    summary="Аналитика продаж"
+)
+async def get_sales_report(
+        params: SalesReportParams = Query(),
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    report = await run_db(db, sales_report, params.group_by, params.start_date, params.end_date)
+
+    return {
+        "data": report
+    }
+
+
+@router.get(
+    "/export/users",
+    description="Выгружает всех пользователей в формате NDJSON",
+    summary="Выгрузка пользователей"
+)
+async def export_users(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return StreamingResponse(ndjson_export(iter_users_export), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/export/orders",
+    description="Выгружает все заказы с местами в формате NDJSON",
+    summary="Выгрузка заказов"
+)
+async def export_orders(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return StreamingResponse(ndjson_export(iter_orders_export), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/catalog",
+    description="Получает состояние каталога фильмов, жанров и залов в памяти, включая занимаемую память",
+    summary="Состояние каталога"
+)
+async def get_catalog_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": catalog.stats()
+    }
+
+
+@router.post(
+    "/catalog/reload",
+    description="Перезагружает каталог фильмов, жанров и залов из базы данных, пересобирает расписание "
+                "и сбрасывает ETag расписания - нужно после изменений, сделанных в БД в обход API",
+    summary="Перезагрузить каталог"
+)
+async def reload_catalog(
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    await run_db(db, catalog.reload)
+    await run_db(db, refresh_schedule)
+    versions.bump("sessions")
+
+    return {
+        "data": catalog.stats()
+    }
+
+
+@router.post(
+    "/schedule/refresh",
+    description="Полностью пересобирает расписание для списка сеансов из сеансов, мест залов и заказов - "
+                "нужно после изменений залов и мест, сделанных в БД в обход API. Новые и измененные сеансы "
+                "фоновое обновление подхватывает само",
+    summary="Пересобрать расписание"
+)
+async def refresh_schedule_rows(
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": {
+            "changedRows": await run_db(db, refresh_schedule)
+        }
+    }
+
+
+@router.get(
+    "/token-cache",
+    description="Получает статистику кэша проверенных токенов",
+    summary="Статистика кэша токенов"
+)
+async def get_token_cache_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": token_cache.stats()
+    }
+
+
+@router.get(
+    "/availability-cache",
+    description="Получает статистику кэша сводок свободных мест по сеансам",
+    summary="Статистика кэша свободных мест"
+)
+async def get_availability_cache_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": availability_cache.stats()
+    }
+
+
+@router.get(
+    "/idempotency",
+    description="Получает статистику кэша ответов по ключам идемпотентности: записи, попадания, "
+                "повторенные ответы и ожидания выполняющихся запросов",
+    summary="Статистика ключей идемпотентности"
+)
+async def get_idempotency_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": idempotency_cache.stats()
+    }
+
+
+@router.get(
+    "/admission",
+    description="Получает состояние ограничения запросов: выполняющиеся запросы, предел одновременных запросов "
+                "и по классам эндпоинтов - пропущенные, отклоненные по частоте (429) и сброшенные при перегрузке (503)",
+    summary="Статистика ограничения запросов"
+)
+async def get_admission_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": admission.stats()
+    }
+
+
+@router.get(
+    "/pool",
+    description="Получает состояние пулов соединений с базой данных: занятые соединения, overflow, "
+                "гистограмму времени ожидания соединения и число таймаутов",
+    summary="Состояние пула соединений"
+)
+async def get_pool_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": pools_stats()
+    }
+
+
+@router.get(
+    "/replica",
+    description="Получает состояние маршрутизации чтения: настроена ли реплика, сколько чтений ушло на реплику "
+                "и в основную БД и сколько ответов закрепили клиента за основной БД после записи",
+    summary="Маршрутизация чтения на реплику"
+)
+async def get_replica_stats(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": {
+            "configured": bool(replica_host),
+            **routing_stats.stats()
+        }
+    }
+
+
+@router.get(
+    "/queries",
+    description="Получает эндпоинты, на которых один и тот же SQL-запрос выполнялся за запрос больше порога (N+1). "
+                "Заполняется только в отладочном режиме (DEBUG=true)",
+    summary="Подозрения на N+1"
+)
+async def get_n_plus_one_report(
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    return {
+        "data": {
+            "enabled": DEBUG,
+            "threshold": N_PLUS_ONE_THRESHOLD,
+            "routes": n_plus_one_report.stats()
+        }
+    }
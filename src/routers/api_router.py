@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
 from src.auth.auth_router import router as auth_router
 from src.auth.service import get_current_auth_user_info
 from src.crud import get_all_genres, delete_user_order
-from src.database import get_db
+from src.database import get_db, run_db
+from src.responses import ORJSONResponse, make_etag, not_modified, conditional_headers
+from src.routers.admin_router import router as admin_router
+from src.routers.movies_router import router as movies_router
 from src.routers.orders_router import router as orders_router
 from src.routers.session_router import router as session_router
 from src.routers.users_router import router as users_router
 from src.schemas import UserInfo
+from src.versions import versions
 
 router = APIRouter(
     prefix="/api",
@@ -18,6 +22,8 @@ router.include_router(session_router)
 router.include_router(orders_router)
 router.include_router(auth_router)
 router.include_router(users_router)
+router.include_router(admin_router)
+router.include_router(movies_router)
 
 
 @router.get(
@@ -26,21 +32,20 @@ router.include_router(users_router)
     summary="Получить список жанров",
     tags=["utils"]
 )
-def get_genres_all(
+async def get_genres_all(
+        request: Request,
         db: Session = Depends(get_db),
         user: UserInfo = Depends(get_current_auth_user_info)
 ):
-    genres = get_all_genres(db)
+    etag = make_etag(versions.get("catalog"))
+    if response := not_modified(request, etag):
+        return response
 
-    return {
-        "data" : [
-            {
-                "id" : genre.id,
-                "name" : genre.name
-            }
-            for genre in genres
-        ]
-    }
+    genres = await run_db(db, get_all_genres)
+
+    return ORJSONResponse({
+        "data" : genres
+    }, headers=conditional_headers(etag))
 
 @router.delete(
     "/orders/{id}",
@@ -48,11 +53,11 @@ def get_genres_all(
     summary="Удалить заказ",
     tags=["utils"]
 )
-def delete_order(
+async def delete_order(
         id: int,
         db: Session = Depends(get_db)
 ):
-    delete_user_order(id, db)
+    await run_db(db, delete_user_order, id)
 
     return {
         "data" : {
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+
+from src.admission import admission, LISTING
+from src.auth.service import get_current_auth_user_info
+from src.crud import search_movies
+from src.database import get_db, run_db
+from src.responses import ORJSONResponse, make_etag, not_modified, conditional_headers
+from src.schemas import MovieSearchParams, UserInfo
+from src.versions import versions
+
+router = APIRouter(
+    tags=["movies"],
+    prefix="/movies"
+)
+
+@router.get(
+    "/search",
+    description="Ищет фильмы по словам из названия, режиссера, актеров и жанров и сортирует по релевантности: "
+                "совпадение в названии важнее, чем у режиссера, актеров или жанра, полное слово - важнее начала слова",
+    summary="Поиск фильмов",
+    dependencies=[Depends(admission.limit(LISTING))]
+)
+async def search_movies_by_query(
+        request: Request,
+        params: MovieSearchParams = Query(),
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    etag = make_etag(versions.get("catalog"))
+    if response := not_modified(request, etag):
+        return response
+
+    movies = await run_db(db, search_movies, params)
+
+    return ORJSONResponse({
+        "data": movies
+    }, headers=conditional_headers(etag))
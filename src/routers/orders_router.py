@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
+from functools import partial
+
+from fastapi import APIRouter, Depends, Header, Query
 from sqlalchemy.orm import Session
 
-from src.auth.service import get_current_auth_user_info
-from src.crud import add_order
-from src.database import get_db
-from src.schemas import OrderCreate, UserInfo
+from src.admission import admission, ORDERS
+from src.auth.service import get_current_auth_user_info, is_admin
+from src.crud import add_order, get_all_orders
+from src.database import get_db, get_read_db, run_db
+from src.idempotency import MAX_KEY_LENGTH, fingerprint, idempotency_cache
+from src.schemas import Order, OrderCreate, UserInfo, PageParams
 
 router = APIRouter(
     tags=["orders"],
@@ -12,27 +16,85 @@ router = APIRouter(
 )
 
 
+def order_response(created: Order) -> dict:
+    return {
+        "data" : {
+            "id" : created.id,
+            "userId": created.user_id,
+            "sessionId": created.session_id,
+            "totalPrice": created.total_price,
+            "info": created.info,
+            "createdAt": created.created_at
+        }
+    }
+
+
 @router.post(
     "",
-    description="Создает заказ и бронирует места в зале",
-    summary="Создать заказ"
+    description="Создает заказ и бронирует места в зале. С заголовком Idempotency-Key повтор запроса "
+                "возвращает ответ первого запроса, а не создает еще один заказ",
+    summary="Создать заказ",
+    dependencies=[Depends(admission.limit(ORDERS))]
 )
-def create_order(
+async def create_order(
         order: OrderCreate,
+        idempotency_key: str | None = Header(default=None, max_length=MAX_KEY_LENGTH),
         db: Session = Depends(get_db),
         user: UserInfo = Depends(get_current_auth_user_info)
 ):
-    order = add_order(order, db)
+    async def create(save_response=None):
+        # Ответ на запрос с Idempotency-Key записывается в транзакции заказа
+        def before_commit(created: Order, db: Session):
+            if save_response is not None:
+                save_response(order_response(created), db)
 
-    return {
-        "data" : {
-            "id" : order.id,
-            "userId": order.user_id,
-            "sessionId": order.session_id,
-            "totalPrice": order.total_price,
-            "info": order.info,
-            "createdAt": order.created_at
-        }
-    }
+        # Удержания мест проверяются по авторизованному пользователю, а не по user_id из тела запроса
+        holder_id = user.id if isinstance(user, UserInfo) else None
+        created = await run_db(db, partial(add_order, before_commit=before_commit, holder_id=holder_id), order)
+        return order_response(created)
+
+    if idempotency_key is None:
+        return await create()
+
+    return await idempotency_cache.execute(
+        user.id, idempotency_key, fingerprint(order.model_dump_json().encode()), create, db
+    )
 
 
+@router.get(
+    "",
+    description="Получает список всех заказов постранично",
+    summary="Список заказов"
+)
+async def get_orders(
+        page: PageParams = Query(),
+        db: Session = Depends(get_read_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    is_admin(user)
+
+    orders = await run_db(db, get_all_orders, page)
+    return {
+        "data" : [
+            {
+                "id" : order.id,
+                "userId" : order.user_id,
+                "sessionId" : order.session_id,
+                "totalPrice" : order.total_price,
+                "info" : order.info,
+                "createdAt" : order.created_at,
+                "seats" : [
+                    {
+                        "id" : seat.id,
+                        "hallId" : seat.hall_id,
+                        "rowNumber" : seat.row_number,
+                        "seatNumber" : seat.seat_number,
+                        "price" : seat.price,
+                    }
+                    for seat in order.seats
+                ]
+            }
+            for order in orders.items
+        ],
+        "nextCursor" : orders.next_cursor
+    }
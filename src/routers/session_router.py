@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from starlette import status
 
+from src.admission import admission, SEATS, ORDERS, LISTING
 from src.auth.service import get_current_auth_user_info
 from src.crud import get_session_by_id, get_seats_for_session, get_filtered_sessions, get_movie_by_id, \
-    get_hall_by_id
-from src.database import get_db
-from src.schemas import SessionFilters, UserInfo
+    get_hall_by_id, get_sessions_availability
+from src.database import get_db, run_db
+from src.occupancy import seat_occupancy
+from src.responses import ORJSONResponse, make_etag, not_modified, conditional_headers
+from src.schemas import SessionFilters, UserInfo, AvailabilityParams, SeatHoldCreate
+from src.seat_holds import seat_holds
+from src.seat_stream import SeatStreamResponse, seat_stream
+from src.versions import versions
 
 router = APIRouter(
     tags=["sessions"],
@@ -15,52 +21,70 @@ router = APIRouter(
 
 @router.get(
     "",
-    description="Получает все сеансы в кинотеатре",
+    description="Получает все сеансы в кинотеатре с числом свободных мест",
     summary="Список сеансов в кинотеатре",
+    dependencies=[Depends(admission.limit(LISTING))]
 )
-def get_all_sessions(
+async def get_all_sessions(
+        request: Request,
         db: Session = Depends(get_db),
         filters: SessionFilters = Query(),
         user: UserInfo = Depends(get_current_auth_user_info)
 ):
-    sessions = get_filtered_sessions(filters, db)
+    # В списке есть число свободных мест, поэтому ETag меняется и при любом бронировании
+    etag = make_etag(versions.get("sessions"), *seat_occupancy.version())
+    if response := not_modified(request, etag):
+        return response
 
-    return {
-        "data": [
-            {
-                "id": session.id,
-                "movie": {
-                    "id": session.movie.id,
-                    "title": session.movie.title,
-                    "director": session.movie.director,
-                    "screenwriter": session.movie.screenwriter,
-                    "actors": session.movie.actors,
-                    "description": session.movie.description,
-                    "trailerUrl": session.movie.trailer_url,
-                    "posterUrl": session.movie.poster_url,
-                    "ageRating": session.movie.age_rating,
-                    "duration": session.movie.duration
-                },
-                "hall": session.hall,
-                "startTime": session.start_time
-            }
-            for session in sessions
-        ]
-    }
+    sessions = await run_db(db, get_filtered_sessions, filters)
+
+    return ORJSONResponse({
+        "data": sessions
+    }, headers=conditional_headers(etag))
+
+@router.get(
+    "/availability",
+    description="Получает для сеансов из списка id или периода число всех, занятых и свободных мест "
+                "и минимальную цену места",
+    summary="Свободные места для нескольких сеансов",
+    dependencies=[Depends(admission.limit(LISTING))]
+)
+async def get_availability(
+        request: Request,
+        params: AvailabilityParams = Query(),
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    etag = make_etag(versions.get("sessions"), *seat_occupancy.version())
+    if response := not_modified(request, etag):
+        return response
+
+    availability = await run_db(db, get_sessions_availability, params)
+
+    return ORJSONResponse({
+        "data": availability
+    }, headers=conditional_headers(etag))
 
 @router.get(
     "/{id}",
     description="Получает подробную информацию о фильме текущего сеанса",
     summary="Подробная информация о сеансе",
+    dependencies=[Depends(admission.limit(LISTING))]
 )
-def get_session(
+async def get_session(
         id: int,
+        request: Request,
         db: Session = Depends(get_db),
         user: UserInfo = Depends(get_current_auth_user_info)
 ):
-    session = get_session_by_id(id, db)
-    movie = get_movie_by_id(session.movie_id, db)
-    return {
+    etag = make_etag(versions.get("catalog"), versions.get("sessions"))
+    if response := not_modified(request, etag):
+        return response
+
+    session = await run_db(db, get_session_by_id, id)
+    movie = await run_db(db, get_movie_by_id, session.movie_id)
+    hall = await run_db(db, get_hall_by_id, session.hall_id)
+    return ORJSONResponse({
         "data" : {
             "id": session.id,
             "movie": {
@@ -76,35 +100,92 @@ def get_session(
                 "ageRating": movie.age_rating,
                 "duration": movie.duration,
             },
-            "hall": get_hall_by_id(session.hall_id, db),
+            "hall": hall,
             "startTime": session.start_time
         }
-    }
+    }, headers=conditional_headers(etag))
 
 @router.get(
     "/{id}/seats",
     description="Получает список всех места в зале для текущего сеанса",
     summary="Список мест для сеанса",
-    status_code=status.HTTP_200_OK
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit(SEATS))]
 )
-def seats_for_session(
+async def seats_for_session(
         id: int,
+        request: Request,
         db: Session = Depends(get_db),
         user: UserInfo = Depends(get_current_auth_user_info)
 ):
-    seats = get_seats_for_session(id, db)
+    etag = make_etag(*seat_occupancy.version(id))
+    if response := not_modified(request, etag):
+        return response
+
+    seats = await run_db(db, get_seats_for_session, id)
+
+    return ORJSONResponse({
+        "data" : seats
+    }, headers=conditional_headers(etag))
+
+@router.post(
+    "/{id}/holds",
+    description="Удерживает места сеанса за пользователем на время оформления заказа: пока удержание действует, "
+                "места недоступны другим. Новое удержание на сеансе заменяет прежнее. "
+                "Заказ с holdId забирает удержанные места",
+    summary="Удержать места",
+    dependencies=[Depends(admission.limit(ORDERS))]
+)
+async def hold_seats(
+        id: int,
+        hold: SeatHoldCreate,
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    seats_ids = list(dict.fromkeys(hold.seats_ids))
+    hold = await run_db(db, seat_holds.hold, id, user.id, seats_ids)
 
     return {
-        "data" : [
-            {
-                "id": seat.id,
-                "hallId": seat.hall_id,
-                "rowNumber": seat.row_number,
-                "seatNumber": seat.seat_number,
-                "price": seat.price,
-                "isAvailable": seat.is_available
-            }
-            for seat in seats
-        ]
+        "data": hold.payload()
     }
 
+@router.delete(
+    "/{id}/holds/{hold_id}",
+    description="Снимает удержание мест, места снова становятся доступны",
+    summary="Снять удержание мест",
+    dependencies=[Depends(admission.limit(ORDERS))]
+)
+async def release_seats(
+        id: int,
+        hold_id: str,
+        db: Session = Depends(get_db),
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    await run_db(db, seat_holds.release, id, hold_id, user.id)
+
+    return {
+        "data": {
+            "holdId": hold_id
+        }
+    }
+
+@router.get(
+    "/{id}/seats/stream",
+    description="Поток событий (SSE) о занятости мест сеанса: сначала полный снимок, затем только изменения",
+    summary="Поток изменений мест для сеанса",
+    dependencies=[Depends(admission.limit(SEATS, concurrent=False))]
+)
+async def stream_seats_for_session(
+        id: int,
+        user: UserInfo = Depends(get_current_auth_user_info)
+):
+    subscriber = seat_stream.subscribe(id)
+
+    return SeatStreamResponse(
+        seat_stream,
+        subscriber,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
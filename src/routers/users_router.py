@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from starlette import status
 
 from src.auth.service import get_current_auth_user_info, is_admin
 from src.crud import get_all_users, get_user_orders
-from src.database import get_db
-from src.schemas import User
+from src.database import get_read_db, run_db
+from src.schemas import User, PageParams
 
 router = APIRouter(
     tags=["users"],
@@ -17,13 +17,14 @@ router = APIRouter(
     description="Получает список данных о пользователях",
     summary="Список пользователей"
 )
-def get_users(
-        db: Session = Depends(get_db),
+async def get_users(
+        page: PageParams = Query(),
+        db: Session = Depends(get_read_db),
         user: User = Depends(get_current_auth_user_info)
 ):
     is_admin(user)
 
-    users = get_all_users(db)
+    users = await run_db(db, get_all_users, page)
 
     return {
         "data" : [
@@ -33,8 +34,9 @@ def get_users(
                 "isAdmin" : user.is_admin,
                 "createdAt" : user.created_at
             }
-            for user in users
-        ]
+            for user in users.items
+        ],
+        "nextCursor" : users.next_cursor
     }
 
 @router.get(
@@ -42,14 +44,15 @@ def get_users(
     description="Получает данные о заказах конкретного пользователя",
     summary="Список заказов пользователя"
 )
-def get_user_all_orders(
+async def get_user_all_orders(
         id: int,
-        db: Session = Depends(get_db),
+        page: PageParams = Query(),
+        db: Session = Depends(get_read_db),
         user: User = Depends(get_current_auth_user_info)
 ):
     is_admin(user)
 
-    orders = get_user_orders(id, db)
+    orders = await run_db(db, get_user_orders, id, page)
     return {
         "data" : [
             {
@@ -70,6 +73,7 @@ def get_user_all_orders(
                     for seat in order.seats
                 ]
             }
-            for order in orders
-        ]
+            for order in orders.items
+        ],
+        "nextCursor" : orders.next_cursor
     }
\ No newline at end of file
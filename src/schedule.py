@@ -0,0 +1,175 @@
+"""
+Расписание (таблица schedule) для списка сеансов: строка на сеанс с фильмом, залом и числом свободных мест.
+
+Заказы и отмены сдвигают число свободных мест в своей транзакции. Сеансы создаются и меняются только в БД в обход
+API: изменение сеанса помечает его строку устаревшей (триггер на sessions), а фоновое обновление раз
+в SCHEDULE_REFRESH_INTERVAL секунд пересчитывает только такие строки и сеансы без строки. Обновление выполняет
+один воркер под advisory-блокировкой, остальные узнают об изменениях по schedule_state.generation.
+Полная пересборка по всем сеансам и заказам - после изменений залов и мест в БД, по запросу администратора или:
+
+    python -m src.schedule
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from src.database import open_db, run_db
+from src.models import ScheduleOrm
+from src.versions import versions
+
+logger = logging.getLogger(__name__)
+
+# Период обновления новых и измененных сеансов в секундах, 0 - только при старте.
+# Сеансы создаются только в БД в обход API, поэтому без обновления новые сеансы не попадут в список
+REFRESH_INTERVAL = float(os.getenv("SCHEDULE_REFRESH_INTERVAL", 30))
+
+# Ключ advisory-блокировки обновления: воркер, не получивший ее, пропускает свой запуск
+REFRESH_LOCK_KEY = 4017
+
+# Пересобирает строки всех сеансов одним запросом; неизменившиеся строки не перезаписываются
+REFRESH_SQL = text("""
+INSERT INTO schedule (session_id, start_time, movie_id, hall_id, remaining_seats, stale)
+SELECT
+    sessions.id, sessions.start_time, sessions.movie_id, sessions.hall_id,
+    COALESCE(hall_seats.count, 0) - COALESCE(booked.count, 0), false
+FROM sessions
+LEFT JOIN (SELECT hall_id, count(*) FROM seats GROUP BY hall_id) AS hall_seats ON hall_seats.hall_id = sessions.hall_id
+LEFT JOIN (
+    SELECT session_id, count(*) FROM m2m_orders_seats GROUP BY session_id
+) AS booked ON booked.session_id = sessions.id
+ORDER BY sessions.id
+ON CONFLICT (session_id) DO UPDATE SET
+    start_time = EXCLUDED.start_time, movie_id = EXCLUDED.movie_id, hall_id = EXCLUDED.hall_id,
+    remaining_seats = EXCLUDED.remaining_seats, stale = false
+WHERE schedule.* IS DISTINCT FROM EXCLUDED.*
+""")
+
+# Сеансы без строки расписания и с устаревшей строкой; места считаются только по ним
+PENDING_SESSIONS = """
+FROM sessions
+LEFT JOIN schedule ON schedule.session_id = sessions.id
+WHERE schedule.session_id IS NULL OR schedule.stale
+"""
+
+HAS_PENDING_SQL = text(f"SELECT EXISTS (SELECT 1 {PENDING_SESSIONS})")
+
+REFRESH_PENDING_SQL = text(f"""
+INSERT INTO schedule (session_id, start_time, movie_id, hall_id, remaining_seats, stale)
+SELECT
+    sessions.id, sessions.start_time, sessions.movie_id, sessions.hall_id,
+    (SELECT count(*) FROM seats WHERE seats.hall_id = sessions.hall_id)
+    - (SELECT count(*) FROM m2m_orders_seats WHERE m2m_orders_seats.session_id = sessions.id),
+    false
+{PENDING_SESSIONS}
+ORDER BY sessions.id
+ON CONFLICT (session_id) DO UPDATE SET
+    start_time = EXCLUDED.start_time, movie_id = EXCLUDED.movie_id, hall_id = EXCLUDED.hall_id,
+    remaining_seats = EXCLUDED.remaining_seats, stale = false
+""")
+
+# Пересчет ждет транзакций, уже забронировавших или освободивших места, и изменений сеансов, а новые ждут
+# его коммита. Иначе он посчитал бы места без незакоммиченного заказа и после его коммита затер бы сдвиг,
+# сделанный в его транзакции, или снял бы пометку stale с сеанса, измененного во время пересчета
+LOCK_SOURCES_SQL = text("LOCK TABLE sessions, m2m_orders_seats IN SHARE MODE")
+
+BUMP_GENERATION_SQL = text("UPDATE schedule_state SET generation = generation + 1 WHERE id = 1")
+GENERATION_SQL = text("SELECT generation FROM schedule_state WHERE id = 1")
+
+
+def refresh_schedule(db: Session) -> int:
+    """
+    Пересобирает расписание по всем сеансам, залам и заказам. Нужно после изменений залов и мест в БД
+    в обход API; возвращает число вставленных или измененных строк.
+    """
+    db.execute(LOCK_SOURCES_SQL)
+    changed = db.execute(REFRESH_SQL).rowcount
+    if changed:
+        db.execute(BUMP_GENERATION_SQL)
+    db.commit()
+    if changed:
+        versions.bump("sessions")
+    return changed
+
+
+def refresh_pending(db: Session) -> int:
+    """
+    Добавляет в расписание новые сеансы и пересчитывает помеченные устаревшими. Пока другой воркер делает то же
+    самое, сразу возвращает 0; без новых и измененных сеансов не блокирует бронирования.
+    Возвращает число вставленных или измененных строк.
+    """
+    try:
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY}).scalar():
+            return 0
+        if not db.execute(HAS_PENDING_SQL).scalar():
+            return 0
+        db.execute(LOCK_SOURCES_SQL)
+        changed = db.execute(REFRESH_PENDING_SQL).rowcount
+        if changed:
+            db.execute(BUMP_GENERATION_SQL)
+        db.commit()
+    finally:
+        # Блокировка снимается с концом транзакции, в том числе при раннем выходе
+        db.rollback()
+    if changed:
+        versions.bump("sessions")
+    return changed
+
+
+def schedule_generation(db: Session) -> int:
+    """Номер последнего обновления расписания, изменившего строки, в любом воркере."""
+    generation = db.execute(GENERATION_SQL).scalar()
+    db.rollback()
+    return generation
+
+
+def change_remaining_seats(session_id: int, delta: int, db: Session):
+    """
+    Сдвигает число свободных мест сеанса в текущей транзакции заказа, без коммита. Вызывается последним запросом
+    перед коммитом: блокировка строки сеанса держится только до него, а не всю транзакцию заказа.
+    """
+    db.execute(
+        update(ScheduleOrm)
+        .where(ScheduleOrm.session_id == session_id)
+        .values(remaining_seats=ScheduleOrm.remaining_seats + delta)
+    )
+
+
+async def refresh_periodically(interval: float):
+    """
+    Фоновая задача: раз в interval секунд подхватывает новые и измененные сеансы и сбрасывает ETag расписания,
+    если его изменил любой воркер.
+    """
+    # Первый запуск сбрасывает ETag безусловно: расписание могли изменить после старта этого воркера
+    generation = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with open_db() as db:
+                await run_db(db, refresh_pending)
+                current = await run_db(db, schedule_generation)
+            if current != generation:
+                versions.bump("sessions")
+            generation = current
+        except Exception:
+            logger.exception("Schedule refresh failed")
+
+
+def main():
+    argparse.ArgumentParser(description="Rebuild the schedule from all sessions, halls and orders").parse_args()
+
+    from src.database import SessionLocal
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        changed = refresh_schedule(db)
+        print(json.dumps({"changedRows": changed, "seconds": round(time.perf_counter() - started, 3)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
 import datetime
+from typing import Generic, TypeVar
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 
-from src.enums import AgeRating
+from src.enums import AgeRating, AnalyticsGroup
 
 MIN_LENGTH_PASSWORD = 8
 MAX_LENGTH_PASSWORD = 20
 MIN_LENGTH_INFO = 10
 MAX_LENGTH_INFO = 50
+MAX_PAGE_LIMIT = 500
+MAX_HOLD_SEATS = 20
+MAX_HALL_ROWS = 100
+MAX_SEATS_PER_ROW = 100
+
+T = TypeVar("T")
 
 
 class Movie(BaseModel):
@@ -41,6 +48,31 @@ class Hall(BaseModel):
     total_seats: int
 
 
+class PriceZone(BaseModel):
+    rows: int = Field(description="Число рядов зоны", ge=1, le=MAX_HALL_ROWS)
+    price: int = Field(description="Цена места в зоне", ge=0)
+
+
+class HallLayoutCreate(BaseModel):
+    name: str = Field(description="Название зала", min_length=1)
+    rows: int = Field(description="Число рядов", ge=1, le=MAX_HALL_ROWS)
+    seats_per_row: int = Field(description="Число мест в ряду", ge=1, le=MAX_SEATS_PER_ROW)
+    zones: list[PriceZone] = Field(
+        description="Ценовые зоны подряд от экрана к концу зала, вместе покрывают все ряды",
+        min_length=1
+    )
+
+    @model_validator(mode="after")
+    def check_zones(self):
+        if sum(zone.rows for zone in self.zones) != self.rows:
+            raise ValueError("Price zones must cover all rows of the hall")
+        return self
+
+    def row_prices(self) -> list[int]:
+        """Цена места по номеру ряда (с первого)."""
+        return [zone.price for zone in self.zones for _ in range(zone.rows)]
+
+
 class Genre(BaseModel):
     id: int
     name: str
@@ -76,6 +108,15 @@ class OrderCreate(BaseModel):
     session_id: int
     total_price: int
     info: str
+    hold_id: str | None = None
+
+
+class SeatHoldCreate(BaseModel):
+    seats_ids: list[int] = Field(
+        description="Id мест, которые нужно удержать на время оформления заказа",
+        min_length=1,
+        max_length=MAX_HOLD_SEATS
+    )
 
 
 class Order(BaseModel):
@@ -119,6 +160,84 @@ class SessionFilters(BaseModel):
     #         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="The end date must be greater than the start date.")
     #     return v
 
+class PageParams(BaseModel):
+    cursor: str = Field(
+        description="Курсор следующей страницы",
+        default=""
+    )
+    limit: int = Field(
+        description="Количество записей на странице",
+        default=50,
+        ge=1,
+        le=MAX_PAGE_LIMIT
+    )
+
+
+class MovieSearchParams(BaseModel):
+    q: str = Field(
+        description="Слова из названия, режиссера, актеров или жанров; последнее слово может быть началом слова",
+        default=""
+    )
+    genres: list[str] = Field(
+        description="Жанры, которые все должны быть у фильма (через запятую или несколькими параметрами)",
+        default=[]
+    )
+    limit: int = Field(
+        description="Количество фильмов в ответе",
+        default=20,
+        ge=1,
+        le=MAX_PAGE_LIMIT
+    )
+
+
+class AvailabilityParams(BaseModel):
+    ids: list[int] = Field(
+        description="Id сеансов через запятую или несколькими параметрами",
+        default=[],
+        max_length=MAX_PAGE_LIMIT
+    )
+    start_date: datetime.datetime | None = Field(
+        description="Начало периода, если id сеансов не заданы",
+        default=None
+    )
+    end_date: datetime.datetime | None = Field(
+        description="Конец периода, если id сеансов не заданы",
+        default=None
+    )
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_ids(cls, value):
+        if isinstance(value, str):
+            value = [value]
+        return [part for item in value for part in str(item).split(",") if part.strip()]
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if not self.ids and (self.start_date is None or self.end_date is None):
+            raise ValueError("Pass session ids or both start_date and end_date")
+        return self
+
+
+class SalesReportParams(BaseModel):
+    group_by: AnalyticsGroup = Field(
+        description="Группировка: по фильмам, залам или дням",
+        default=AnalyticsGroup.DAY
+    )
+    start_date: datetime.date | None = Field(
+        description="Первый день периода (день сеанса)",
+        default=None
+    )
+    end_date: datetime.date | None = Field(
+        description="Последний день периода включительно",
+        default=None
+    )
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None
+
 class UserForm(BaseModel):
     email: EmailStr = Field(title="Email", default="user@example.com")
     password: str = Field(
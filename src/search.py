@@ -0,0 +1,115 @@
+import bisect
+import heapq
+import re
+from collections import defaultdict
+
+from src.schemas import MovieWithGenres
+
+WORD = re.compile(r"\w+")
+
+# Вес совпадения по полю: слово из названия важнее, чем из жанра или списка актеров
+FIELD_WEIGHTS = {
+    "title": 4.0,
+    "director": 2.0,
+    "actors": 2.0,
+    "genres": 1.5,
+}
+# Совпадение по началу слова весит меньше полного совпадения слова
+PREFIX_FACTOR = 0.5
+# Запрос целиком совпадает с началом названия
+TITLE_PREFIX_BONUS = 4.0
+
+
+def words(text: str) -> list[str]:
+    return WORD.findall(text.lower().replace("ё", "е"))
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс фильмов по словам названия, режиссера, актеров и жанров.
+    Каждое слово запроса должно совпасть целиком или началом хотя бы с одним словом фильма;
+    фильмы ранжируются по сумме весов лучших совпадений слов запроса.
+    """
+
+    def __init__(self, movies: list[MovieWithGenres]):
+        # Название в виде слов через пробел - для сортировки и проверки совпадения запроса с началом названия
+        self.titles = {movie.id: " ".join(words(movie.title)) for movie in movies}
+        # слово -> {id фильма: вес лучшего поля, где оно встречается}
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        # id фильма -> (слово, вес) - чтобы проверять остальные слова запроса только у кандидатов
+        self.movie_words: dict[int, tuple[tuple[str, float], ...]] = {}
+
+        for movie in movies:
+            movie_words = {}
+            fields = {
+                "title": [movie.title],
+                "director": [movie.director],
+                "actors": movie.actors,
+                "genres": movie.genres,
+            }
+            for field, texts in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for text in texts:
+                    for word in words(text):
+                        movie_words[word] = max(movie_words.get(word, 0.0), weight)
+            for word, weight in movie_words.items():
+                self.postings[word][movie.id] = weight
+            self.movie_words[movie.id] = tuple(movie_words.items())
+
+        self.postings = dict(self.postings)
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, term: str) -> list[str]:
+        """Слова индекса, начинающиеся с term."""
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + "\U0010ffff", start)
+        return self.vocabulary[start:end]
+
+    def search(self, query: str, candidates: set[int] | None = None, limit: int = 20) -> list[tuple[int, float]]:
+        """
+        (id фильма, релевантность) по убыванию релевантности, при равенстве - по названию.
+        candidates ограничивает поиск заранее отобранными фильмами (например, по жанрам);
+        пустой запрос возвращает их все с нулевой релевантностью.
+        """
+        query_words = words(query)
+        terms = list(dict.fromkeys(query_words))
+        if not terms:
+            scores = dict.fromkeys(candidates, 0.0) if candidates is not None else {}
+            return self._top(scores, limit)
+
+        # Кандидаты набираются по самому редкому слову запроса, остальные слова проверяются по словам кандидатов
+        expansions = {term: self.expand(term) for term in terms}
+        rarest = min(terms, key=lambda term: sum(len(self.postings[word]) for word in expansions[term]))
+
+        scores = {}
+        for word in expansions[rarest]:
+            factor = 1.0 if word == rarest else PREFIX_FACTOR
+            for movie_id, weight in self.postings[word].items():
+                if candidates is not None and movie_id not in candidates:
+                    continue
+                scores[movie_id] = max(scores.get(movie_id, 0.0), weight * factor)
+
+        for term in terms:
+            if term == rarest:
+                continue
+            for movie_id in list(scores):
+                best = max(
+                    (weight * (1.0 if word == term else PREFIX_FACTOR)
+                     for word, weight in self.movie_words[movie_id] if word.startswith(term)),
+                    default=None
+                )
+                if best is None:
+                    del scores[movie_id]
+                else:
+                    scores[movie_id] += best
+
+        phrase = " ".join(query_words)
+        for movie_id in scores:
+            if self.titles[movie_id].startswith(phrase):
+                scores[movie_id] += TITLE_PREFIX_BONUS
+
+        return self._top(scores, limit)
+
+    def _top(self, scores: dict[int, float], limit: int) -> list[tuple[int, float]]:
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], self.titles[item[0]], item[0]))
+        return [(movie_id, score) for movie_id, score in best]
@@ -0,0 +1,407 @@
+"""
+Временное удержание мест на время оформления заказа.
+
+Пользователь выбирает места и получает удержание на SEAT_HOLD_TTL секунд: пока оно действует, места недоступны
+другим пользователям в списке мест и при создании заказа, а заказ с holdId забирает их без повторной проверки.
+Просроченные удержания не мешают новым сразу, а удаляются фоновой задачей раз в SEAT_HOLDS_SWEEP_INTERVAL секунд.
+
+Удержания хранятся в памяти процесса (SEAT_HOLDS_STORE=memory) или, если воркеров несколько, в таблице
+seat_holds (SEAT_HOLDS_STORE=db).
+"""
+import asyncio
+import datetime
+import heapq
+import logging
+import os
+import secrets
+import threading
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete, text
+from sqlalchemy.orm import Session
+
+from src.database import open_db, run_db
+from src.models import SeatHoldsOrm
+from src.occupancy import seat_occupancy
+
+logger = logging.getLogger(__name__)
+
+HOLD_TTL = float(os.getenv("SEAT_HOLD_TTL", 600))
+SWEEP_INTERVAL = float(os.getenv("SEAT_HOLDS_SWEEP_INTERVAL", 5))
+
+# Места занимаются, только если их еще не купили и они не удерживаются другим (действующим) удержанием
+HOLD_SQL = text("""
+INSERT INTO seat_holds (session_id, seat_id, hold_id, user_id, expires_at)
+SELECT :session_id, requested.seat_id, :hold_id, :user_id, :expires_at
+FROM unnest(CAST(:seats_ids AS integer[])) AS requested(seat_id)
+WHERE NOT EXISTS (
+    SELECT 1 FROM m2m_orders_seats
+    WHERE m2m_orders_seats.session_id = :session_id AND m2m_orders_seats.seat_id = requested.seat_id
+)
+ON CONFLICT (session_id, seat_id) DO UPDATE SET
+    hold_id = EXCLUDED.hold_id, user_id = EXCLUDED.user_id, expires_at = EXCLUDED.expires_at
+WHERE seat_holds.expires_at <= :now OR seat_holds.hold_id = :replaced_hold_id
+RETURNING seat_id
+""")
+
+
+class Hold:
+    __slots__ = ("hold_id", "session_id", "user_id", "seats_ids", "expires_at")
+
+    def __init__(self, hold_id: str, session_id: int, user_id: int, seats_ids: list[int], expires_at: datetime.datetime):
+        self.hold_id = hold_id
+        self.session_id = session_id
+        self.user_id = user_id
+        self.seats_ids = seats_ids
+        self.expires_at = expires_at
+
+    def payload(self) -> dict:
+        return {
+            "holdId": self.hold_id,
+            "sessionId": self.session_id,
+            "seatsIds": self.seats_ids,
+            "expiresAt": self.expires_at,
+        }
+
+
+def seats_conflict(msg: str, seats_ids) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"msg": msg, "seatsIds": sorted(seats_ids)}
+    )
+
+
+def hold_mismatch() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Hold is expired or does not cover the order seats"
+    )
+
+
+class SeatHolds:
+    """Общая часть хранилищ: проверка мест по кэшу занятости, уведомления и счетчики."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.granted = 0
+        self.rejected = 0
+        self.converted = 0
+        self.expired = 0
+        self.released = 0
+
+    def new_hold(self, session_id: int, user_id: int, seats_ids: list[int], db: Session) -> Hold:
+        """Проверяет, что места есть в зале сеанса и не куплены, и готовит удержание (еще не сохраненное)."""
+        occupancy = seat_occupancy.get(session_id, db)
+        if occupancy is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+
+        unavailable = []
+        for seat_id in seats_ids:
+            position = occupancy.layout.positions.get(seat_id)
+            if position is None or occupancy.is_booked(position):
+                unavailable.append(seat_id)
+        if unavailable:
+            self.rejected += 1
+            raise seats_conflict("Seats are already booked", unavailable)
+
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=self.ttl)
+        return Hold(secrets.token_urlsafe(16), session_id, user_id, seats_ids, expires_at)
+
+    def convert(self, hold: Hold, booked_seats_ids: list[int]):
+        """Удержание превратилось в заказ: места сверх заказа освобождаются."""
+        self.converted += 1
+        freed = set(hold.seats_ids) - set(booked_seats_ids)
+        if freed:
+            seat_occupancy.notify(hold.session_id, sorted(freed), False)
+
+    @staticmethod
+    def notify_changes(session_id: int, freed, taken):
+        # Уведомление сбрасывает ETag списка мест и рассылает изменения подписчикам SSE
+        if freed:
+            seat_occupancy.notify(session_id, sorted(freed), False)
+        if taken:
+            seat_occupancy.notify(session_id, sorted(taken), True)
+
+    def counters(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "converted": self.converted,
+            "released": self.released,
+            "expired": self.expired,
+        }
+
+
+class MemorySeatHolds(SeatHolds):
+    """Удержания в памяти процесса - для одного воркера. У пользователя одно удержание на сеанс."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._holds: dict[str, Hold] = {}
+        # id сеанса -> {id места: id удержания}
+        self._seats: dict[int, dict[int, str]] = defaultdict(dict)
+        self._by_user: dict[tuple[int, int], str] = {}
+        self._expiry: list[tuple[datetime.datetime, str]] = []
+        self._lock = threading.Lock()
+
+    def hold(self, session_id: int, user_id: int, seats_ids: list[int], db: Session) -> Hold:
+        """Удерживает места для пользователя, заменяя его прежнее удержание на этом сеансе."""
+        hold = self.new_hold(session_id, user_id, seats_ids, db)
+        now = datetime.datetime.now()
+
+        with self._lock:
+            previous = self._holds.get(self._by_user.get((user_id, session_id)))
+            session_seats = self._seats.get(session_id, {})
+            taken = [
+                seat_id for seat_id in seats_ids
+                if (held_by := self._holds.get(session_seats.get(seat_id))) is not None
+                and held_by is not previous and held_by.expires_at > now
+            ]
+            if taken:
+                self.rejected += 1
+                raise seats_conflict("Seats are held by another user", taken)
+
+            if previous is not None:
+                self._remove(previous)
+            self._holds[hold.hold_id] = hold
+            self._by_user[(user_id, session_id)] = hold.hold_id
+            session_seats = self._seats[session_id]
+            for seat_id in seats_ids:
+                session_seats[seat_id] = hold.hold_id
+            heapq.heappush(self._expiry, (hold.expires_at, hold.hold_id))
+            self.granted += 1
+
+        previous_seats = set(previous.seats_ids) if previous is not None else set()
+        self.notify_changes(session_id, previous_seats - set(seats_ids), set(seats_ids) - previous_seats)
+        return hold
+
+    def release(self, session_id: int, hold_id: str, user_id: int, db: Session):
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if hold is None or hold.session_id != session_id or hold.user_id != user_id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hold not found")
+            self._remove(hold)
+            self.released += 1
+
+        self.notify_changes(session_id, hold.seats_ids, ())
+
+    def held_seats(self, session_id: int, db: Session) -> set[int]:
+        session_seats = self._seats.get(session_id)
+        if not session_seats:
+            return frozenset()
+
+        now = datetime.datetime.now()
+        with self._lock:
+            return {
+                seat_id for seat_id, hold_id in session_seats.items()
+                if (hold := self._holds.get(hold_id)) is not None and hold.expires_at > now
+            }
+
+    def check_free(self, session_id: int, seats_ids: list[int], user_id: int | None, db: Session):
+        """Заказ без удержания: места не должны удерживаться другими пользователями (при user_id None - никем)."""
+        session_seats = self._seats.get(session_id)
+        if not session_seats:
+            return
+
+        now = datetime.datetime.now()
+        with self._lock:
+            taken = [
+                seat_id for seat_id in seats_ids
+                if (hold := self._holds.get(session_seats.get(seat_id))) is not None
+                and hold.user_id != user_id and hold.expires_at > now
+            ]
+        if taken:
+            raise seats_conflict("Seats are held by another user", taken)
+
+    def claim(self, hold_id: str, user_id: int | None, session_id: int, seats_ids: list[int], db: Session) -> Hold:
+        """
+        Проверяет перед заказом, что удержание действует и покрывает места заказа.
+        Удержание снимается в convert после коммита заказа, при ошибке заказа оно остается в силе.
+        """
+        with self._lock:
+            hold = self._holds.get(hold_id)
+        if (
+            hold is None or hold.user_id != user_id or hold.session_id != session_id
+            or hold.expires_at <= datetime.datetime.now() or not set(seats_ids) <= set(hold.seats_ids)
+        ):
+            raise hold_mismatch()
+        return hold
+
+    def convert(self, hold: Hold, booked_seats_ids: list[int]):
+        with self._lock:
+            if self._holds.get(hold.hold_id) is hold:
+                self._remove(hold)
+        super().convert(hold, booked_seats_ids)
+
+    def sweep(self, db: Session) -> int:
+        """Удаляет просроченные удержания и освобождает их места."""
+        now = datetime.datetime.now()
+        expired = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, hold_id = heapq.heappop(self._expiry)
+                hold = self._holds.get(hold_id)
+                if hold is not None and hold.expires_at <= now:
+                    self._remove(hold)
+                    expired.append(hold)
+            self.expired += len(expired)
+
+        for hold in expired:
+            self.notify_changes(hold.session_id, hold.seats_ids, ())
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "store": "memory",
+                "holds": len(self._holds),
+                "heldSeats": sum(len(seats) for seats in self._seats.values()),
+                **self.counters(),
+            }
+
+    def _remove(self, hold: Hold):
+        del self._holds[hold.hold_id]
+        if self._by_user.get((hold.user_id, hold.session_id)) == hold.hold_id:
+            del self._by_user[(hold.user_id, hold.session_id)]
+        session_seats = self._seats[hold.session_id]
+        for seat_id in hold.seats_ids:
+            if session_seats.get(seat_id) == hold.hold_id:
+                del session_seats[seat_id]
+        if not session_seats:
+            del self._seats[hold.session_id]
+
+
+class DatabaseSeatHolds(SeatHolds):
+    """
+    Удержания в таблице seat_holds - общие для всех воркеров. Уникальность (session_id, seat_id)
+    не дает двум удержаниям занять одно место, просроченная строка перезаписывается новым удержанием.
+    Уведомления об изменениях получает только воркер, сделавший изменение, остальные увидят их через
+    OCCUPANCY_CACHE_TTL.
+    """
+
+    def hold(self, session_id: int, user_id: int, seats_ids: list[int], db: Session) -> Hold:
+        hold = self.new_hold(session_id, user_id, seats_ids, db)
+        now = datetime.datetime.now()
+
+        previous = db.execute(
+            select(SeatHoldsOrm.hold_id, SeatHoldsOrm.seat_id)
+            .where(SeatHoldsOrm.session_id == session_id, SeatHoldsOrm.user_id == user_id)
+            .with_for_update()
+        ).all()
+        previous_hold_id = previous[0].hold_id if previous else None
+        granted = set(db.execute(HOLD_SQL, {
+            "session_id": session_id,
+            "seats_ids": seats_ids,
+            "hold_id": hold.hold_id,
+            "user_id": user_id,
+            "expires_at": hold.expires_at,
+            "now": now,
+            "replaced_hold_id": previous_hold_id,
+        }).scalars().all())
+
+        if len(granted) != len(seats_ids):
+            db.rollback()
+            self.rejected += 1
+            raise seats_conflict("Seats are held by another user", set(seats_ids) - granted)
+
+        previous_seats = {row.seat_id for row in previous}
+        if previous_hold_id is not None:
+            db.execute(delete(SeatHoldsOrm).where(SeatHoldsOrm.hold_id == previous_hold_id))
+        db.commit()
+        self.granted += 1
+
+        self.notify_changes(session_id, previous_seats - set(seats_ids), set(seats_ids) - previous_seats)
+        return hold
+
+    def release(self, session_id: int, hold_id: str, user_id: int, db: Session):
+        released = db.execute(
+            delete(SeatHoldsOrm)
+            .where(
+                SeatHoldsOrm.hold_id == hold_id,
+                SeatHoldsOrm.session_id == session_id,
+                SeatHoldsOrm.user_id == user_id
+            )
+            .returning(SeatHoldsOrm.seat_id)
+        ).scalars().all()
+        db.commit()
+        if not released:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hold not found")
+
+        self.released += 1
+        self.notify_changes(session_id, released, ())
+
+    def held_seats(self, session_id: int, db: Session) -> set[int]:
+        return set(db.execute(
+            select(SeatHoldsOrm.seat_id)
+            .where(SeatHoldsOrm.session_id == session_id, SeatHoldsOrm.expires_at > datetime.datetime.now())
+        ).scalars().all())
+
+    def check_free(self, session_id: int, seats_ids: list[int], user_id: int | None, db: Session):
+        taken = db.execute(
+            select(SeatHoldsOrm.seat_id)
+            .where(
+                SeatHoldsOrm.session_id == session_id,
+                SeatHoldsOrm.seat_id.in_(seats_ids),
+                SeatHoldsOrm.user_id != user_id,
+                SeatHoldsOrm.expires_at > datetime.datetime.now()
+            )
+        ).scalars().all()
+        if taken:
+            raise seats_conflict("Seats are held by another user", taken)
+
+    def claim(self, hold_id: str, user_id: int | None, session_id: int, seats_ids: list[int], db: Session) -> Hold:
+        # Строки удаляются в транзакции заказа: откат заказа возвращает удержание
+        rows = db.execute(
+            delete(SeatHoldsOrm)
+            .where(
+                SeatHoldsOrm.hold_id == hold_id,
+                SeatHoldsOrm.user_id == user_id,
+                SeatHoldsOrm.session_id == session_id,
+                SeatHoldsOrm.expires_at > datetime.datetime.now()
+            )
+            .returning(SeatHoldsOrm.seat_id, SeatHoldsOrm.expires_at)
+        ).all()
+        held_seats_ids = [row.seat_id for row in rows]
+        if not rows or not set(seats_ids) <= set(held_seats_ids):
+            db.rollback()
+            raise hold_mismatch()
+        return Hold(hold_id, session_id, user_id, held_seats_ids, rows[0].expires_at)
+
+    def sweep(self, db: Session) -> int:
+        rows = db.execute(
+            delete(SeatHoldsOrm)
+            .where(SeatHoldsOrm.expires_at <= datetime.datetime.now())
+            .returning(SeatHoldsOrm.session_id, SeatHoldsOrm.hold_id, SeatHoldsOrm.seat_id)
+        ).all()
+        db.commit()
+
+        freed = defaultdict(list)
+        for row in rows:
+            freed[row.session_id].append(row.seat_id)
+        for session_id, seats_ids in freed.items():
+            self.notify_changes(session_id, seats_ids, ())
+        expired = len({row.hold_id for row in rows})
+        self.expired += expired
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "store": "db",
+            **self.counters(),
+        }
+
+
+async def sweep_periodically(interval: float):
+    """Фоновая задача: раз в interval секунд удаляет просроченные удержания и освобождает их места."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with open_db() as db:
+                await run_db(db, seat_holds.sweep)
+        except Exception:
+            logger.exception("Seat holds sweep failed")
+
+
+seat_holds = (DatabaseSeatHolds if os.getenv("SEAT_HOLDS_STORE", "memory") == "db" else MemorySeatHolds)(HOLD_TTL)
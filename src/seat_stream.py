@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from src.crud import get_seats_for_session
+from src.database import open_db, run_db
+from src.occupancy import seat_occupancy
+
+HEARTBEAT_INTERVAL = 15
+
+
+class SeatSubscriber:
+    """Подписка одного клиента. Очередь ограничена: если клиент не успевает читать, дельты сбрасываются
+    и ему отправляется новый снимок вместо накопления событий в памяти."""
+
+    def __init__(self, session_id: int, queue_size: int):
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.resync = True
+
+    def push(self, event: str):
+        if self.resync:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.resync = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait("")
+
+
+class SeatStreamHub:
+    """Рассылка изменений занятости мест подписчикам сеанса: одно событие сериализуется один раз
+    и раскладывается по очередям всех подписчиков этого сеанса в текущем процессе."""
+
+    def __init__(self, max_subscribers: int, queue_size: int):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+        self._subscribers: dict[int, set[SeatSubscriber]] = defaultdict(set)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id: int) -> SeatSubscriber:
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many seat subscribers",
+                    headers={"Retry-After": str(HEARTBEAT_INTERVAL)}
+                )
+            subscriber = SeatSubscriber(session_id, self.queue_size)
+            self._subscribers[session_id].add(subscriber)
+            self._count += 1
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: SeatSubscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.session_id)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.remove(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.session_id]
+            self._count -= 1
+
+    def publish(self, session_id: int, seats_ids: list[int], booked: bool):
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, ()))
+        if not subscribers:
+            return
+
+        event = format_event("delta", {
+            "sessionId": session_id,
+            "bookedSeatsIds": seats_ids if booked else [],
+            "freedSeatsIds": [] if booked else seats_ids,
+        })
+        self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, event)
+            except RuntimeError:
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": self._count,
+                "sessions": len(self._subscribers),
+                "maxSubscribers": self.max_subscribers,
+                "published": self.published,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+            }
+
+    async def stream(self, subscriber: SeatSubscriber):
+        try:
+            while True:
+                if subscriber.resync:
+                    subscriber.resync = False
+                    yield await snapshot_event(subscriber.session_id)
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event:
+                    yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class SeatStreamResponse(StreamingResponse):
+    """
+    Ответ с потоком событий подписчика. Слот подписчика освобождается, чем бы ни закончилась отправка ответа:
+    генератор потока делает это сам, но если клиент отключился до начала тела, генератор не запускается вовсе.
+    """
+
+    def __init__(self, hub: SeatStreamHub, subscriber: SeatSubscriber, headers: dict | None = None):
+        super().__init__(hub.stream(subscriber), media_type="text/event-stream", headers=headers)
+        self.hub = hub
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.hub.unsubscribe(self.subscriber)
+
+
+def format_event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def snapshot_event(session_id: int) -> str:
+    async with open_db() as db:
+        seats = await run_db(db, get_seats_for_session, session_id)
+
+    return format_event("snapshot", {"sessionId": session_id, "seats": seats})
+
+
+seat_stream = SeatStreamHub(
+    max_subscribers=int(os.getenv("SEAT_STREAM_MAX_SUBSCRIBERS", 5000)),
+    queue_size=int(os.getenv("SEAT_STREAM_QUEUE_SIZE", 32)),
+)
+
+seat_occupancy.add_listener(seat_stream.publish)
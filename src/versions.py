@@ -0,0 +1,26 @@
+import threading
+import time
+from collections import defaultdict
+
+
+class VersionCounters:
+    """
+    Версии данных в памяти процесса для ETag: запись, меняющая ответ, увеличивает свой счетчик
+    ("catalog" - фильмы, жанры и залы; "sessions" - расписание; ("orders", id сеанса) - занятость мест).
+    epoch отличается у каждого запуска, поэтому ETag прошлого процесса никогда не совпадет с текущим.
+    """
+
+    def __init__(self):
+        self.epoch = f"{time.time_ns():x}"
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, *key) -> int:
+        return self._versions.get(key, 0)
+
+    def bump(self, *key):
+        with self._lock:
+            self._versions[key] += 1
+
+
+versions = VersionCounters()
@@ -0,0 +1,67 @@
+"""
+Тесты работают с отдельной БД TEST_DB_NAME (по умолчанию cinema_test) на том же сервере, что и приложение:
+она создается, если ее нет, и перед каждым тестом схема пересоздается миграциями.
+Без доступного PostgreSQL тесты пропускаются.
+"""
+import os
+
+os.environ["DB_NAME"] = os.getenv("TEST_DB_NAME", "cinema_test")
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import psycopg2
+import pytest
+from psycopg2 import sql
+from sqlalchemy import text
+
+
+def ensure_database():
+    from src.database import username, password, host, port, database_name
+
+    connection = psycopg2.connect(user=username, password=password, host=host, port=port, dbname="postgres")
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database_name,))
+            if cursor.fetchone() is None:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(database_name)))
+    finally:
+        connection.close()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    try:
+        ensure_database()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+
+    from src.database import engine
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    from src.catalog import catalog
+    from src.database import SessionLocal, migrate
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public;"))
+    migrate()
+    catalog.invalidate()
+
+    with SessionLocal() as db:
+        yield db
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from src.database import async_engine
+
+    with TestClient(app) as client:
+        yield client
+    # Соединения asyncpg привязаны к event loop клиента, следующий тест запускает новый
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,55 @@
+from sqlalchemy import func, select, text
+
+from src.analytics import backfill, merge_deltas, record_order, sales_report
+from src.enums import AnalyticsGroup
+from src.models import SalesDailyOrm, SalesDeltasOrm
+
+
+def seed(db):
+    db.execute(text("""
+        INSERT INTO movies (id, title, director, screenwriter, actors, description, trailer_url, poster_url,
+                            age_rating, duration)
+        VALUES (1, 'Movie', 'Director', 'Screenwriter', ARRAY['Actor'], 'Description', 'trailer', 'poster', 'AGE_12', 100)
+    """))
+    db.execute(text("INSERT INTO halls (id, name, total_seats) VALUES (1, 'Red', 4)"))
+    db.execute(text("""
+        INSERT INTO sessions (id, movie_id, hall_id, start_time)
+        VALUES (1, 1, 1, '2026-10-20 10:00'), (2, 1, 1, '2026-10-20 18:00')
+    """))
+    db.commit()
+
+
+def movie_totals(db) -> tuple[int, int, int]:
+    report = sales_report(AnalyticsGroup.MOVIE, None, None, db)
+    return report[0]["orders"], report[0]["seatsSold"], report[0]["revenue"]
+
+
+def test_orders_are_reported_before_and_after_merge(db):
+    seed(db)
+    record_order(1, 2, 200, db)
+    record_order(2, 3, 300, db)
+    record_order(1, 1, 100, db, cancelled=True)
+    db.commit()
+
+    # Заказы одного дня не трогают общую строку итогов до переноса
+    assert db.scalar(select(func.count()).select_from(SalesDailyOrm)) == 0
+    assert movie_totals(db) == (1, 4, 400)
+
+    assert merge_deltas(db) == 1
+    assert db.scalar(select(func.count()).select_from(SalesDeltasOrm)) == 0
+    assert movie_totals(db) == (1, 4, 400)
+
+    record_order(2, 1, 100, db)
+    db.commit()
+    merge_deltas(db)
+    assert movie_totals(db) == (2, 5, 500)
+
+
+def test_backfill_drops_unmerged_deltas(db):
+    seed(db)
+    record_order(1, 2, 200, db)
+    db.commit()
+
+    backfill(db)
+    assert db.scalar(select(func.count()).select_from(SalesDeltasOrm)) == 0
+    assert sales_report(AnalyticsGroup.MOVIE, None, None, db) == []
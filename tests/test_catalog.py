@@ -0,0 +1,36 @@
+import src.catalog
+from src.catalog import catalog
+from src.crud import create_hall
+from src.database import SessionLocal
+from src.schemas import HallLayoutCreate, PriceZone
+
+
+def layout(name: str) -> HallLayoutCreate:
+    return HallLayoutCreate(name=name, rows=2, seats_per_row=3, zones=[PriceZone(rows=2, price=100)])
+
+
+def test_hall_created_during_reload_is_kept(db, monkeypatch):
+    create_hall(layout("Red"), db)
+    catalog.reload(db)
+
+    load_snapshot = src.catalog.load_snapshot
+    created = []
+
+    # Зал коммитится после того, как перезагрузка прочитала БД, но до подмены снимка
+    def load_then_create_hall(db, version):
+        snapshot = load_snapshot(db, version)
+        with SessionLocal() as other:
+            created.append(create_hall(layout("Blue"), other))
+        return snapshot
+
+    monkeypatch.setattr(src.catalog, "load_snapshot", load_then_create_hall)
+    snapshot = catalog.reload(db)
+
+    hall = created[0]
+    assert snapshot.halls[hall.id] == hall
+    assert len(snapshot.layouts[hall.id].seats) == 6
+
+    monkeypatch.setattr(src.catalog, "load_snapshot", load_snapshot)
+    snapshot = catalog.reload(db)
+    assert snapshot.halls[hall.id] == hall
+    assert catalog._added_halls == []
@@ -0,0 +1,36 @@
+import base64
+import datetime
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from src.pagination import decode_cursor, encode_cursor
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def test_cursor_round_trip():
+    created_at = datetime.datetime(2026, 10, 18, 12, 30)
+    assert decode_cursor(encode_cursor(created_at, 7), datetime.datetime, int) == [created_at, 7]
+    assert decode_cursor(encode_cursor(7), int) == [7]
+
+
+@pytest.mark.parametrize("cursor, types", [
+    ("zzz", (int,)),
+    (raw_cursor({"id": 1}), (int,)),
+    (raw_cursor([]), (int,)),
+    (raw_cursor([1, 2]), (int,)),
+    (raw_cursor(["1"]), (int,)),
+    (raw_cursor([1.5]), (int,)),
+    (raw_cursor([True]), (int,)),
+    (raw_cursor([None, 1]), (datetime.datetime, int)),
+    (raw_cursor(["yesterday", 1]), (datetime.datetime, int)),
+    (raw_cursor(["2026-10-18T12:30:00", "1 OR 1=1"]), (datetime.datetime, int)),
+])
+def test_malformed_cursor_is_bad_request(cursor, types):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, *types)
+    assert error.value.status_code == 400
@@ -0,0 +1,65 @@
+from sqlalchemy import select, text
+
+from src.models import ScheduleOrm
+from src.schedule import refresh_pending, refresh_schedule, schedule_generation
+
+
+def seed(db):
+    db.execute(text("""
+        INSERT INTO movies (id, title, director, screenwriter, actors, description, trailer_url, poster_url,
+                            age_rating, duration)
+        VALUES (1, 'Movie', 'Director', 'Screenwriter', ARRAY['Actor'], 'Description', 'trailer', 'poster', 'AGE_12', 100)
+    """))
+    db.execute(text("INSERT INTO halls (id, name, total_seats) VALUES (1, 'Red', 4), (2, 'Blue', 2)"))
+    db.execute(text("""
+        INSERT INTO seats (hall_id, row_number, seat_number, price)
+        VALUES (1, 1, 1, 100), (1, 1, 2, 100), (1, 2, 1, 100), (1, 2, 2, 100), (2, 1, 1, 100), (2, 1, 2, 100)
+    """))
+    db.execute(text("INSERT INTO users (id, email, password_hash, is_admin, created_at) VALUES (1, 'a', 'h', false, now())"))
+    db.commit()
+
+
+def schedule_rows(db) -> list[tuple]:
+    return [tuple(row) for row in db.execute(
+        select(ScheduleOrm.session_id, ScheduleOrm.hall_id, ScheduleOrm.remaining_seats, ScheduleOrm.stale)
+        .order_by(ScheduleOrm.session_id)
+    )]
+
+
+def test_pending_refresh_picks_up_only_new_and_changed_sessions(db):
+    seed(db)
+    db.execute(text("""
+        INSERT INTO sessions (id, movie_id, hall_id, start_time)
+        VALUES (1, 1, 1, '2026-10-20 10:00'), (2, 1, 1, '2026-10-20 18:00')
+    """))
+    db.execute(text("INSERT INTO orders (id, user_id, session_id, total_price, info, created_at) VALUES (1, 1, 1, 100, 'x', now())"))
+    db.execute(text("INSERT INTO m2m_orders_seats (order_id, session_id, seat_id) VALUES (1, 1, 1)"))
+    db.commit()
+
+    generation = schedule_generation(db)
+    assert refresh_pending(db) == 2
+    assert schedule_rows(db) == [(1, 1, 3, False), (2, 1, 4, False)]
+    assert schedule_generation(db) == generation + 1
+
+    assert refresh_pending(db) == 0
+    assert schedule_generation(db) == generation + 1
+
+    # Перенос сеанса в другой зал помечает его строку, остальные строки не пересчитываются
+    db.execute(text("UPDATE sessions SET hall_id = 2 WHERE id = 2"))
+    db.commit()
+    assert schedule_rows(db)[1] == (2, 1, 4, True)
+    assert refresh_pending(db) == 1
+    assert schedule_rows(db) == [(1, 1, 3, False), (2, 2, 2, False)]
+
+
+def test_full_refresh_fixes_rows_the_pending_refresh_does_not_track(db):
+    seed(db)
+    db.execute(text("INSERT INTO sessions (id, movie_id, hall_id, start_time) VALUES (1, 1, 2, '2026-10-20 10:00')"))
+    db.commit()
+    refresh_pending(db)
+
+    db.execute(text("INSERT INTO seats (hall_id, row_number, seat_number, price) VALUES (2, 2, 1, 100)"))
+    db.commit()
+    assert refresh_pending(db) == 0
+    assert refresh_schedule(db) == 1
+    assert schedule_rows(db) == [(1, 2, 3, False)]
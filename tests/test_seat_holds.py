@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import src.crud
+import src.routers.session_router
+from src.auth.jwt_auth.base.auth import JWTAuth
+from src.auth.jwt_auth.base.config import JWTConfig
+from src.seat_holds import DatabaseSeatHolds, MemorySeatHolds
+
+jwt_auth = JWTAuth(JWTConfig())
+
+
+def seed(db):
+    db.execute(text("""
+        INSERT INTO users (id, email, password_hash, is_admin, created_at)
+        VALUES (2, 'holder@example.com', 'hash', false, now()), (3, 'other@example.com', 'hash', false, now())
+    """))
+    db.execute(text("""
+        INSERT INTO movies (id, title, director, screenwriter, actors, description, trailer_url, poster_url,
+                            age_rating, duration)
+        VALUES (1, 'Movie', 'Director', 'Screenwriter', ARRAY['Actor'], 'Description', 'trailer', 'poster', 'AGE_12', 100)
+    """))
+    db.execute(text("INSERT INTO halls (id, name, total_seats) VALUES (1, 'Red', 4)"))
+    db.execute(text("""
+        INSERT INTO seats (id, hall_id, row_number, seat_number, price)
+        SELECT 2 * (row_number - 1) + seat_number, 1, row_number, seat_number, 100
+        FROM generate_series(1, 2) AS row_number, generate_series(1, 2) AS seat_number
+    """))
+    db.execute(text("INSERT INTO sessions (id, movie_id, hall_id, start_time) VALUES (1, 1, 1, '2026-10-20 10:00')"))
+    db.commit()
+
+
+@pytest.fixture(params=[MemorySeatHolds, DatabaseSeatHolds])
+def holds_client(request, db, monkeypatch):
+    holds = request.param(ttl=600)
+    monkeypatch.setattr(src.crud, "seat_holds", holds)
+    monkeypatch.setattr(src.routers.session_router, "seat_holds", holds)
+    seed(db)
+    return request.getfixturevalue("client")
+
+
+def as_user(client: TestClient, user_id: int) -> TestClient:
+    client.cookies.set("access_token", jwt_auth.generate_token({"id": user_id, "isAdmin": False}))
+    return client
+
+
+def order(seats_ids: list[int], user_id: int, hold_id: str | None = None) -> dict:
+    return {
+        "seats_ids": seats_ids, "user_id": user_id, "session_id": 1, "total_price": 100, "info": "order info",
+        "hold_id": hold_id,
+    }
+
+
+def test_held_seat_cannot_be_booked_with_spoofed_user_id(holds_client):
+    client = holds_client
+    hold = as_user(client, 2).post("/api/sessions/1/holds", json={"seats_ids": [1]})
+    assert hold.status_code == 200
+
+    other = as_user(client, 3)
+    assert other.post("/api/orders", json=order([1], user_id=2)).status_code == 409
+    assert other.post("/api/orders", json=order([1], user_id=2, hold_id=hold.json()["data"]["holdId"])).status_code == 409
+
+    holder = as_user(client, 2)
+    assert holder.post("/api/orders", json=order([1], user_id=2, hold_id=hold.json()["data"]["holdId"])).status_code == 200
@@ -0,0 +1,77 @@
+import datetime
+import threading
+
+from sqlalchemy import text
+
+from src.catalog import catalog
+from src.crud import get_filtered_sessions
+from src.database import SessionLocal
+from src.query_stats import query_budget
+from src.schedule import refresh_schedule
+from src.schemas import SessionFilters
+
+
+def seed_catalog(db):
+    db.execute(text("INSERT INTO genres (id, name) VALUES (1, 'drama'), (2, 'comedy')"))
+    db.execute(text("""
+        INSERT INTO movies (id, title, director, screenwriter, actors, description, trailer_url, poster_url,
+                            age_rating, duration)
+        SELECT id, 'Movie ' || id, 'Director', 'Screenwriter', ARRAY['Actor ' || id], 'Description', 'trailer',
+               'poster', 'AGE_12', 100
+        FROM generate_series(1, 5) AS id
+    """))
+    db.execute(text("INSERT INTO m2m_movies_genres (movie_id, genre_id) SELECT id, 1 + id % 2 FROM movies"))
+    db.execute(text("INSERT INTO halls (id, name, total_seats) VALUES (1, 'Red', 4), (2, 'Blue', 4)"))
+    db.execute(text("""
+        INSERT INTO seats (hall_id, row_number, seat_number, price)
+        SELECT hall_id, row_number, seat_number, 100
+        FROM generate_series(1, 2) AS hall_id, generate_series(1, 2) AS row_number, generate_series(1, 2) AS seat_number
+    """))
+    db.commit()
+
+
+def add_sessions(db, count: int):
+    db.execute(text("""
+        INSERT INTO sessions (movie_id, hall_id, start_time)
+        SELECT 1 + n % 5, 1 + n % 2, :start + n * interval '1 hour'
+        FROM generate_series(1, :count) AS n
+    """), {"count": count, "start": datetime.datetime(2026, 10, 1)})
+    db.commit()
+    refresh_schedule(db)
+
+
+def listing_queries(db, filters: SessionFilters) -> tuple[int, int]:
+    with query_budget(max_queries=100) as stats:
+        sessions = get_filtered_sessions(filters, db)
+    return stats.count, len(sessions)
+
+
+def test_session_listing_query_count_does_not_grow_with_sessions(db):
+    seed_catalog(db)
+    catalog.reload(db)
+
+    for filters in (SessionFilters(), SessionFilters(genres=["drama"]), SessionFilters(title="Movie")):
+        db.execute(text("TRUNCATE sessions CASCADE"))
+        db.commit()
+
+        add_sessions(db, 20)
+        queries, sessions = listing_queries(db, filters)
+        assert sessions > 0
+
+        add_sessions(db, 20)
+        with query_budget(max_queries=queries, max_repeats=1):
+            assert len(get_filtered_sessions(filters, db)) == 2 * sessions
+
+
+def test_query_budget_ignores_other_threads(db):
+    def run_queries():
+        with SessionLocal() as other:
+            for _ in range(5):
+                other.execute(text("SELECT 1"))
+
+    with query_budget(max_queries=1) as stats:
+        db.execute(text("SELECT 1"))
+        thread = threading.Thread(target=run_queries)
+        thread.start()
+        thread.join()
+    assert stats.count == 1